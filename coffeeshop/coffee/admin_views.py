@@ -23,10 +23,11 @@ except ImportError:
             return func
         return decorator
 
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.contrib.admin.views.decorators import staff_member_required
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
 from django.db.models import Sum, Count, Q, F
 from django.utils import timezone
 from datetime import timedelta, date
@@ -37,6 +38,13 @@ from .models import (
     MenuItem, Category, Order, OrderItem, 
     ContactMessage, DashboardAnalytics
 )
+from .catalog import annotate_item_counts, get_category_listing
+from .catalog_io import CATALOG_FORMATS, CatalogImportError, export_catalog, import_catalog
+from .fastserializers import ADMIN_CUSTOMERS, ADMIN_ORDERS, ADMIN_PRODUCTS, ORDER
+from .events import order_event_response, streams_available
+from .inventory import parse_stock_updates, apply_stock_changes
+from .routers import analytics_reads
+from . import querystats
 
 
 # Django REST Framework ViewSets (only available when DRF is installed)
@@ -46,6 +54,7 @@ if DRF_AVAILABLE:
         permission_classes = [IsAdminUser]
         
         @action(detail=False, methods=['get'])
+        @analytics_reads()
         def analytics(self, request):
             """Get dashboard analytics data"""
             try:
@@ -66,9 +75,7 @@ if DRF_AVAILABLE:
                 ).values('id', 'name', 'stock', 'category')
                 
                 # Get recent orders
-                recent_orders = Order.objects.select_related('user').prefetch_related(
-                    'orderitem_set__menu_item'
-                ).order_by('-created_at')[:10]
+                recent_orders = Order.objects.order_by('-created_at')[:10]
                 
                 analytics_data = {
                     'total_orders': total_orders,
@@ -78,7 +85,7 @@ if DRF_AVAILABLE:
                     'sales_data': sales_data,
                     'category_stats': category_stats,
                     'low_stock_items': list(low_stock_items),
-                    'recent_orders': OrderSerializer(recent_orders, many=True).data
+                    'recent_orders': ORDER.serialize(recent_orders)
                 }
                 
                 serializer = DashboardAnalyticsSerializer(analytics_data)
@@ -128,7 +135,7 @@ if DRF_AVAILABLE:
             if new_stock is not None:
                 try:
                     menu_item.stock = int(new_stock)
-                    menu_item.save()
+                    menu_item.save(update_fields=['stock', 'updated_at'])
                     
                     return Response({
                         'success': True,
@@ -214,6 +221,9 @@ if DRF_AVAILABLE:
         queryset = Category.objects.all().order_by('name')
         serializer_class = CategorySerializer
         permission_classes = [IsAdminUser]
+        
+        def get_queryset(self):
+            return annotate_item_counts(super().get_queryset())
 
 
     class ContactMessageAdminViewSet(viewsets.ModelViewSet):
@@ -237,6 +247,7 @@ if DRF_AVAILABLE:
 
 # Dashboard Template Views
 @staff_member_required
+@analytics_reads()
 def admin_dashboard(request):
     """Main admin dashboard view"""
     context = {
@@ -271,11 +282,14 @@ def admin_orders(request):
     context = {
         'page_title': 'Order Management',
         'orders': orders,
+        'live_updates': streams_available(request),
+        'status_poll_ms': settings.ORDER_STATUS_POLL_SECONDS * 1000,
     }
     return render(request, 'admin_dashboard/orders.html', context)
 
 
 @staff_member_required
+@analytics_reads()
 def admin_customers(request):
     """Customers management view"""
     customers = User.objects.filter(is_staff=False).order_by('-date_joined')[:50]
@@ -288,6 +302,7 @@ def admin_customers(request):
 
 
 @staff_member_required
+@analytics_reads()
 def admin_reports(request):
     """Reports and analytics view"""
     context = {
@@ -345,6 +360,7 @@ def admin_messages(request):
 # API Views for Dashboard
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
+@analytics_reads()
 def dashboard_stats_api(request):
     """API endpoint for dashboard statistics"""
     stats = {
@@ -361,6 +377,7 @@ def dashboard_stats_api(request):
 
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
+@analytics_reads()
 def sales_chart_api(request):
     """API endpoint for sales chart data"""
     days = int(request.GET.get('days', 7))
@@ -375,6 +392,7 @@ def sales_chart_api(request):
 # Admin API endpoints - modified to work with or without DRF
 @api_view(['GET']) if DRF_AVAILABLE else lambda f: f
 @permission_classes([IsAdminUser]) if DRF_AVAILABLE else lambda f: f
+@analytics_reads()
 def dashboard_analytics(request):
     """Dashboard analytics API endpoint"""
     try:
@@ -435,30 +453,19 @@ def dashboard_analytics(request):
 def admin_products_api(request, product_id=None):
     """Products API endpoint"""
     if request.method == 'GET':
+        try:
+            fields = ADMIN_PRODUCTS.parse_fields(request.GET.get('fields'))
+        except ValueError as e:
+            error_response = {'error': str(e)}
+            if DRF_AVAILABLE:
+                return Response(error_response, status=400)
+            else:
+                return JsonResponse(error_response, status=400)
+        
         try:
             products = MenuItem.objects.all().order_by('-created_at')
-            products_data = []
-            for product in products:
-                if DRF_AVAILABLE:
-                    product_data = MenuItemSerializer(product).data
-                else:
-                    product_data = {
-                        'id': product.id,
-                        'name': product.name,
-                        'description': product.description,
-                        'price': float(product.price),
-                        'category': product.category,
-                        'image_url': product.image_url,
-                        'stock': product.stock,
-                        'is_available': product.is_available,
-                        'is_featured': product.is_featured,
-                        'created_at': product.created_at.isoformat() if product.created_at else None
-                    }
-                product_data['category_name'] = product.category_obj.name if product.category_obj else None
-                # Add category_obj ID for editing
-                product_data['category_obj'] = product.category_obj.id if product.category_obj else None
-                product_data['category_obj_id'] = product.category_obj.id if product.category_obj else None
-                products_data.append(product_data)
+            # category_obj is the category id, for editing
+            products_data = ADMIN_PRODUCTS.serialize(products, fields)
             
             if DRF_AVAILABLE:
                 return Response(products_data)
@@ -745,6 +752,14 @@ def admin_products_api(request, product_id=None):
             return Response({'error': 'Product not found'}, status=404)
 
 
+async def admin_order_stream(request):
+    """Server-Sent Events for every order's status changes, starting from the active orders"""
+    user = await request.auser()
+    if not user.is_staff:
+        return JsonResponse({'error': 'Staff access required'}, status=403)
+    return order_event_response(request)
+
+
 @api_view(['GET']) if DRF_AVAILABLE else lambda f: f
 @permission_classes([IsAdminUser]) if DRF_AVAILABLE else lambda f: f
 def admin_orders_api(request):
@@ -768,25 +783,16 @@ def admin_orders_api(request):
             return JsonResponse(stats)
     
     # Return order list
-    orders_data = []
-    for order in orders[:50]:  # Limit to 50 for performance
+    try:
+        fields = ADMIN_ORDERS.parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        error_response = {'error': str(e)}
         if DRF_AVAILABLE:
-            order_data = OrderSerializer(order).data
+            return Response(error_response, status=400)
         else:
-            order_data = {
-                'id': order.id,
-                'order_id': str(order.order_id),
-                'customer_name': order.customer_name,
-                'customer_email': order.customer_email,
-                'status': order.status,
-                'total_amount': float(order.total_amount),
-                'created_at': order.created_at.isoformat()
-            }
-        
-        order_data['customer_name'] = order.user.get_full_name() or order.user.username if order.user else 'Guest'
-        order_data['customer_email'] = order.user.email if order.user else ''
-        order_data['items_count'] = order.orderitem_set.count()
-        orders_data.append(order_data)
+            return JsonResponse(error_response, status=400)
+    
+    orders_data = ADMIN_ORDERS.serialize(orders[:50], fields)  # Limit to 50 for performance
     
     if DRF_AVAILABLE:
         return Response(orders_data)
@@ -827,6 +833,7 @@ def mark_message_read_api(request, message_id):
 
 @api_view(['GET']) if DRF_AVAILABLE else lambda f: f
 @permission_classes([IsAdminUser]) if DRF_AVAILABLE else lambda f: f
+@analytics_reads()
 def admin_customers_api(request):
     """Customers API endpoint"""
     customers = User.objects.filter(is_staff=False).order_by('-date_joined')
@@ -862,30 +869,17 @@ def admin_customers_api(request):
         else:
             return JsonResponse(stats)
     
-    # Add order statistics to each customer
-    customers_data = []
-    for customer in customers[:50]:  # Limit for performance
-        customer_orders = Order.objects.filter(user=customer)
-        
+    # Customers with their order statistics
+    try:
+        fields = ADMIN_CUSTOMERS.parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        error_response = {'error': str(e)}
         if DRF_AVAILABLE:
-            customer_data = UserSerializer(customer).data
+            return Response(error_response, status=400)
         else:
-            customer_data = {
-                'id': customer.id,
-                'username': customer.username,
-                'email': customer.email,
-                'first_name': customer.first_name,
-                'last_name': customer.last_name,
-                'date_joined': customer.date_joined.isoformat(),
-                'is_active': customer.is_active
-            }
-            
-        customer_data['total_orders'] = customer_orders.count()
-        customer_data['total_spent'] = customer_orders.aggregate(
-            total=Sum('total_amount')
-        )['total'] or 0
-        customer_data['last_order_date'] = customer_orders.order_by('-created_at').first().created_at if customer_orders.exists() else None
-        customers_data.append(customer_data)
+            return JsonResponse(error_response, status=400)
+    
+    customers_data = ADMIN_CUSTOMERS.serialize(customers[:50], fields)  # Limit for performance
     
     if DRF_AVAILABLE:
         return Response(customers_data)
@@ -895,6 +889,7 @@ def admin_customers_api(request):
 
 @api_view(['GET']) if DRF_AVAILABLE else lambda f: f
 @permission_classes([IsAdminUser]) if DRF_AVAILABLE else lambda f: f
+@analytics_reads()
 def admin_reports_api(request):
     """Reports API endpoint"""
     report_type = request.GET.get('type', 'sales')
@@ -993,22 +988,8 @@ def admin_reports_api(request):
 @permission_classes([IsAdminUser]) if DRF_AVAILABLE else lambda f: f
 def admin_categories_api(request):
     """Categories API endpoint"""
-    categories = Category.objects.all().order_by('name')
-    categories_data = []
-    for category in categories:
-        if DRF_AVAILABLE:
-            category_data = CategorySerializer(category).data
-        else:
-            category_data = {
-                'id': category.id,
-                'name': category.name,
-                'description': category.description,
-                'image_url': category.image_url,
-                'is_active': category.is_active,
-                'created_at': category.created_at.isoformat()
-            }
-        category_data['items_count'] = MenuItem.objects.filter(category_obj=category).count()
-        categories_data.append(category_data)
+    # Item counts come from one annotated query, cached by catalog version
+    categories_data = get_category_listing()
     
     if DRF_AVAILABLE:
         return Response(categories_data)
@@ -1016,6 +997,28 @@ def admin_categories_api(request):
         return JsonResponse(categories_data, safe=False)
 
 
+@api_view(['GET', 'DELETE']) if DRF_AVAILABLE else lambda f: f
+@permission_classes([IsAdminUser]) if DRF_AVAILABLE else lambda f: f
+def admin_query_stats_api(request):
+    """Per-view query counts, DB time and N+1 suspects; DELETE resets them"""
+    if not DRF_AVAILABLE and not request.user.is_staff:
+        return JsonResponse({'error': 'Staff access required'}, status=403)
+
+    if request.method == 'DELETE':
+        querystats.reset_stats()
+        response_data = {'success': True}
+    else:
+        response_data = {
+            'budget': querystats.get_budget_config(),
+            'views': querystats.get_stats(),
+        }
+
+    if DRF_AVAILABLE:
+        return Response(response_data)
+    else:
+        return JsonResponse(response_data)
+
+
 @api_view(['GET']) if DRF_AVAILABLE else lambda f: f
 @permission_classes([IsAdminUser]) if DRF_AVAILABLE else lambda f: f
 def admin_order_detail_api(request, order_id):
@@ -1068,6 +1071,7 @@ def admin_order_detail_api(request, order_id):
 
 @api_view(['GET']) if DRF_AVAILABLE else lambda f: f
 @permission_classes([IsAdminUser]) if DRF_AVAILABLE else lambda f: f
+@analytics_reads()
 def admin_customer_detail_api(request, customer_id):
     """Single customer detail API endpoint"""
     try:
@@ -1096,16 +1100,7 @@ def admin_customer_detail_api(request, customer_id):
         
         # Add recent orders
         recent_orders = customer_orders.order_by('-created_at')[:5]
-        if DRF_AVAILABLE:
-            customer_data['recent_orders'] = OrderSerializer(recent_orders, many=True).data
-        else:
-            customer_data['recent_orders'] = [{
-                'id': order.id,
-                'order_id': str(order.order_id),
-                'total_amount': float(order.total_amount),
-                'status': order.status,
-                'created_at': order.created_at.isoformat()
-            } for order in recent_orders]
+        customer_data['recent_orders'] = ORDER.serialize(recent_orders)
         
         if DRF_AVAILABLE:
             return Response(customer_data)
@@ -1159,25 +1154,130 @@ def inventory_alerts_api(request):
     })
 
 
-@api_view(['POST'])
-@permission_classes([IsAdminUser])
+@api_view(['POST']) if DRF_AVAILABLE else lambda f: f
+@permission_classes([IsAdminUser]) if DRF_AVAILABLE else lambda f: f
 def bulk_stock_update(request):
-    """Bulk update stock levels"""
+    """
+    Bulk update stock levels in one transaction.
+    
+    Body: ``{"updates": [{"id": 1, "stock": 20}, {"id": 2, "delta": -3}]}``
+    where ``stock`` sets an absolute count and ``delta`` adjusts it.
+    Stock never drops below the units held in carts; items kept above the
+    count asked for are listed in ``clamped_ids``.
+    """
+    if DRF_AVAILABLE:
+        data = request.data
+    else:
+        import json
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    
+    if not isinstance(data, dict):
+        error_response = {'error': 'Request body must be a JSON object'}
+        if DRF_AVAILABLE:
+            return Response(error_response, status=400)
+        else:
+            return JsonResponse(error_response, status=400)
+    
+    changes, errors = parse_stock_updates(data.get('updates', []))
+    if errors:
+        response_data = {'success': False, 'error': 'Invalid stock updates', 'errors': errors}
+        if DRF_AVAILABLE:
+            return Response(response_data, status=400)
+        else:
+            return JsonResponse(response_data, status=400)
+    
     try:
-        updates = request.data.get('updates', [])
-        
-        for update in updates:
-            item_id = update.get('id')
-            new_stock = update.get('stock')
-            
-            if item_id and new_stock is not None:
-                MenuItem.objects.filter(id=item_id).update(stock=new_stock)
-        
-        return Response({
-            'success': True,
-            'message': f'Updated stock for {len(updates)} items',
-            'updated_count': len(updates)
-        })
-        
+        results, invalid_ids, clamped_ids = apply_stock_changes(changes)
     except Exception as e:
-        return Response({'error': str(e)}, status=500)
\ No newline at end of file
+        error_response = {'error': str(e)}
+        if DRF_AVAILABLE:
+            return Response(error_response, status=500)
+        else:
+            return JsonResponse(error_response, status=500)
+    
+    response_data = {
+        'success': True,
+        'message': f'Updated stock for {len(results)} items',
+        'updated_count': len(results),
+        'items': results,
+        'invalid_ids': invalid_ids,
+        'clamped_ids': clamped_ids,
+    }
+    if DRF_AVAILABLE:
+        return Response(response_data)
+    else:
+        return JsonResponse(response_data)
+
+
+# ============================================================================
+# CATALOG IMPORT / EXPORT
+# ============================================================================
+
+@api_view(['POST']) if DRF_AVAILABLE else lambda f: f
+@permission_classes([IsAdminUser]) if DRF_AVAILABLE else lambda f: f
+def admin_catalog_import_api(request):
+    """
+    Import a CSV/JSON catalog file (multipart ``file`` field or raw body).
+    Pass ``dry_run=1`` to preview changes and ``prune=1`` to mark items
+    missing from the file as unavailable.
+    """
+    uploaded = None
+    if request.content_type and 'multipart/form-data' in request.content_type:
+        uploaded = request.FILES.get('file')
+        if uploaded is None:
+            error_response = {'error': 'Catalog file is required'}
+            if DRF_AVAILABLE:
+                return Response(error_response, status=400)
+            else:
+                return JsonResponse(error_response, status=400)
+        content = uploaded.read()
+    else:
+        content = request.body
+    
+    fmt = request.GET.get('file_format')
+    if not fmt:
+        if uploaded is not None and uploaded.name.lower().endswith('.json'):
+            fmt = 'json'
+        elif uploaded is None and 'json' in (request.content_type or ''):
+            fmt = 'json'
+        else:
+            fmt = 'csv'
+    
+    try:
+        summary = import_catalog(
+            content,
+            fmt=fmt,
+            dry_run=request.GET.get('dry_run') in ['1', 'true'],
+            prune=request.GET.get('prune') in ['1', 'true'],
+        )
+        response_data = {'success': True, **summary}
+        status_code = 200
+    except CatalogImportError as e:
+        response_data = {'success': False, 'error': str(e), 'errors': e.errors}
+        status_code = 400
+    
+    if DRF_AVAILABLE:
+        return Response(response_data, status=status_code)
+    else:
+        return JsonResponse(response_data, status=status_code)
+
+
+@api_view(['GET']) if DRF_AVAILABLE else lambda f: f
+@permission_classes([IsAdminUser]) if DRF_AVAILABLE else lambda f: f
+def admin_catalog_export_api(request):
+    """Download the whole catalog as CSV (default) or JSON"""
+    fmt = request.GET.get('file_format', 'csv')
+    if fmt not in CATALOG_FORMATS:
+        error_response = {'error': f'Unsupported format: {fmt}'}
+        if DRF_AVAILABLE:
+            return Response(error_response, status=400)
+        else:
+            return JsonResponse(error_response, status=400)
+    
+    content_type = 'application/json' if fmt == 'json' else 'text/csv'
+    response = HttpResponse(export_catalog(fmt), content_type=f'{content_type}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="catalog.{fmt}"'
+    return response
@@ -0,0 +1,291 @@
+"""
+Endpoint benchmarks.
+
+Times the key shop and dashboard views through the Django test client and
+reports latency percentiles and query counts, which can be compared
+against a stored baseline so regressions fail the run. Also compares the
+DRF serializers with their compiled fastserializers counterparts. Used by
+the ``benchmark`` management command and by the test suite.
+"""
+import json
+import math
+import os
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Cart, CartItem, Category, Coupon, MenuItem, Order
+
+BASELINE_PATH = os.path.join(settings.BASE_DIR, 'benchmark_baseline.json')
+DEFAULT_TOLERANCE = 0.25
+# Ignore p95 changes smaller than this; they are timer noise
+MIN_REGRESSION_MS = 2.0
+
+BENCHMARK_NAMES = [
+    'menu',
+    'advanced_search',
+    'search_suggestions',
+    'item_reviews',
+    'review_helpful',
+    'add_to_cart',
+    'checkout',
+    'best_coupon',
+    'dashboard_analytics',
+    'admin_reports_api',
+    'admin_products_api',
+    'admin_orders_api',
+    'admin_customers_api',
+]
+
+
+# Transaction bookkeeping differs between autocommit and TestCase runs
+SAVEPOINT_PREFIXES = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+
+class QueryCounter:
+    """Execute wrapper counting queries on every connection, savepoints excluded"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(SAVEPOINT_PREFIXES):
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _benchmark_users():
+    customer, _ = User.objects.get_or_create(
+        username='bench_customer', defaults={'email': 'bench_customer@example.com'}
+    )
+    staff, _ = User.objects.get_or_create(
+        username='bench_staff', defaults={'email': 'bench_staff@example.com', 'is_staff': True}
+    )
+    return customer, staff
+
+
+def _benchmark_coupon():
+    now = timezone.now()
+    Coupon.objects.update_or_create(code='BENCH10', defaults={
+        'name': 'Benchmark 10% off', 'discount_type': 'percentage', 'discount_value': 10,
+        'valid_from': now - timedelta(days=1), 'valid_to': now + timedelta(days=365),
+    })
+
+
+def build_scenarios():
+    """
+    Return ``{name: (client, request, setup)}``. ``request(client)`` is
+    timed; ``setup()`` runs untimed before each request.
+    """
+    customer, staff = _benchmark_users()
+    _benchmark_coupon()
+    anonymous = Client()
+    customer_client = Client()
+    customer_client.force_login(customer)
+    staff_client = Client()
+    staff_client.force_login(staff)
+
+    item = MenuItem.objects.filter(is_available=True).order_by('id').first()
+    if item is None:
+        raise ValueError('Benchmarks need at least one available menu item')
+    # add_to_cart reserves and checkout sells stock on every run
+    MenuItem.objects.filter(pk=item.pk).update(stock=1_000_000)
+    cart, _ = Cart.objects.get_or_create(user=customer)
+    reviewed = MenuItem.objects.annotate(review_count=Count('reviews')).order_by('-review_count', 'id').first()
+    review = reviewed.reviews.order_by('-helpful_count', 'id').first()
+
+    def fill_cart():
+        CartItem.objects.get_or_create(cart=cart, menu_item=item, defaults={'quantity': 1})
+
+    no_setup = None
+    return {
+        'menu': (anonymous, lambda c: c.get(reverse('menu')), no_setup),
+        'advanced_search': (
+            anonymous, lambda c: c.get(reverse('advanced_search'), {'q': 'latte', 'sort': 'price_low'}), no_setup,
+        ),
+        'search_suggestions': (
+            anonymous, lambda c: c.get(reverse('search_suggestions'), {'q': 'lat'}), no_setup,
+        ),
+        'item_reviews': (
+            anonymous, lambda c: c.get(reverse('get_reviews', args=[reviewed.id]), {'sort': 'helpful'}), no_setup,
+        ),
+        # Toggles the customer's vote, so runs alternate between adding and removing it
+        'review_helpful': (
+            customer_client, lambda c: c.post(reverse('mark_review_helpful', args=[review.id])), no_setup,
+        ),
+        'add_to_cart': (
+            customer_client, lambda c: c.post(reverse('add_to_cart', args=[item.id]), {'quantity': 1}), no_setup,
+        ),
+        'checkout': (
+            customer_client, lambda c: c.post(reverse('checkout'), {'notes': 'benchmark'}), fill_cart,
+        ),
+        'best_coupon': (
+            customer_client,
+            lambda c: c.post(reverse('apply_coupon'), {'auto': True}, content_type='application/json'),
+            fill_cart,
+        ),
+        'dashboard_analytics': (
+            staff_client, lambda c: c.get(reverse('dashboard_analytics'), {'days': 30}), no_setup,
+        ),
+        'admin_reports_api': (
+            staff_client, lambda c: c.get(reverse('admin_reports_api'), {'type': 'sales'}), no_setup,
+        ),
+        'admin_products_api': (staff_client, lambda c: c.get(reverse('admin_products_api')), no_setup),
+        'admin_orders_api': (staff_client, lambda c: c.get(reverse('admin_orders_api')), no_setup),
+        'admin_customers_api': (staff_client, lambda c: c.get(reverse('admin_customers_api')), no_setup),
+    }
+
+
+def run_benchmarks(iterations=20, warmup=2, names=None):
+    """
+    Time each scenario. Query counts come from the last warmup request
+    (caches warm, as in steady state) so counting does not skew the timed
+    runs.
+    """
+    scenarios = build_scenarios()
+    results = {}
+
+    for name in names or BENCHMARK_NAMES:
+        client, request, setup = scenarios[name]
+
+        for _ in range(max(1, warmup)):
+            if setup:
+                setup()
+            with QueryCounter() as counter:
+                response = request(client)
+        queries = counter.count
+
+        timings = []
+        for _ in range(iterations):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            response = request(client)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        results[name] = {
+            'iterations': iterations,
+            'status': response.status_code,
+            'queries': queries,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'p99_ms': round(percentile(timings, 99), 2),
+            'mean_ms': round(sum(timings) / len(timings), 2),
+        }
+    return results
+
+
+def _serializer_pairs():
+    """``{name: (DRF serializer class, fastserializers.RowSerializer, queryset)}``"""
+    from . import fastserializers as fast
+    from . import serializers
+
+    return {
+        'menu_item_list': (
+            serializers.MenuItemListSerializer, fast.MENU_ITEM_LIST, MenuItem.objects.filter(is_available=True),
+        ),
+        'menu_item': (serializers.MenuItemSerializer, fast.MENU_ITEM, MenuItem.objects.order_by('-created_at')),
+        'category': (serializers.CategorySerializer, fast.CATEGORY, Category.objects.all()),
+        'order': (serializers.OrderSerializer, fast.ORDER, Order.objects.order_by('-created_at')[:50]),
+        'user': (serializers.UserSerializer, fast.USER, User.objects.filter(is_staff=False)[:50]),
+    }
+
+
+def _timed(encode, iterations):
+    with QueryCounter() as counter:
+        output = encode()
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        encode()
+        timings.append((time.perf_counter() - start) * 1000)
+    return output, counter.count, timings
+
+
+def run_serializer_benchmarks(iterations=10):
+    """
+    Encode the same querysets with the DRF serializers and their compiled
+    fastserializers counterparts, and report both timings, query counts and
+    whether the JSON output is identical
+    """
+    from rest_framework.renderers import JSONRenderer
+
+    results = {}
+    for name, (drf_class, fast, queryset) in _serializer_pairs().items():
+        drf_output, drf_queries, drf_timings = _timed(
+            lambda: drf_class(queryset.all(), many=True).data, iterations
+        )
+        fast_output, fast_queries, fast_timings = _timed(lambda: fast.serialize(queryset.all()), iterations)
+
+        drf_ms = percentile(drf_timings, 50)
+        fast_ms = percentile(fast_timings, 50)
+        results[name] = {
+            'rows': len(fast_output),
+            'drf_queries': drf_queries,
+            'fast_queries': fast_queries,
+            'drf_p50_ms': round(drf_ms, 2),
+            'fast_p50_ms': round(fast_ms, 2),
+            'speedup': round(drf_ms / fast_ms, 1) if fast_ms else None,
+            'same_output': JSONRenderer().render(drf_output) == JSONRenderer().render(fast_output),
+        }
+    return results
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(scale, results, path=BASELINE_PATH):
+    baseline = load_baseline(path)
+    baseline[scale] = results
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE, check_timings=True):
+    """
+    Return a list of regression messages: more queries than the baseline,
+    or (with ``check_timings``) a p95 more than ``tolerance`` slower
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result['queries'] > base['queries']:
+            regressions.append(f'{name}: {result["queries"]} queries (baseline {base["queries"]})')
+        if check_timings:
+            limit = base['p95_ms'] * (1 + tolerance)
+            if result['p95_ms'] > limit and result['p95_ms'] - base['p95_ms'] > MIN_REGRESSION_MS:
+                regressions.append(
+                    f'{name}: p95 {result["p95_ms"]}ms (baseline {base["p95_ms"]}ms, limit {limit:.2f}ms)'
+                )
+    return regressions
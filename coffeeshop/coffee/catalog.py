@@ -0,0 +1,73 @@
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .models import Category
+
+# Cache keys for catalog data
+CATALOG_VERSION_KEY = 'coffee:catalog_version'
+CATALOG_CACHE_TIMEOUT = 60 * 60  # 1 hour
+
+# Matches MenuItem.stock_status
+LOW_STOCK_THRESHOLD = 5
+
+
+def get_catalog_version():
+    """Return the current catalog version, initialising it if needed"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    """Invalidate every cache entry keyed by the catalog version"""
+    try:
+        return cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        # Key missing (first write or cache cleared)
+        cache.add(CATALOG_VERSION_KEY, 2, timeout=None)
+        return cache.get(CATALOG_VERSION_KEY, 2)
+
+
+def catalog_cache_key(name, *parts):
+    """Build a cache key that changes whenever the catalog changes"""
+    suffix = ':'.join(str(part) for part in parts)
+    key = f'coffee:catalog:v{get_catalog_version()}:{name}'
+    return f'{key}:{suffix}' if suffix else key
+
+
+def annotate_item_counts(queryset):
+    """Annotate a Category queryset with menu item counts by stock status"""
+    return queryset.annotate(
+        items_count=Count('menuitem'),
+        available_count=Count('menuitem', filter=Q(menuitem__is_available=True)),
+        low_stock_count=Count(
+            'menuitem',
+            filter=Q(menuitem__stock__gt=0, menuitem__stock__lte=LOW_STOCK_THRESHOLD),
+        ),
+        out_of_stock_count=Count('menuitem', filter=Q(menuitem__stock=0)),
+    )
+
+
+def get_category_listing():
+    """
+    Return all categories with item counts, computed in a single query
+    and cached against the catalog version
+    """
+    key = catalog_cache_key('categories')
+    listing = cache.get(key)
+    if listing is not None:
+        return listing
+
+    categories = annotate_item_counts(Category.objects.all()).order_by('name').values(
+        'id', 'name', 'description', 'image_url', 'is_active', 'created_at',
+        'items_count', 'available_count', 'low_stock_count', 'out_of_stock_count',
+    )
+    listing = []
+    for category in categories:
+        category['created_at'] = category['created_at'].isoformat()
+        listing.append(category)
+
+    cache.set(key, listing, CATALOG_CACHE_TIMEOUT)
+    return listing
@@ -0,0 +1,304 @@
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MenuItem, Category
+from .catalog import bump_catalog_version
+
+# Columns understood by the importer, in export order.
+# ``name`` is the natural key used to match rows against existing items.
+CATALOG_FIELDS = [
+    'name', 'description', 'price', 'category', 'category_name',
+    'image_url', 'stock', 'is_available', 'is_featured',
+]
+CATALOG_FORMATS = ['csv', 'json']
+DEFAULT_BATCH_SIZE = 500
+
+TRUE_VALUES = ['1', 'true', 'yes', 'y', 'on']
+FALSE_VALUES = ['0', 'false', 'no', 'n', 'off', '']
+
+
+class CatalogImportError(Exception):
+    """Raised when a catalog file fails validation; nothing is written"""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f'{len(errors)} invalid row(s) in catalog file')
+
+
+def parse_catalog(content, fmt='csv'):
+    """Parse CSV or JSON catalog content into a list of row dicts"""
+    if isinstance(content, bytes):
+        try:
+            content = content.decode('utf-8-sig')
+        except UnicodeDecodeError as e:
+            raise CatalogImportError([{'row': None, 'errors': [f'File is not valid UTF-8: {e}']}])
+
+    if fmt == 'csv':
+        try:
+            return list(csv.DictReader(io.StringIO(content)))
+        except csv.Error as e:
+            raise CatalogImportError([{'row': None, 'errors': [f'Invalid CSV: {e}']}])
+    if fmt == 'json':
+        try:
+            data = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise CatalogImportError([{'row': None, 'errors': [f'Invalid JSON: {e}']}])
+        # Accept either a bare list or the {"items": [...]} export shape
+        if isinstance(data, dict):
+            data = data.get('items', [])
+        if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+            raise CatalogImportError([{'row': None, 'errors': ['Expected a list of item objects']}])
+        return data
+    raise CatalogImportError([{'row': None, 'errors': [f'Unsupported format: {fmt}']}])
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in TRUE_VALUES:
+        return True
+    if value in FALSE_VALUES:
+        return False
+    raise ValueError(f'Invalid boolean: {value}')
+
+
+def validate_rows(rows):
+    """
+    Validate every row of a catalog file.
+
+    Returns the cleaned rows (only the columns present in each row) or
+    raises CatalogImportError listing every problem found.
+    """
+    categories = {name.lower(): pk for pk, name in Category.objects.values_list('id', 'name')}
+    category_codes = dict(MenuItem.CATEGORY_CHOICES)
+
+    cleaned_rows = []
+    errors = []
+    seen_names = set()
+
+    for index, row in enumerate(rows, start=1):
+        cleaned = {}
+        row_errors = []
+
+        name = str(row.get('name') or '').strip()
+        if not name:
+            row_errors.append('name is required')
+        elif name.lower() in seen_names:
+            row_errors.append(f'duplicate name "{name}" in file')
+        else:
+            seen_names.add(name.lower())
+        cleaned['name'] = name
+
+        if 'description' in row:
+            cleaned['description'] = str(row['description'] or '')
+
+        if 'price' in row:
+            try:
+                price = Decimal(str(row['price']).strip()).quantize(Decimal('0.01'))
+                if price < 0:
+                    raise InvalidOperation
+                cleaned['price'] = price
+            except (InvalidOperation, ValueError):
+                row_errors.append(f'invalid price "{row["price"]}"')
+        elif name:
+            cleaned['_price_missing'] = True
+
+        if row.get('category'):
+            if isinstance(row['category'], str) and row['category'] in category_codes:
+                cleaned['category'] = row['category']
+            else:
+                row_errors.append(f'unknown category "{row["category"]}"')
+
+        if 'category_name' in row:
+            category_name = str(row['category_name'] or '').strip()
+            if not category_name:
+                cleaned['category_obj_id'] = None
+            elif category_name.lower() in categories:
+                cleaned['category_obj_id'] = categories[category_name.lower()]
+            else:
+                row_errors.append(f'unknown category_name "{category_name}"')
+
+        if 'image_url' in row:
+            cleaned['image_url'] = str(row['image_url'] or '').strip() or None
+
+        if row.get('stock') not in (None, ''):
+            try:
+                stock = int(row['stock'])
+                if stock < 0:
+                    raise ValueError
+                cleaned['stock'] = stock
+            except (TypeError, ValueError):
+                row_errors.append(f'invalid stock "{row["stock"]}"')
+
+        for field in ['is_available', 'is_featured']:
+            if field in row:
+                try:
+                    cleaned[field] = _parse_bool(row[field])
+                except ValueError:
+                    row_errors.append(f'invalid {field} "{row[field]}"')
+
+        if row_errors:
+            errors.append({'row': index, 'name': name, 'errors': row_errors})
+        cleaned_rows.append(cleaned)
+
+    if errors:
+        raise CatalogImportError(errors)
+    return cleaned_rows
+
+
+def plan_import(cleaned_rows):
+    """
+    Diff cleaned rows against existing menu items by name.
+
+    Returns a dict with ``create`` (unsaved MenuItems), ``update`` (changed
+    MenuItems), ``update_fields``, ``unchanged`` and ``missing`` (ids of
+    existing items absent from the file).
+    """
+    existing = {}
+    ambiguous = set()
+    all_ids = []
+    for item in MenuItem.objects.all():
+        all_ids.append(item.id)
+        key = item.name.lower()
+        if key in existing:
+            ambiguous.add(key)
+        existing[key] = item
+
+    to_create = []
+    to_update = []
+    update_fields = set()
+    unchanged = 0
+    errors = []
+    matched_ids = set()
+
+    for index, row in enumerate(cleaned_rows, start=1):
+        key = row['name'].lower()
+        if key in ambiguous:
+            errors.append({'row': index, 'name': row['name'],
+                           'errors': ['name matches more than one existing item']})
+            continue
+
+        item = existing.get(key)
+        fields = {k: v for k, v in row.items() if not k.startswith('_')}
+
+        if item is None:
+            if row.get('_price_missing'):
+                errors.append({'row': index, 'name': row['name'],
+                               'errors': ['price is required for new items']})
+                continue
+            to_create.append(MenuItem(**fields))
+            continue
+
+        matched_ids.add(item.id)
+        changed = False
+        for field, value in fields.items():
+            if getattr(item, field) != value:
+                setattr(item, field, value)
+                update_fields.add(field)
+                changed = True
+        if changed:
+            to_update.append(item)
+        else:
+            unchanged += 1
+
+    if errors:
+        raise CatalogImportError(errors)
+
+    missing = [item_id for item_id in all_ids if item_id not in matched_ids]
+    if update_fields:
+        update_fields.add('updated_at')
+
+    return {
+        'create': to_create,
+        'update': to_update,
+        'update_fields': sorted(update_fields),
+        'unchanged': unchanged,
+        'missing': missing,
+    }
+
+
+def apply_import(cleaned_rows, batch_size=DEFAULT_BATCH_SIZE, prune=False):
+    """
+    Plan and apply an import with batched bulk writes inside one
+    transaction, so the diff is taken against the rows being written.
+
+    Bulk writes skip the per-item post_save signals (and their notification
+    emails), so the catalog version is bumped once at the end instead.
+    With ``prune``, existing items missing from the file are marked
+    unavailable rather than deleted, keeping order history intact.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        plan = plan_import(cleaned_rows)
+        if plan['create']:
+            MenuItem.objects.bulk_create(plan['create'], batch_size=batch_size)
+        if plan['update']:
+            for item in plan['update']:
+                item.updated_at = now
+            MenuItem.objects.bulk_update(plan['update'], plan['update_fields'], batch_size=batch_size)
+        pruned = 0
+        if prune and plan['missing']:
+            pruned = MenuItem.objects.filter(
+                id__in=plan['missing'], is_available=True
+            ).update(is_available=False, updated_at=now)
+        transaction.on_commit(bump_catalog_version)
+
+    return summarize_plan(plan, pruned=pruned)
+
+
+def summarize_plan(plan, pruned=0):
+    return {
+        'created': len(plan['create']),
+        'updated': len(plan['update']),
+        'unchanged': plan['unchanged'],
+        'missing': len(plan['missing']),
+        'pruned': pruned,
+    }
+
+
+def import_rows(rows, dry_run=False, prune=False, batch_size=DEFAULT_BATCH_SIZE):
+    """Validate, diff and (unless dry_run) apply already-parsed catalog rows"""
+    cleaned_rows = validate_rows(rows)
+    if dry_run:
+        return summarize_plan(plan_import(cleaned_rows))
+    return apply_import(cleaned_rows, batch_size=batch_size, prune=prune)
+
+
+def import_catalog(content, fmt='csv', dry_run=False, prune=False, batch_size=DEFAULT_BATCH_SIZE):
+    """Parse, validate, diff and (unless dry_run) apply a catalog file"""
+    rows = parse_catalog(content, fmt)
+    return import_rows(rows, dry_run=dry_run, prune=prune, batch_size=batch_size)
+
+
+def export_rows():
+    """Return every menu item as a catalog row dict"""
+    items = MenuItem.objects.order_by('name').values(
+        'name', 'description', 'price', 'category', 'category_obj__name',
+        'image_url', 'stock', 'is_available', 'is_featured',
+    )
+    rows = []
+    for item in items:
+        item['category_name'] = item.pop('category_obj__name') or ''
+        item['price'] = str(item['price'])
+        item['image_url'] = item['image_url'] or ''
+        rows.append(item)
+    return rows
+
+
+def export_catalog(fmt='csv'):
+    """Serialize the whole catalog as CSV or JSON text"""
+    rows = export_rows()
+    if fmt == 'json':
+        return json.dumps({'items': rows}, indent=2, ensure_ascii=False)
+
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=CATALOG_FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue()
@@ -0,0 +1,145 @@
+"""
+In-process coupon table.
+
+Every process keeps all coupons in a dict keyed by code, so looking up,
+validating and pricing a coupon costs no query. The table is reloaded
+when COUPON_VERSION_KEY changes in the cache (on any Coupon save/delete
+and whenever a coupon runs out) or when its stamp, the newest
+Coupon.updated_at and the coupon count, changes. The version key only
+reaches other processes with a shared cache backend, so the stamp is
+re-read every COUPON_TABLE_CHECK_SECONDS as well; with the default
+per-process cache that is how long other workers take to see a change.
+
+The table's used_count is only a hint. A redemption is enforced by
+claim_coupon's conditional UPDATE (``used_count < usage_limit``), which
+callers run inside the transaction that also records the CouponUsage,
+so a limit can never be overspent.
+"""
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from .models import Coupon
+
+COUPON_VERSION_KEY = 'coffee:coupon_version'
+CENT = Decimal('0.01')
+
+# (version, stamp, monotonic time the stamp was read, {code: Coupon},
+# [coupons worth trying for best_coupon])
+_table = (None, None, 0.0, {}, [])
+
+
+class CouponError(ValueError):
+    """A coupon that cannot be applied; the message is shown to the customer"""
+
+
+def get_coupon_version():
+    version = cache.get(COUPON_VERSION_KEY)
+    if version is None:
+        cache.add(COUPON_VERSION_KEY, 1, timeout=None)
+        version = cache.get(COUPON_VERSION_KEY, 1)
+    return version
+
+
+def bump_coupon_version():
+    """Make every process reload its coupon table"""
+    try:
+        return cache.incr(COUPON_VERSION_KEY)
+    except ValueError:
+        cache.add(COUPON_VERSION_KEY, 2, timeout=None)
+        return cache.get(COUPON_VERSION_KEY, 2)
+
+
+def coupon_stamp():
+    """Changes whenever a coupon is saved, deleted or runs out"""
+    stamp = Coupon.objects.aggregate(latest=Max('updated_at'), count=Count('id'))
+    return stamp['latest'], stamp['count']
+
+
+def _load_table():
+    now = timezone.now()
+    coupons = {coupon.code: coupon for coupon in Coupon.objects.order_by('id')}
+    candidates = [
+        coupon for coupon in coupons.values()
+        if coupon.is_active and coupon.valid_to >= now and coupon.discount_type != 'free_shipping'
+        and (coupon.usage_limit is None or coupon.used_count < coupon.usage_limit)
+    ]
+    return coupons, candidates
+
+
+def coupon_table():
+    """Return ``(coupons by code, best_coupon candidates)``, reloading if stale"""
+    global _table
+    version, stamp, checked, coupons, candidates = _table
+    now = time.monotonic()
+    current = get_coupon_version()
+    if current == version and now - checked < getattr(settings, 'COUPON_TABLE_CHECK_SECONDS', 30):
+        return coupons, candidates
+
+    current_stamp = coupon_stamp()
+    if current != version or current_stamp != stamp:
+        coupons, candidates = _load_table()
+    _table = (current, current_stamp, now, coupons, candidates)
+    return coupons, candidates
+
+
+def discount_for(coupon, amount):
+    """Discount ``coupon`` gives on ``amount``, rounded to the penny (0 if none)"""
+    return Decimal(coupon.calculate_discount(amount)).quantize(CENT)
+
+
+def check_coupon(code, amount):
+    """
+    Return ``(coupon, discount)`` for applying ``code`` to ``amount``, or
+    raise CouponError
+    """
+    coupon = coupon_table()[0].get(code)
+    if coupon is None:
+        raise CouponError('Invalid coupon code')
+    if not coupon.is_valid:
+        raise CouponError('This coupon has expired or is no longer valid')
+    discount = discount_for(coupon, amount)
+    if discount <= 0:
+        raise CouponError(f'Order total must be at least ₹{coupon.minimum_amount} to use this coupon')
+    return coupon, discount
+
+
+def best_coupon(amount):
+    """
+    Return ``(coupon, discount)`` for the coupon saving the most on
+    ``amount``, or ``(None, 0)``. Ties go to the earliest coupon.
+    """
+    best, best_discount = None, Decimal('0')
+    for coupon in coupon_table()[1]:
+        discount = discount_for(coupon, amount)
+        if discount > best_discount:
+            best, best_discount = coupon, discount
+    return best, best_discount
+
+
+def claim_coupon(coupon):
+    """
+    Count one use of ``coupon`` if it is still redeemable, with a single
+    conditional UPDATE. Run it in the transaction that records the
+    CouponUsage. Raises CouponError if the coupon has run out or expired.
+    """
+    now = timezone.now()
+    claimed = Coupon.objects.filter(
+        Q(usage_limit__isnull=True) | Q(used_count__lt=F('usage_limit')),
+        id=coupon.id, is_active=True, valid_from__lte=now, valid_to__gte=now,
+    ).update(used_count=F('used_count') + 1)
+    if not claimed:
+        # Our table still offered it, so it is stale everywhere
+        bump_coupon_version()
+        raise CouponError('This coupon has expired or is no longer valid')
+    if coupon.usage_limit is not None and Coupon.objects.filter(
+        id=coupon.id, used_count__gte=F('usage_limit')
+    ).update(updated_at=now):
+        # That was the last use; stop offering it once this commits (the
+        # new updated_at tells processes the version key doesn't reach)
+        transaction.on_commit(bump_coupon_version)
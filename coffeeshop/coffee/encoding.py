@@ -0,0 +1,131 @@
+"""
+Encoding cache for the catalog JSON APIs.
+
+Each menu item's encoded JSON is cached as bytes under its id and
+updated_at, so a list response only serializes the items that changed
+since they were last encoded; the rest are spliced in as-is. Whole list
+responses are then cached per URL against the catalog version, together
+with a gzip copy and an ETag, and served without re-encoding: gzip to
+clients that accept it, 304 to clients that already hold the body.
+"""
+import gzip
+import hashlib
+import json
+import re
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from .catalog import CATALOG_CACHE_TIMEOUT, catalog_cache_key
+
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+GZIP_LEVEL = 6
+_ACCEPTS_GZIP_RE = re.compile(r'\bgzip\b')
+
+
+def encode(data):
+    return json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+
+
+class Fragment:
+    """Pre-encoded JSON bytes to be spliced into a larger document"""
+
+    def __init__(self, encoded, count=None):
+        self.encoded = encoded
+        self.count = count
+
+
+def fragment_key(namespace, item_id, updated_at):
+    return f'coffee:json:{namespace}:{item_id}:{updated_at.timestamp()}'
+
+
+def encode_items(queryset, serializer, namespace, fields=None):
+    """
+    Return a Fragment holding the JSON array of ``queryset``, encoding (with
+    the fastserializers.RowSerializer ``serializer``, limited to ``fields``)
+    only the rows missing from the cache
+    """
+    if fields:
+        namespace = f'{namespace}:{",".join(fields)}'
+    rows = list(queryset.values_list('id', 'updated_at'))
+    keys = {item_id: fragment_key(namespace, item_id, updated_at) for item_id, updated_at in rows}
+    cached = cache.get_many(keys.values())
+    encoded = {item_id: cached[key] for item_id, key in keys.items() if key in cached}
+
+    missing = [item_id for item_id in keys if item_id not in encoded]
+    if missing:
+        fresh = {}
+        stale = queryset.model.objects.filter(id__in=missing)
+        for row, data in serializer.iter_encoded(stale, fields, extra=('id', 'updated_at')):
+            encoded[row['id']] = encode(data)
+            fresh[fragment_key(namespace, row['id'], row['updated_at'])] = encoded[row['id']]
+        cache.set_many(fresh, FRAGMENT_TIMEOUT)
+
+    # Keeps the queryset's order; items deleted meanwhile are left out
+    items = [encoded[item_id] for item_id, _ in rows if item_id in encoded]
+    return Fragment(b'[' + b','.join(items) + b']', count=len(items))
+
+
+def encode_document(data):
+    """Encode ``data`` to JSON bytes, splicing in any Fragment values"""
+    fragments = []
+
+    def placeholder(fragment):
+        fragments.append(fragment.encoded)
+        return f'\x00{len(fragments) - 1}\x00'
+
+    def substitute(value):
+        if isinstance(value, Fragment):
+            return placeholder(value)
+        if isinstance(value, dict):
+            return {key: substitute(item) for key, item in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [substitute(item) for item in value]
+        return value
+
+    body = encode(substitute(data))
+    for index, encoded in enumerate(fragments):
+        body = body.replace(b'"\\u0000%d\\u0000"' % index, encoded, 1)
+    return body
+
+
+def build_entry(body):
+    return {
+        'body': body,
+        'gzip': gzip.compress(body, GZIP_LEVEL, mtime=0),
+        'etag': '"%s"' % hashlib.md5(body).hexdigest(),
+    }
+
+
+def encoded_response(request, entry):
+    """Serve a cached entry as 304, gzip or plain JSON"""
+    gzipped = bool(_ACCEPTS_GZIP_RE.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+    # Each encoding is a different representation and needs its own ETag
+    etag = entry['etag'][:-1] + '-gzip"' if gzipped else entry['etag']
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    elif gzipped:
+        response = HttpResponse(entry['gzip'], content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(entry['body'], content_type='application/json')
+    response['ETag'] = etag
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+def cached_json_response(request, name, build, cacheable=True):
+    """
+    Respond with the document ``build()`` returns (a dict, possibly holding
+    Fragments), cached per URL until the catalog changes
+    """
+    key = catalog_cache_key('api', name, request.get_full_path())
+    entry = cache.get(key) if cacheable else None
+    if entry is None:
+        entry = build_entry(encode_document(build()))
+        if cacheable:
+            cache.set(key, entry, CATALOG_CACHE_TIMEOUT)
+    return encoded_response(request, entry)
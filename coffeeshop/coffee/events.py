@@ -0,0 +1,233 @@
+"""
+Order lifecycle events, streamed as Server-Sent Events.
+
+Order status transitions are published (after commit) to an in-process
+broker that keeps the last ORDER_EVENT_BUFFER events. The staff stream
+carries every order's events; the customer stream only those of one
+order_id. A new connection first receives a snapshot (all active orders,
+or the one order) and then live events. A client reconnecting with
+Last-Event-ID is replayed what it missed from the buffer, or sent a fresh
+snapshot when its id is too old or from another process.
+
+Events only reach streams in the process that saved the order, so serve
+the streams from the ASGI process that handles order updates. Streams are
+refused with a 503 under WSGI, where each would hold a worker thread, and
+beyond ORDER_EVENT_MAX_STREAMS open at once; pages then poll the order
+status API every ORDER_STATUS_POLL_SECONDS instead.
+"""
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .models import Order
+
+ACTIVE_STATUSES = ('pending', 'confirmed', 'preparing', 'ready')
+RETRY_MS = 3000
+# An SSE comment: keeps proxies from timing the connection out
+HEARTBEAT = ': heartbeat\n\n'
+
+
+def order_payload(order, previous_status=None):
+    return {
+        'order_id': str(order.order_id),
+        'id': order.id,
+        'status': order.status,
+        'status_display': order.get_status_display(),
+        'previous_status': previous_status,
+        'customer_name': order.customer_name,
+        'total_amount': order.total_amount,
+        'currency': order.currency,
+        'updated_at': order.updated_at,
+    }
+
+
+def format_event(event_id, name, data):
+    payload = json.dumps(data, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return f'id: {event_id}\nevent: {name}\ndata: {payload}\n\n'
+
+
+class OrderEventBroker:
+    """
+    Thread-safe ring buffer of ``(seq, order_id, payload)`` events that
+    wakes asyncio listeners on publish and counts the open streams
+    """
+
+    def __init__(self, buffer_size):
+        # Event ids carry it, so ids from before a restart or from another process are recognised
+        self.boot = uuid.uuid4().hex[:8]
+        self.events = deque(maxlen=buffer_size)
+        self.seq = 0
+        self.lock = threading.Lock()
+        self.async_waiters = set()
+        self.streams = 0
+
+    def open_stream(self, limit):
+        """Count a new stream unless ``limit`` are open already; returns whether it did"""
+        with self.lock:
+            if self.streams >= limit:
+                return False
+            self.streams += 1
+            return True
+
+    def close_stream(self, stream):
+        """Give back ``stream``'s slot, once however often it is called"""
+        with self.lock:
+            if stream.open:
+                stream.open = False
+                self.streams -= 1
+
+    def publish(self, order_id, payload):
+        with self.lock:
+            self.seq += 1
+            self.events.append((self.seq, str(order_id), payload))
+            waiters = list(self.async_waiters)
+        for loop, flag in waiters:
+            try:
+                loop.call_soon_threadsafe(flag.set)
+            except RuntimeError:
+                # Loop closed under a dropped connection
+                self.remove_waiter((loop, flag))
+
+    def add_waiter(self, waiter):
+        """Register ``(loop, asyncio.Event)`` to be set on every publish"""
+        with self.lock:
+            self.async_waiters.add(waiter)
+
+    def remove_waiter(self, waiter):
+        with self.lock:
+            self.async_waiters.discard(waiter)
+
+    def event_id(self, seq):
+        return f'{self.boot}-{seq}'
+
+    def parse_event_id(self, value):
+        """The sequence number in a Last-Event-ID from this broker, else None"""
+        boot, _, seq = (value or '').partition('-')
+        if boot != self.boot or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def since(self, seq, order_id=None):
+        """
+        Return ``(events after seq, newest seq)``, or ``(None, newest seq)``
+        when some of them have already left the buffer
+        """
+        with self.lock:
+            newest = self.seq
+            if seq is None or (self.events and self.events[0][0] > seq + 1) or seq > newest:
+                return None, newest
+            events = [event for event in self.events if event[0] > seq and (order_id is None or event[1] == order_id)]
+        return events, newest
+
+
+broker = OrderEventBroker(getattr(settings, 'ORDER_EVENT_BUFFER', 1000))
+
+
+def publish_order_event(order, previous_status=None):
+    """Publish ``order`` as it is now, once the current transaction commits"""
+    payload = order_payload(order, previous_status)
+    transaction.on_commit(lambda: broker.publish(payload['order_id'], payload))
+
+
+def snapshot(order_id=None):
+    """The orders a new stream starts from: all active ones, or the one order"""
+    if order_id is None:
+        orders = Order.objects.filter(status__in=ACTIVE_STATUSES).order_by('created_at')
+    else:
+        orders = Order.objects.filter(order_id=order_id)
+    return [order_payload(order) for order in orders]
+
+
+class OrderEventStream:
+    """
+    The SSE body for one connection, async-iterated under ASGI. ``order_id``
+    limits it to one order's events. Holds one of the broker's stream slots
+    until the response closes it.
+    """
+
+    def __init__(self, order_id=None, last_event_id=None):
+        self.open = True
+        self.order_id = str(order_id) if order_id else None
+        self.seq = broker.parse_event_id(last_event_id)
+        self.heartbeat = getattr(settings, 'ORDER_EVENT_HEARTBEAT', 15)
+        # Ends the response now and then; the client reconnects with Last-Event-ID
+        self.deadline = time.monotonic() + getattr(settings, 'ORDER_EVENT_STREAM_SECONDS', 300)
+
+    def take(self):
+        """
+        Encoded events the client has not been sent yet, or None when it
+        needs a snapshot instead
+        """
+        events, self.seq = broker.since(self.seq, self.order_id)
+        if events is None:
+            return None
+        return [format_event(broker.event_id(seq), 'order', payload) for seq, _, payload in events]
+
+    def snapshot_event(self, orders):
+        # Events published while the snapshot loads are replayed after it; repeating a status is harmless
+        return format_event(broker.event_id(self.seq), 'snapshot', {'orders': orders})
+
+    async def __aiter__(self):
+        flag = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), flag)
+        broker.add_waiter(waiter)
+        try:
+            yield f'retry: {RETRY_MS}\n\n'
+            while time.monotonic() < self.deadline:
+                # Cleared before reading, so an event published meanwhile still wakes the wait
+                flag.clear()
+                chunks = self.take()
+                if chunks is None:
+                    chunks = [self.snapshot_event(await sync_to_async(snapshot)(self.order_id))]
+                for chunk in chunks:
+                    yield chunk
+                try:
+                    await asyncio.wait_for(flag.wait(), self.heartbeat)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+        finally:
+            broker.remove_waiter(waiter)
+            # A dropped connection cancels the response without closing it
+            self.close()
+
+    def close(self):
+        """Give back the stream slot; StreamingHttpResponse calls it when the response ends"""
+        broker.close_stream(self)
+
+
+def streams_available(request):
+    """Whether ``request`` can be served a stream; pages poll instead when not"""
+    return isinstance(request, ASGIRequest)
+
+
+def order_event_response(request, order_id=None):
+    """
+    Stream order events to ``request``, resuming from its Last-Event-ID, or
+    answer 503 (EventSource then gives up and the page polls) under WSGI or
+    with ORDER_EVENT_MAX_STREAMS streams already open
+    """
+    if not streams_available(request):
+        return _unavailable('Live order updates need the ASGI server; poll the order status instead')
+    if not broker.open_stream(getattr(settings, 'ORDER_EVENT_MAX_STREAMS', 500)):
+        return _unavailable('Too many live order streams; poll the order status instead')
+    stream = OrderEventStream(order_id, request.headers.get('Last-Event-ID') or request.GET.get('last_event_id'))
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _unavailable(message):
+    response = JsonResponse({'error': message}, status=503)
+    response['Retry-After'] = str(getattr(settings, 'ORDER_STATUS_POLL_SECONDS', 15))
+    return response
@@ -0,0 +1,410 @@
+"""
+Compiled fast-path serializers for the list APIs.
+
+A RowSerializer declares its output fields as specs over ``values()``
+lookups. For each set of requested fields it is compiled once into a row
+encoder: the lookups to fetch, the batched queries that load nested rows
+and aggregates for a whole page at once, and one getter per output field.
+Encoding a queryset then runs one ``values()`` query plus one query per
+batch and never creates model instances.
+
+Output matches the DRF serializers in coffee.serializers (decimals as
+strings, datetimes in the current time zone), so these work with or
+without DRF installed. Clients can ask for a sparse fieldset with
+``?fields=id,name,price``; see RowSerializer.parse_fields.
+"""
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from .images import variant_urls
+from .models import Category, MenuItem, Order, OrderItem, Review
+
+
+# ----------------------------------------------------------------------------
+# Value converters (DRF-compatible representations)
+# ----------------------------------------------------------------------------
+
+def decimal_string(places):
+    quantum = Decimal(1).scaleb(-places)
+    return lambda value: None if value is None else '{:f}'.format(value.quantize(quantum))
+
+
+def local_isoformat(value):
+    if value is None:
+        return None
+    value = timezone.localtime(value).isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def choice_display(choices):
+    labels = dict(choices)
+    return lambda value: labels.get(value, value)
+
+
+def file_url(name):
+    return default_storage.url(name) if name else None
+
+
+def rupees(value):
+    return f"₹{value:.0f}"
+
+
+# ----------------------------------------------------------------------------
+# Field specs
+# ----------------------------------------------------------------------------
+
+class Column:
+    """
+    A model field or ``__`` lookup, optionally converted. With ``omit_none``
+    the key is left out when the value is None, as DRF does for a dotted
+    ``source`` through a null relation.
+    """
+
+    def __init__(self, lookup, convert=None, omit_none=False):
+        self.lookup = lookup
+        self.convert = convert
+        self.omit_none = omit_none
+
+    def compile(self, prefix):
+        key = prefix + self.lookup
+        convert = self.convert
+        if convert is None:
+            return (key,), (), lambda row, loaded: row[key]
+        return (key,), (), lambda row, loaded: convert(row[key])
+
+
+class Computed:
+    """A value computed by ``func`` from one or more lookups"""
+
+    def __init__(self, func, *lookups):
+        self.func = func
+        self.lookups = lookups
+
+    def compile(self, prefix):
+        keys = tuple(prefix + lookup for lookup in self.lookups)
+        func = self.func
+        return keys, (), lambda row, loaded: func(*[row[key] for key in keys])
+
+
+class Batched:
+    """
+    A value loaded for the whole page at once. ``load(keys)`` receives the
+    distinct values of ``lookup`` and returns ``{key: value}``; ``pick``
+    extracts this field from the value and rows without one get
+    ``default``. Fields sharing a ``load`` function share its query.
+    """
+
+    def __init__(self, lookup, load, pick=None, default=None):
+        self.lookup = lookup
+        self.load = load
+        self.pick = pick
+        self.default = default
+
+    def compile(self, prefix):
+        key = prefix + self.lookup
+        batch = (self.load, key)
+        pick, default = self.pick, self.default
+
+        def getter(row, loaded):
+            value = loaded[batch].get(row[key])
+            if value is None:
+                return default
+            return pick(value) if pick else value
+        return (key,), (batch,), getter
+
+
+class Nested:
+    """A related object through the foreign key ``lookup``, encoded by ``serializer``"""
+
+    def __init__(self, lookup, serializer, fields=None):
+        self.lookup = lookup
+        self.serializer = serializer
+        self.fields = fields
+
+    def compile(self, prefix):
+        key = prefix + self.lookup
+        encoder = self.serializer.compile(self.fields, prefix=key + '__')
+
+        def getter(row, loaded):
+            if row[key] is None:
+                return None
+            return encoder.encode(row, loaded)
+        return (key,) + encoder.lookups, encoder.batches, getter
+
+
+class Many:
+    """Rows pointing back through the foreign key ``fk`` (a reverse relation), encoded by ``serializer``"""
+
+    def __init__(self, serializer, fk, order_by=('pk',), fields=None):
+        self.serializer = serializer
+        self.fk = fk
+        self.order_by = order_by
+        self.fields = fields
+
+    def compile(self, prefix):
+        key = prefix + 'pk'
+        serializer, fk, order_by, fields = self.serializer, self.fk, self.order_by, self.fields
+
+        def load(keys):
+            queryset = serializer.model.objects.filter(**{f'{fk}__in': keys}).order_by(*order_by)
+            grouped = {}
+            for row, data in serializer.iter_encoded(queryset, fields, extra=(fk,)):
+                grouped.setdefault(row[fk], []).append(data)
+            return grouped
+
+        batch = (load, key)
+        return (key,), (batch,), lambda row, loaded: loaded[batch].get(row[key]) or []
+
+
+def grouped(model, fk, **aggregates):
+    """A Batched load function computing ``aggregates`` over ``model`` rows per ``fk``"""
+    def load(keys):
+        rows = model.objects.filter(**{f'{fk}__in': keys}).order_by().values(fk).annotate(**aggregates)
+        return {row.pop(fk): row for row in rows}
+    return load
+
+
+# ----------------------------------------------------------------------------
+# Serializer and compiled encoder
+# ----------------------------------------------------------------------------
+
+class RowEncoder:
+    """A RowSerializer compiled for one fieldset"""
+
+    def __init__(self, lookups, batches, getters, omit_none=()):
+        self.lookups = lookups
+        self.batches = batches
+        self.getters = getters
+        self.omit_none = omit_none
+
+    def load(self, rows):
+        loaded = {}
+        for batch in self.batches:
+            load, key = batch
+            keys = {row[key] for row in rows}
+            keys.discard(None)
+            loaded[batch] = load(keys) if keys else {}
+        return loaded
+
+    def encode(self, row, loaded):
+        data = {name: get(row, loaded) for name, get in self.getters}
+        for name in self.omit_none:
+            if data[name] is None:
+                del data[name]
+        return data
+
+
+class RowSerializer:
+    """Output fields of one model, as ``{name: spec}`` in output order"""
+
+    def __init__(self, model, fields):
+        self.model = model
+        self.fields = dict(fields)
+        self._encoders = {}
+
+    def extend(self, **fields):
+        """A copy with ``fields`` added, or replaced in place"""
+        return RowSerializer(self.model, {**self.fields, **fields})
+
+    def parse_fields(self, value):
+        """
+        Turn a ``?fields=`` value into a fieldset for encoding (None for all
+        fields). Raises ValueError on unknown names.
+        """
+        if not value:
+            return None
+        names = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = sorted(names - set(self.fields))
+        if unknown:
+            raise ValueError(
+                f'Unknown field(s): {", ".join(unknown)}. Available: {", ".join(self.fields)}'
+            )
+        return tuple(name for name in self.fields if name in names)
+
+    def compile(self, fields=None, prefix='', extra=()):
+        """The RowEncoder for ``fields``; ``extra`` lookups are fetched but not output"""
+        cache_key = (fields, prefix, extra)
+        encoder = self._encoders.get(cache_key)
+        if encoder is None:
+            lookups = dict.fromkeys(prefix + lookup for lookup in extra)
+            batches = {}
+            getters = []
+            for name in fields or self.fields:
+                field_lookups, field_batches, getter = self.fields[name].compile(prefix)
+                lookups.update(dict.fromkeys(field_lookups))
+                batches.update(dict.fromkeys(field_batches))
+                getters.append((name, getter))
+            omit_none = tuple(name for name, _ in getters if getattr(self.fields[name], 'omit_none', False))
+            encoder = RowEncoder(tuple(lookups), tuple(batches), tuple(getters), omit_none)
+            self._encoders[cache_key] = encoder
+        return encoder
+
+    def iter_encoded(self, queryset, fields=None, extra=()):
+        """Yield ``(row, data)`` per object; ``row`` holds the raw ``values()`` incl. ``extra``"""
+        encoder = self.compile(fields, extra=tuple(extra))
+        rows = list(queryset.values(*encoder.lookups))
+        loaded = encoder.load(rows)
+        for row in rows:
+            yield row, encoder.encode(row, loaded)
+
+    def serialize(self, queryset, fields=None):
+        """Encode ``queryset`` into a list of dicts"""
+        return [data for _, data in self.iter_encoded(queryset, fields)]
+
+
+# ----------------------------------------------------------------------------
+# Serializers used by the APIs
+# ----------------------------------------------------------------------------
+
+money = decimal_string(2)
+CURRENCY_SYMBOLS = {'INR': '₹', 'GBP': '£', 'EUR': '€'}
+
+
+def stock_status(stock):
+    if stock == 0:
+        return "Out of Stock"
+    elif stock <= 5:
+        return "Low Stock"
+    return "In Stock"
+
+
+def full_name(first_name, last_name, username):
+    return f"{first_name} {last_name}".strip() or username
+
+
+def account_name(user_id, first_name, last_name, username):
+    """What admin lists show as an order's customer (User.get_full_name() or username)"""
+    return 'Guest' if user_id is None else full_name(first_name, last_name, username)
+
+
+# One per DRF serializer in coffee.serializers, with identical output
+CATEGORY = RowSerializer(Category, {
+    'id': Column('id'),
+    'name': Column('name'),
+    'description': Column('description'),
+    'image_url': Column('image_url'),
+    'is_active': Column('is_active'),
+    'items_count': Batched(
+        'id', grouped(MenuItem, 'category_obj', count=Count('id', filter=Q(is_available=True))),
+        lambda stats: stats['count'], 0,
+    ),
+    'created_at': Column('created_at', local_isoformat),
+})
+
+MENU_ITEM_LIST = RowSerializer(MenuItem, {
+    'id': Column('id'),
+    'name': Column('name'),
+    'description': Column('description'),
+    'price': Column('price', money),
+    'formatted_price': Column('price', rupees),
+    'category': Column('category'),
+    'category_display': Column('category', choice_display(MenuItem.CATEGORY_CHOICES)),
+    'image_url': Column('image_url'),
+    'images': Computed(variant_urls, 'image', 'image_variants', 'image_url', 'image_placeholder'),
+    'stock': Column('stock'),
+    'is_featured': Column('is_featured'),
+})
+
+MENU_ITEM = RowSerializer(MenuItem, {
+    'id': Column('id'),
+    'name': Column('name'),
+    'description': Column('description'),
+    'price': Column('price', money),
+    'formatted_price': Column('price', rupees),
+    'category': Column('category'),
+    'category_display': Column('category', choice_display(MenuItem.CATEGORY_CHOICES)),
+    'category_obj': Nested('category_obj', CATEGORY),
+    'category_obj_id': Column('category_obj', omit_none=True),
+    'image_url': Column('image_url'),
+    'image': Column('image', file_url),
+    'images': Computed(variant_urls, 'image', 'image_variants', 'image_url', 'image_placeholder'),
+    'stock': Column('stock'),
+    'stock_status': Column('stock', stock_status),
+    'is_in_stock': Column('stock', lambda stock: stock > 0),
+    'is_available': Column('is_available'),
+    'is_featured': Column('is_featured'),
+    'created_at': Column('created_at', local_isoformat),
+    'updated_at': Column('updated_at', local_isoformat),
+})
+
+ORDER_ITEM = RowSerializer(OrderItem, {
+    'id': Column('id'),
+    'menu_item': Nested('menu_item', MENU_ITEM_LIST),
+    'quantity': Column('quantity'),
+    'price': Column('price', money),
+    'formatted_price': Column('price', rupees),
+    'formatted_total': Computed(lambda quantity, price: rupees(quantity * price), 'quantity', 'price'),
+})
+
+ORDER = RowSerializer(Order, {
+    'id': Column('id'),
+    'order_id': Column('order_id', str),
+    'customer_name': Column('customer_name'),
+    'customer_email': Column('customer_email'),
+    'status': Column('status'),
+    'status_display': Column('status', choice_display(Order.STATUS_CHOICES)),
+    'currency': Column('currency'),
+    'currency_display': Column('currency', choice_display(Order.CURRENCY_CHOICES)),
+    'total_amount': Column('total_amount', money),
+    'formatted_total': Computed(
+        lambda currency, total: f"{CURRENCY_SYMBOLS.get(currency, '₹')}{total:.0f}", 'currency', 'total_amount'
+    ),
+    'items': Many(ORDER_ITEM, 'order'),
+    'notes': Column('notes'),
+    'created_at': Column('created_at', local_isoformat),
+    'updated_at': Column('updated_at', local_isoformat),
+})
+
+customer_order_stats = grouped(Order, 'user', count=Count('id'), total=Sum('total_amount'), last=Max('created_at'))
+
+USER = RowSerializer(User, {
+    'id': Column('id'),
+    'username': Column('username'),
+    'email': Column('email'),
+    'first_name': Column('first_name'),
+    'last_name': Column('last_name'),
+    'full_name': Computed(full_name, 'first_name', 'last_name', 'username'),
+    'is_active': Column('is_active'),
+    'date_joined': Column('date_joined', local_isoformat),
+    'orders_count': Batched('id', customer_order_stats, lambda stats: stats['count'], 0),
+    'total_spent': Batched('id', customer_order_stats, lambda stats: rupees(stats['total']), rupees(0)),
+})
+
+# The admin list APIs: MenuItemSerializer with category_obj as the id (for
+# editing) and the category name
+ADMIN_PRODUCTS = MENU_ITEM.extend(
+    category_obj=Column('category_obj'),
+    category_obj_id=Column('category_obj'),
+    category_name=Column('category_obj__name'),
+)
+
+# OrderSerializer naming the account holder rather than the checkout details
+ADMIN_ORDERS = ORDER.extend(
+    customer_name=Computed(account_name, 'user', 'user__first_name', 'user__last_name', 'user__username'),
+    customer_email=Computed(lambda user_id, email: email if user_id is not None else '', 'user', 'user__email'),
+    items_count=Batched('id', grouped(OrderItem, 'order', count=Count('id')), lambda stats: stats['count'], 0),
+)
+
+# UserSerializer with the raw order statistics
+ADMIN_CUSTOMERS = USER.extend(
+    total_spent=Batched('id', customer_order_stats, lambda stats: stats['total'], 0),
+    total_orders=Batched('id', customer_order_stats, lambda stats: stats['count'], 0),
+    last_order_date=Batched('id', customer_order_stats, lambda stats: stats['last']),
+)
+
+# get_reviews rows
+REVIEW = RowSerializer(Review, {
+    'id': Column('id'),
+    'rating': Column('rating'),
+    'title': Column('title'),
+    'comment': Column('comment'),
+    'user': Column('user__username'),
+    'created_at': Column('created_at', lambda value: value.isoformat()),
+    'star_display': Column('rating', lambda rating: '★' * rating + '☆' * (5 - rating)),
+    'helpful_count': Column('helpful_count'),
+    'is_verified': Column('is_verified'),
+})
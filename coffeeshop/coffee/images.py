@@ -0,0 +1,200 @@
+"""
+Image processing pipeline for uploaded menu item photos.
+
+Uploads are resized into WebP/JPEG variants plus a tiny blurred placeholder.
+By default (IMAGE_PROCESSING_WORKERS = 0) an upload is processed inline once
+it commits. Sites that want the Pillow work off the request path set
+IMAGE_PROCESSING_WORKERS and run ``manage.py process_images --watch``,
+which owns a process pool of that size for its whole lifetime and saves
+each result from its main thread. Web workers never start a pool: one
+created before a pre-forking server forks would be copied, half-working,
+into every child, and results saved from pool callback threads would run
+outside any request or transaction.
+
+The worker functions only deal in bytes so they never touch Django from
+the child.
+"""
+import base64
+import io
+import logging
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+try:
+    from PIL import Image, ImageFilter, ImageOps
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+PLACEHOLDER_WIDTH = 16
+
+
+def render_variants(source_bytes, widths, quality=80):
+    """
+    Resize an image into every requested width and format.
+
+    Runs inside a worker process: takes and returns plain bytes/dicts.
+    Images are never upscaled.
+    """
+    with Image.open(io.BytesIO(source_bytes)) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+
+    variants = {}
+    for name, width in widths.items():
+        width = min(width, image.width)
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        files = {}
+        for fmt, (pil_format, _) in VARIANT_FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, quality=quality, optimize=True)
+            files[fmt] = buffer.getvalue()
+        variants[name] = {'width': width, 'height': height, 'files': files}
+
+    # Tiny blurred JPEG, inlined as a data URI while the real image loads
+    tiny_height = max(1, round(image.height * PLACEHOLDER_WIDTH / image.width))
+    tiny = image.resize((PLACEHOLDER_WIDTH, tiny_height), Image.BILINEAR)
+    tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'JPEG', quality=40)
+    placeholder = 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+    return {
+        'width': image.width,
+        'height': image.height,
+        'variants': variants,
+        'placeholder': placeholder,
+    }
+
+
+def _variant_name(item_id, source_name, variant, fmt):
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    ext = 'jpg' if fmt == 'jpeg' else fmt
+    return f'menu_items/variants/{item_id}-{stem}-{variant}.{ext}'
+
+
+def save_variants(item_id, source_name, rendered):
+    """Store rendered variants and record them on the menu item"""
+    from .models import MenuItem
+    from .catalog import bump_catalog_version
+
+    variants = {}
+    for variant, data in rendered['variants'].items():
+        entry = {'width': data['width'], 'height': data['height']}
+        for fmt, content in data['files'].items():
+            name = _variant_name(item_id, source_name, variant, fmt)
+            # Content-addressed files may be shared, so never delete them
+            if not getattr(default_storage, 'content_addressed', False) and default_storage.exists(name):
+                default_storage.delete(name)
+            entry[fmt] = default_storage.save(name, ContentFile(content))
+        variants[variant] = entry
+
+    image_variants = {
+        'source': source_name,
+        'width': rendered['width'],
+        'height': rendered['height'],
+        'variants': variants,
+    }
+    # Only record the result if the item still points at the same upload
+    updated = MenuItem.objects.filter(id=item_id, image=source_name).update(
+        image_variants=image_variants,
+        image_placeholder=rendered['placeholder'],
+        # update() skips auto_now; cached menu cards are keyed on updated_at
+        updated_at=timezone.now(),
+    )
+    if updated:
+        bump_catalog_version()
+    return updated
+
+
+def read_source(source_name):
+    with default_storage.open(source_name, 'rb') as f:
+        return f.read()
+
+
+def process_item_image(item_id, source_name):
+    """Generate variants for one item synchronously"""
+    rendered = render_variants(
+        read_source(source_name), settings.IMAGE_VARIANTS, settings.IMAGE_QUALITY
+    )
+    return save_variants(item_id, source_name, rendered)
+
+
+def schedule_image_processing(item_id, source_name):
+    """
+    Process a committed upload inline when no workers are configured;
+    otherwise leave it to ``process_images --watch``, which picks up every
+    item whose variants are missing or stale.
+    """
+    if not PIL_AVAILABLE:
+        logger.warning('Pillow is not installed; skipping image variants')
+        return None
+
+    if settings.IMAGE_PROCESSING_WORKERS:
+        logger.info(f'Image variants for item {item_id} left to process_images --watch')
+        return None
+
+    try:
+        return process_item_image(item_id, source_name)
+    except Exception as e:
+        logger.error(f'Image processing failed for item {item_id}: {str(e)}')
+        return None
+
+
+def needs_processing(item):
+    """True when the item has an upload whose variants are missing or stale"""
+    return bool(item.image) and (item.image_variants or {}).get('source') != item.image.name
+
+
+def image_urls(item):
+    """
+    Return URLs for the item's image variants, falling back to image_url
+    when no processed upload exists.
+    """
+    return variant_urls(item.image.name, item.image_variants, item.image_url, item.image_placeholder)
+
+
+def variant_urls(image, image_variants, image_url, image_placeholder):
+    """image_urls from the raw field values (``image`` is the stored file name)"""
+    data = image_variants or {}
+    variants = data.get('variants') if image and data.get('source') == image else None
+
+    if not variants:
+        url = default_storage.url(image) if image else image_url
+        return {
+            'src': url or None,
+            'thumbnail': url or None,
+            'card': url or None,
+            'detail': url or None,
+            'srcset': '',
+            'webp_srcset': '',
+            'placeholder': '',
+        }
+
+    urls = {
+        name: default_storage.url(entry['jpeg'])
+        for name, entry in variants.items()
+    }
+    # One srcset candidate per distinct width (small sources are never upscaled)
+    by_width = {entry['width']: entry for _, entry in sorted(variants.items(), key=lambda pair: pair[1]['width'])}
+    return {
+        'src': urls.get('card') or default_storage.url(image),
+        **urls,
+        'srcset': ', '.join(
+            f'{default_storage.url(entry["jpeg"])} {width}w' for width, entry in by_width.items()
+        ),
+        'webp_srcset': ', '.join(
+            f'{default_storage.url(entry["webp"])} {width}w' for width, entry in by_width.items()
+        ),
+        'placeholder': image_placeholder or '',
+    }
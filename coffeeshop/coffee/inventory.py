@@ -0,0 +1,116 @@
+from django.db import transaction
+from django.db.models import Case, When, Value, F, IntegerField
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import MenuItem
+from .catalog import bump_catalog_version
+from .reservations import forget_availability
+
+
+def parse_stock_updates(updates):
+    """
+    Validate a list of stock changes.
+
+    Each entry is ``{'id': <item id>, 'stock': <absolute count>}`` or
+    ``{'id': <item id>, 'delta': <relative change>}``. Returns
+    ``(changes, errors)`` where ``changes`` maps item id to
+    ``('stock' | 'delta', value)``.
+    """
+    changes = {}
+    errors = []
+
+    if not isinstance(updates, list):
+        return changes, [{'index': None, 'error': 'updates must be a list'}]
+
+    for index, update in enumerate(updates):
+        if not isinstance(update, dict):
+            errors.append({'index': index, 'error': 'Each update must be an object'})
+            continue
+
+        try:
+            item_id = int(update.get('id'))
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'id': update.get('id'), 'error': 'Invalid item id'})
+            continue
+
+        has_stock = update.get('stock') is not None
+        has_delta = update.get('delta') is not None
+        if has_stock == has_delta:
+            errors.append({'index': index, 'id': item_id, 'error': 'Provide exactly one of stock or delta'})
+            continue
+
+        mode = 'stock' if has_stock else 'delta'
+        try:
+            value = int(update[mode])
+        except (TypeError, ValueError):
+            errors.append({'index': index, 'id': item_id, 'error': f'Invalid {mode} value'})
+            continue
+        if mode == 'stock' and value < 0:
+            errors.append({'index': index, 'id': item_id, 'error': 'Stock cannot be negative'})
+            continue
+
+        if item_id in changes:
+            errors.append({'index': index, 'id': item_id, 'error': 'Duplicate item id'})
+            continue
+        changes[item_id] = (mode, value)
+
+    return changes, errors
+
+
+def apply_stock_changes(changes):
+    """
+    Apply absolute/relative stock changes with a single CASE-based UPDATE
+    inside one transaction. Stock is never set below the units held in
+    carts (reserved_stock), so a change asking for less stops there.
+
+    Returns ``(results, invalid_ids, clamped_ids)`` where results lists
+    before/after stock and the reserved units for every updated item, and
+    clamped_ids are the items left above the stock that was asked for.
+    """
+    if not changes:
+        return [], [], []
+
+    with transaction.atomic():
+        before = dict(
+            MenuItem.objects.select_for_update()
+            .filter(id__in=changes.keys())
+            .values_list('id', 'stock')
+        )
+        invalid_ids = sorted(set(changes) - set(before))
+
+        whens = []
+        wanted = {}
+        for item_id, (mode, value) in changes.items():
+            if item_id not in before:
+                continue
+            if mode == 'stock':
+                new_stock = Greatest(Value(value), F('reserved_stock'))
+                wanted[item_id] = value
+            else:
+                new_stock = Greatest(F('stock') + Value(value), F('reserved_stock'))
+                wanted[item_id] = max(before[item_id] + value, 0)
+            whens.append(When(id=item_id, then=new_stock))
+
+        if whens:
+            MenuItem.objects.filter(id__in=before.keys()).update(
+                stock=Case(*whens, default=F('stock'), output_field=IntegerField()),
+                updated_at=timezone.now(),
+            )
+            # Queryset updates bypass post_save, so invalidate catalog caches here
+            transaction.on_commit(bump_catalog_version)
+            forget_availability(before.keys())
+
+        after = {
+            item_id: (stock, reserved)
+            for item_id, stock, reserved in MenuItem.objects.filter(id__in=before.keys()).values_list(
+                'id', 'stock', 'reserved_stock'
+            )
+        }
+
+    results = [
+        {'id': item_id, 'before': before[item_id], 'after': after[item_id][0], 'reserved': after[item_id][1]}
+        for item_id in changes if item_id in before
+    ]
+    clamped_ids = sorted(item_id for item_id, stock in wanted.items() if after[item_id][0] > stock)
+    return results, invalid_ids, clamped_ids
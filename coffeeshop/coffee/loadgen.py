@@ -0,0 +1,235 @@
+"""
+Asyncio load generator for shop user journeys.
+
+Drives scripted journeys against a running server with a small stdlib
+HTTP/1.1 client (one connection per request, cookies and CSRF handled like
+a browser). Journeys start at a fixed arrival rate (Poisson) or, with no
+rate, back to back on every worker, and each step's latency and outcome is
+recorded so throughput, percentiles and error / lock-timeout rates can be
+reported per step.
+"""
+import asyncio
+import random
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from .benchmarks import percentile
+from .middleware import LOCK_TIMEOUT_HEADER
+
+
+class StepFailed(Exception):
+    """A journey step returned an unexpected status; abandon the journey"""
+
+
+class HttpSession:
+    """Minimal async HTTP client with a cookie jar"""
+
+    def __init__(self, base_url, timeout=30.0):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.ssl = parts.scheme == 'https'
+        self.netloc = parts.netloc
+        self.origin = f'{parts.scheme}://{parts.netloc}'
+        self.timeout = timeout
+        self.cookies = {}
+
+    async def request(self, method, path, data=None):
+        """Return ``(status, headers, body)``; redirects are not followed"""
+        body = urlencode(data).encode() if data is not None else b''
+        headers = {
+            'Host': self.netloc,
+            'User-Agent': 'coffee-loadgen',
+            'Accept': '*/*',
+            'Connection': 'close',
+        }
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        if method != 'GET':
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['Content-Length'] = str(len(body))
+            headers['Referer'] = self.origin + path
+            headers['Origin'] = self.origin
+            if 'csrftoken' in self.cookies:
+                headers['X-CSRFToken'] = self.cookies['csrftoken']
+
+        raw = f'{method} {path} HTTP/1.1\r\n' + ''.join(f'{k}: {v}\r\n' for k, v in headers.items()) + '\r\n'
+        return await asyncio.wait_for(self._exchange(raw.encode() + body), self.timeout)
+
+    async def _exchange(self, payload):
+        reader, writer = await asyncio.open_connection(self.host, self.port, ssl=self.ssl or None)
+        try:
+            writer.write(payload)
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+
+        head, _, body = response.partition(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        chunked = False
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            name = name.strip().lower()
+            headers[name] = value.strip()
+            if name == 'set-cookie':
+                cookie = SimpleCookie()
+                cookie.load(value.strip())
+                for key, morsel in cookie.items():
+                    self.cookies[key] = morsel.value
+            elif name == 'transfer-encoding' and 'chunked' in value.lower():
+                chunked = True
+        if chunked:
+            body = _decode_chunked(body)
+        return status, headers, body
+
+
+def _decode_chunked(body):
+    decoded = b''
+    while body:
+        size_line, _, body = body.partition(b'\r\n')
+        size = int(size_line.split(b';')[0] or b'0', 16)
+        if size == 0:
+            break
+        decoded += body[:size]
+        body = body[size + 2:]
+    return decoded
+
+
+class Stats:
+    """Per-step outcomes of a load run"""
+
+    def __init__(self):
+        self.samples = {}
+        self.journeys = {'completed': 0, 'abandoned': 0}
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, step, elapsed, outcome):
+        self.samples.setdefault(step, []).append((elapsed, outcome))
+
+    def summary(self):
+        duration = (self.finished or time.perf_counter()) - self.started
+        steps = {}
+        for step, samples in self.samples.items():
+            timings = [elapsed * 1000 for elapsed, _ in samples]
+            total = len(samples)
+            errors = sum(1 for _, outcome in samples if outcome != 'ok')
+            locked = sum(1 for _, outcome in samples if outcome == 'locked')
+            steps[step] = {
+                'requests': total,
+                'throughput_rps': round(total / duration, 2),
+                'p50_ms': round(percentile(timings, 50), 1),
+                'p95_ms': round(percentile(timings, 95), 1),
+                'p99_ms': round(percentile(timings, 99), 1),
+                'error_rate': round(errors / total, 4),
+                'lock_timeout_rate': round(locked / total, 4),
+            }
+        total_requests = sum(len(samples) for samples in self.samples.values())
+        return {
+            'duration_s': round(duration, 2),
+            'requests': total_requests,
+            'throughput_rps': round(total_requests / duration, 2) if duration else 0,
+            'journeys': dict(self.journeys),
+            'steps': steps,
+        }
+
+
+async def run_step(session, stats, step, method, path, data=None, expect=(200,)):
+    start = time.perf_counter()
+    try:
+        status, headers, body = await session.request(method, path, data)
+    except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+        stats.record(step, time.perf_counter() - start, 'error')
+        raise StepFailed(step)
+    elapsed = time.perf_counter() - start
+
+    if status in expect:
+        stats.record(step, elapsed, 'ok')
+        return body
+    # DatabaseLockMiddleware flags SQLite lock timeouts, with or without DEBUG
+    locked = LOCK_TIMEOUT_HEADER.lower() in headers
+    stats.record(step, elapsed, 'locked' if locked else 'error')
+    raise StepFailed(step)
+
+
+async def shopper_journey(session, stats, plan, rng):
+    """browse menu -> search -> suggestions -> log in -> add to cart -> view cart -> checkout"""
+    term = rng.choice(plan['search_terms'])
+    await run_step(session, stats, 'browse_menu', 'GET', plan['urls']['menu'])
+    await asyncio.sleep(plan['think_time'])
+    await run_step(session, stats, 'search', 'GET', plan['urls']['search'] + '?' + urlencode({'q': term}))
+    await run_step(session, stats, 'suggestions', 'GET', plan['urls']['suggestions'] + '?' + urlencode({'q': term[:3]}))
+
+    username = rng.choice(plan['shoppers'])
+    await run_step(session, stats, 'login_page', 'GET', plan['urls']['login'])
+    await run_step(session, stats, 'login', 'POST', plan['urls']['login'], {
+        'username': username,
+        'password': plan['password'],
+        'csrfmiddlewaretoken': session.cookies.get('csrftoken', ''),
+    }, expect=(302,))
+
+    for item_id in rng.sample(plan['item_ids'], min(len(plan['item_ids']), rng.randint(1, 3))):
+        await run_step(session, stats, 'add_to_cart', 'POST', plan['urls']['add_to_cart'].format(item_id=item_id),
+                       {'quantity': rng.randint(1, 2)}, expect=(302,))
+    await run_step(session, stats, 'view_cart', 'GET', plan['urls']['cart'])
+    await run_step(session, stats, 'checkout', 'POST', plan['urls']['checkout'], {'notes': 'load test'}, expect=(302,))
+
+
+async def admin_journey(session, stats, plan, rng):
+    """log in as staff, open the dashboard and refresh its analytics a few times"""
+    await run_step(session, stats, 'admin_login_page', 'GET', plan['urls']['login'])
+    await run_step(session, stats, 'admin_login', 'POST', plan['urls']['login'], {
+        'username': plan['admin_username'],
+        'password': plan['admin_password'],
+        'csrfmiddlewaretoken': session.cookies.get('csrftoken', ''),
+    }, expect=(302,))
+    await run_step(session, stats, 'dashboard', 'GET', plan['urls']['dashboard'])
+    for _ in range(rng.randint(1, 3)):
+        await run_step(session, stats, 'dashboard_refresh', 'GET', plan['urls']['dashboard_analytics'])
+        await asyncio.sleep(plan['think_time'])
+
+
+async def run_journey(plan, stats, rng):
+    session = HttpSession(plan['base_url'], plan['timeout'])
+    admin = plan['admin_username'] and rng.random() < plan['admin_share']
+    try:
+        await (admin_journey if admin else shopper_journey)(session, stats, plan, rng)
+        stats.journeys['completed'] += 1
+    except StepFailed:
+        stats.journeys['abandoned'] += 1
+
+
+async def run_load(plan, concurrency=10, rate=0.0, duration=60.0, seed=None):
+    """
+    Run journeys for ``duration`` seconds with at most ``concurrency`` in
+    flight. With a ``rate`` (journeys/second) arrivals are open-loop
+    Poisson; otherwise every worker starts a new journey as soon as its
+    last one ends.
+    """
+    rng = random.Random(seed)
+    stats = Stats()
+    deadline = time.perf_counter() + duration
+    limit = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with limit:
+            await run_journey(plan, stats, random.Random(rng.random()))
+
+    if rate:
+        tasks = []
+        while time.perf_counter() < deadline:
+            tasks.append(asyncio.create_task(limited()))
+            await asyncio.sleep(rng.expovariate(rate))
+        await asyncio.gather(*tasks)
+    else:
+        async def worker():
+            while time.perf_counter() < deadline:
+                await limited()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    stats.finished = time.perf_counter()
+    return stats.summary()
@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import (
+    setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+)
+
+from coffee.benchmarks import (
+    BASELINE_PATH, BENCHMARK_NAMES, DEFAULT_TOLERANCE,
+    compare_to_baseline, load_baseline, run_benchmarks, run_serializer_benchmarks, save_baseline,
+)
+from coffee.models import MenuItem
+from coffee.seeding import DEFAULT_SEED, SCALES, seed_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database and benchmark the key views. '
+        'Fails when results regress against the stored baseline; '
+        'record a baseline on your own machine with --update-baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=list(SCALES), default='full',
+                            help='Data volume to seed (default: full)')
+        parser.add_argument('--iterations', type=int, default=20, help='Timed requests per view')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per view')
+        parser.add_argument('--seed', type=int, default=DEFAULT_SEED, help='Random seed for the data')
+        parser.add_argument('--only', nargs='+', choices=BENCHMARK_NAMES, help='Benchmark only these views')
+        parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline JSON file')
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Store these results as the baseline for the scale')
+        parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                            help='Allowed p95 slowdown as a fraction (default: 0.25)')
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the seeded test database in a temp file and reuse it next run')
+        parser.add_argument('--serializers', action='store_true',
+                            help='Also compare the DRF serializers with the compiled fast-path ones')
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+        scale = options['scale']
+
+        # Never touch the real database: seed and benchmark a test database
+        if options['keepdb']:
+            # SQLite test databases live in memory and can't be kept; use a
+            # file per scale and seed instead
+            test_settings = connections['default'].settings_dict.setdefault('TEST', {})
+            test_settings['NAME'] = os.path.join(
+                tempfile.gettempdir(), f'coffeeshop-benchmark-{scale}-{options["seed"]}.sqlite3'
+            )
+            self.stdout.write(f'Using test database {test_settings["NAME"]}')
+        setup_test_environment(debug=False)
+        old_config = setup_databases(verbosity=verbosity, interactive=False, keepdb=options['keepdb'])
+        try:
+            if MenuItem.objects.exists():
+                self.stdout.write('Reusing seeded test database')
+            else:
+                self.stdout.write(f'Seeding {scale} dataset...')
+                seed_database(SCALES[scale], seed=options['seed'], stdout=self.stdout)
+
+            results = run_benchmarks(options['iterations'], options['warmup'], options['only'])
+            serializer_results = run_serializer_benchmarks(options['iterations']) if options['serializers'] else {}
+        finally:
+            teardown_databases(old_config, verbosity=verbosity, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        self.stdout.write(f'\n{"view":<22}{"status":>7}{"queries":>9}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}')
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<22}{result["status"]:>7}{result["queries"]:>9}'
+                f'{result["p50_ms"]:>10}{result["p95_ms"]:>10}{result["p99_ms"]:>10}'
+            )
+
+        if serializer_results:
+            self.stdout.write(
+                f'\n{"serializer":<22}{"rows":>7}{"queries":>13}{"DRF ms":>10}{"fast ms":>10}{"speedup":>9}  output'
+            )
+            for name, result in serializer_results.items():
+                queries = f'{result["drf_queries"]} -> {result["fast_queries"]}'
+                self.stdout.write(
+                    f'{name:<22}{result["rows"]:>7}{queries:>13}{result["drf_p50_ms"]:>10}'
+                    f'{result["fast_p50_ms"]:>10}{result["speedup"]:>8}x  '
+                    f'{"identical" if result["same_output"] else "DIFFERS"}'
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump({'scale': scale, 'results': results, 'serializers': serializer_results}, f, indent=2)
+
+        if options['update_baseline']:
+            save_baseline(scale, results, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f'Baseline for "{scale}" saved to {options["baseline"]}'))
+            return
+
+        baseline = load_baseline(options['baseline']).get(scale)
+        if not baseline:
+            self.stdout.write(self.style.WARNING(f'No "{scale}" baseline to compare against'))
+            return
+
+        regressions = compare_to_baseline(results, baseline, options['tolerance'])
+        if regressions:
+            for message in regressions:
+                self.stdout.write(self.style.ERROR(message))
+            raise CommandError(f'{len(regressions)} benchmark regression(s) against the baseline')
+        self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
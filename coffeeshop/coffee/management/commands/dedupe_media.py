@@ -0,0 +1,49 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from coffee.models import MenuItem
+from coffee.storage import is_content_addressed
+
+
+class Command(BaseCommand):
+    help = 'Move existing menu item uploads into content-addressed storage, deduplicating identical files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-originals',
+            action='store_true',
+            help='Do not delete the original files after rehashing',
+        )
+
+    def handle(self, *args, **options):
+        if not getattr(default_storage, 'content_addressed', False):
+            raise CommandError('The default storage is not content-addressed')
+
+        items = MenuItem.objects.exclude(image='').exclude(image__isnull=True)
+        rehashed = {}
+        moved = 0
+
+        for item in items:
+            old_name = item.image.name
+            if is_content_addressed(old_name):
+                continue
+
+            if old_name not in rehashed:
+                try:
+                    with default_storage.open(old_name, 'rb') as f:
+                        rehashed[old_name] = default_storage.save(old_name, f)
+                except OSError as e:
+                    self.stdout.write(self.style.ERROR(f'{item.name}: cannot read {old_name} ({e})'))
+                    continue
+
+            MenuItem.objects.filter(id=item.id).update(image=rehashed[old_name])
+            moved += 1
+            self.stdout.write(f'{item.name}: {old_name} -> {rehashed[old_name]}')
+
+        if not options['keep_originals']:
+            for old_name in rehashed:
+                default_storage.delete(old_name)
+
+        unique = len(set(rehashed.values()))
+        self.stdout.write(self.style.SUCCESS(
+            f'Rehashed {moved} images into {unique} stored files; run process_images to rebuild variants'
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from coffee.catalog_io import CATALOG_FORMATS, export_catalog
+
+
+class Command(BaseCommand):
+    help = 'Export all menu items as a CSV or JSON catalog file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format',
+            choices=CATALOG_FORMATS,
+            default='csv',
+            help='Output format',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Write to this file instead of stdout',
+        )
+
+    def handle(self, *args, **options):
+        content = export_catalog(options['format'])
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+                f.write(content)
+            self.stdout.write(self.style.SUCCESS(f'Catalog exported to {options["output"]}'))
+        else:
+            self.stdout.write(content, ending='')
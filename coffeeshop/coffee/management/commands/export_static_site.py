@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from coffee.static_export import STATIC_PAGES, catalog_fingerprint, export_site, load_manifest
+
+
+class Command(BaseCommand):
+    help = (
+        'Render the public pages (home, about, services, menu) into static HTML '
+        'with content-hashed assets for a plain static file server'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=str(settings.STATIC_SITE_ROOT),
+                            help='Export directory (default: STATIC_SITE_ROOT)')
+        parser.add_argument('--pages', nargs='+', choices=STATIC_PAGES, help='Export only these pages')
+        parser.add_argument('--if-changed', action='store_true',
+                            help='Skip the export when the catalog has not changed since the last one')
+        parser.add_argument('--watch', type=float, metavar='SECONDS',
+                            help='Keep running and re-export whenever the catalog changes, checking this often')
+
+    def handle(self, *args, **options):
+        root = options['output']
+        if options['watch']:
+            self.stdout.write(f'Watching the catalog every {options["watch"]}s (Ctrl+C to stop)')
+            try:
+                while True:
+                    self.export(root, options['pages'], if_changed=True, quiet=True)
+                    time.sleep(options['watch'])
+            except KeyboardInterrupt:
+                return
+        self.export(root, options['pages'], if_changed=options['if_changed'])
+
+    def export(self, root, pages, if_changed, quiet=False):
+        if if_changed and load_manifest(root).get('catalog_fingerprint') == catalog_fingerprint():
+            if not quiet:
+                self.stdout.write('Catalog unchanged; export is up to date')
+            return
+
+        start = time.perf_counter()
+        manifest = export_site(root, pages)
+        elapsed = (time.perf_counter() - start) * 1000
+        for path, page in manifest['pages'].items():
+            self.stdout.write(f'  {path:<12} -> {page["file"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {len(manifest["pages"])} pages and {len(manifest["assets"])} assets '
+            f'to {root} in {elapsed:.0f}ms'
+        ))
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from coffee.votes import flush_votes, reconcile_votes
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold logged review helpful votes into Review.helpful_count and optionally '
+        'reconcile the counts against the recorded votes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconcile', action='store_true',
+                            help='Also correct counts that disagree with the recorded votes')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Log entries applied per transaction')
+        parser.add_argument('--watch', type=float, metavar='SECONDS',
+                            help='Keep running and flush this often')
+
+    def handle(self, *args, **options):
+        if options['watch']:
+            self.stdout.write(f'Flushing every {options["watch"]}s (Ctrl+C to stop)')
+            try:
+                while True:
+                    self.flush(options, quiet=True)
+                    time.sleep(options['watch'])
+            except KeyboardInterrupt:
+                return
+        self.flush(options)
+
+    def flush(self, options, quiet=False):
+        votes = 0
+        while True:
+            applied = flush_votes(options['batch_size'])
+            votes += applied
+            if applied < options['batch_size']:
+                break
+        corrected = reconcile_votes() if options['reconcile'] else 0
+
+        if votes or corrected or not quiet:
+            message = f'Applied {votes} logged votes'
+            if options['reconcile']:
+                message += f'; reconciled {corrected}'
+            self.stdout.write(self.style.SUCCESS(message))
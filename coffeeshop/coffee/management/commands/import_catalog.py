@@ -0,0 +1,67 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from coffee.catalog_io import (
+    CATALOG_FORMATS, DEFAULT_BATCH_SIZE, CatalogImportError, import_catalog
+)
+
+
+class Command(BaseCommand):
+    help = 'Import menu items from a CSV or JSON catalog file (upsert by item name)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=str, help='Path to the catalog file')
+        parser.add_argument(
+            '--format',
+            choices=CATALOG_FORMATS,
+            help='File format (defaults to the file extension)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Validate and report changes without writing anything',
+        )
+        parser.add_argument(
+            '--prune',
+            action='store_true',
+            help='Mark existing items that are missing from the file as unavailable',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Rows per bulk insert/update statement',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if fmt not in CATALOG_FORMATS:
+            raise CommandError(f'Unknown catalog format "{fmt}", use --format')
+
+        try:
+            with open(path, 'rb') as f:
+                content = f.read()
+        except OSError as e:
+            raise CommandError(f'Cannot read {path}: {e}')
+
+        try:
+            summary = import_catalog(
+                content,
+                fmt=fmt,
+                dry_run=options['dry_run'],
+                prune=options['prune'],
+                batch_size=options['batch_size'],
+            )
+        except CatalogImportError as e:
+            for error in e.errors:
+                row = f'Row {error["row"]}' if error['row'] else 'File'
+                self.stdout.write(self.style.ERROR(f'{row}: {"; ".join(error["errors"])}'))
+            raise CommandError(str(e))
+
+        prefix = 'Dry run: ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}{summary["created"]} created, {summary["updated"]} updated, '
+            f'{summary["unchanged"]} unchanged, {summary["missing"]} not in file, '
+            f'{summary["pruned"]} marked unavailable'
+        ))
@@ -0,0 +1,110 @@
+import asyncio
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from coffee.loadgen import run_load
+from coffee.models import MenuItem
+from coffee.seeding import FLAVOURS, PRODUCTS, SEED_PASSWORD
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive concurrent shopper and admin journeys against a running server and report '
+        'throughput, latency percentiles and error / lock-timeout rates per step. '
+        'Shoppers log in as users created by generate_data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Server to load')
+        parser.add_argument('--concurrency', type=int, default=10, help='Journeys in flight at once')
+        parser.add_argument('--rate', type=float, default=0.0,
+                            help='Journey arrivals per second (Poisson); 0 runs workers back to back')
+        parser.add_argument('--duration', type=float, default=60.0, help='Seconds to keep starting journeys')
+        parser.add_argument('--think-time', type=float, default=0.0, help='Pause between some steps, in seconds')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Per-request timeout in seconds')
+        parser.add_argument('--password', default=SEED_PASSWORD, help='Password of the shopper accounts')
+        parser.add_argument('--shoppers', type=int, default=1000, help='Distinct shopper accounts to use')
+        parser.add_argument('--admin-username', help='Staff account for dashboard journeys')
+        parser.add_argument('--admin-password', help='Password of the staff account')
+        parser.add_argument('--admin-share', type=float, default=0.1,
+                            help='Fraction of journeys that are dashboard refreshes (default: 0.1)')
+        parser.add_argument('--seed', type=int, help='Random seed for journey choices')
+        parser.add_argument('--output', help='Also write the report to this JSON file')
+
+    def handle(self, *args, **options):
+        shoppers = list(
+            User.objects.filter(is_staff=False, username__regex=r'^user\d{7}$')
+            .order_by('id').values_list('username', flat=True)[:options['shoppers']]
+        )
+        if not shoppers:
+            raise CommandError('No seeded shopper accounts found; run generate_data first')
+        item_ids = list(
+            MenuItem.objects.filter(is_available=True, stock__gt=0).values_list('id', flat=True)[:500]
+        )
+        if not item_ids:
+            raise CommandError('No available menu items to add to carts')
+
+        plan = {
+            'base_url': options['base_url'].rstrip('/'),
+            'timeout': options['timeout'],
+            'think_time': options['think_time'],
+            'password': options['password'],
+            'shoppers': shoppers,
+            'item_ids': item_ids,
+            'search_terms': [word.lower() for word in FLAVOURS + [p for names in PRODUCTS.values() for p in names]],
+            'admin_username': options['admin_username'],
+            'admin_password': options['admin_password'],
+            'admin_share': options['admin_share'],
+            'urls': {
+                'menu': reverse('menu'),
+                'search': reverse('advanced_search'),
+                'suggestions': reverse('search_suggestions'),
+                'login': reverse('login'),
+                'add_to_cart': reverse('add_to_cart', args=[0]).replace('/0/', '/{item_id}/'),
+                'cart': reverse('cart'),
+                'checkout': reverse('checkout'),
+                'dashboard': reverse('admin_dashboard'),
+                'dashboard_analytics': reverse('dashboard_analytics'),
+            },
+        }
+
+        self.stdout.write(
+            f'Loading {plan["base_url"]} for {options["duration"]:.0f}s '
+            f'(concurrency {options["concurrency"]}, '
+            f'{"rate " + str(options["rate"]) + "/s" if options["rate"] else "closed loop"})...'
+        )
+        report = asyncio.run(run_load(
+            plan,
+            concurrency=options['concurrency'],
+            rate=options['rate'],
+            duration=options['duration'],
+            seed=options['seed'],
+        ))
+
+        self.stdout.write(
+            f'\n{"step":<20}{"requests":>9}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}'
+            f'{"p99 ms":>9}{"errors":>8}{"locked":>8}'
+        )
+        for step, row in report['steps'].items():
+            self.stdout.write(
+                f'{step:<20}{row["requests"]:>9}{row["throughput_rps"]:>9}{row["p50_ms"]:>9}'
+                f'{row["p95_ms"]:>9}{row["p99_ms"]:>9}{row["error_rate"]:>8.1%}{row["lock_timeout_rate"]:>8.1%}'
+            )
+        journeys = report['journeys']
+        self.stdout.write(
+            f'\n{report["requests"]} requests in {report["duration_s"]}s '
+            f'({report["throughput_rps"]} req/s); journeys completed {journeys["completed"]}, '
+            f'abandoned {journeys["abandoned"]}'
+        )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+
+        if journeys['abandoned']:
+            self.stdout.write(self.style.WARNING('Some journeys failed; see the error columns'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All journeys completed'))
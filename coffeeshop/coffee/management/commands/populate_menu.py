@@ -1,13 +1,10 @@
 from django.core.management.base import BaseCommand
-from coffee.models import MenuItem
+from coffee.catalog_io import import_rows
 
 class Command(BaseCommand):
     help = 'Populate the database with comprehensive menu items (8-9 items per category) with GBP pricing'
 
     def handle(self, *args, **options):
-        # Clear existing menu items
-        MenuItem.objects.all().delete()
-        
         # Comprehensive menu items with GBP pricing (£6.99-£9.99 range)
         menu_items = [
             # Coffee (9 items)
@@ -400,10 +397,15 @@ class Command(BaseCommand):
         # Combine all menu items (removed sandwiches)
         all_items = menu_items + pastries_data + desserts_data
         
-        # Create menu items
+        # Upsert by name with bulk writes (no per-item signals or emails);
+        # items no longer on the menu are marked unavailable, keeping order history
         for item_data in all_items:
-            MenuItem.objects.create(**item_data)
+            item_data.setdefault('is_available', True)
+        summary = import_rows(all_items, prune=True)
             
         self.stdout.write(
-            self.style.SUCCESS(f'Successfully created {len(all_items)} menu items across all categories with GBP pricing')
-        )
\ No newline at end of file
+            self.style.SUCCESS(
+                f'Successfully loaded {len(all_items)} menu items across all categories with GBP pricing '
+                f'({summary["created"]} created, {summary["updated"]} updated, {summary["pruned"]} retired)'
+            )
+        )
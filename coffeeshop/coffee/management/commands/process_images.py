@@ -0,0 +1,92 @@
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from coffee.models import MenuItem
+from coffee.images import (
+    PIL_AVAILABLE, needs_processing, render_variants, save_variants, read_source
+)
+
+
+class Command(BaseCommand):
+    help = 'Generate resized image variants and blur placeholders for uploaded menu item images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate variants even if they are already up to date',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=max(settings.IMAGE_PROCESSING_WORKERS, 1),
+            help='Number of worker processes',
+        )
+        parser.add_argument(
+            '--watch',
+            type=float,
+            metavar='SECONDS',
+            help='Keep running and pick up new uploads this often',
+        )
+
+    def handle(self, *args, **options):
+        if not PIL_AVAILABLE:
+            raise CommandError('Pillow is required to process images')
+
+        # Uploads that failed, so --watch doesn't retry them every pass
+        self.failed = set()
+        # One pool for the command's lifetime, started here and never in a web worker
+        with ProcessPoolExecutor(max_workers=options['workers']) as executor:
+            if options['watch']:
+                self.stdout.write(f'Processing new uploads every {options["watch"]}s (Ctrl+C to stop)')
+                try:
+                    while True:
+                        self.process(executor, force=False, quiet=True)
+                        time.sleep(options['watch'])
+                except KeyboardInterrupt:
+                    return
+            self.process(executor, force=options['force'])
+
+    def process(self, executor, force=False, quiet=False):
+        items = [
+            item for item in MenuItem.objects.exclude(image='').exclude(image__isnull=True)
+            if force or (needs_processing(item) and (item.id, item.image.name) not in self.failed)
+        ]
+        if not items:
+            if not quiet:
+                self.stdout.write('All menu item images are up to date')
+            return
+
+        processed = 0
+        failed = 0
+        futures = {}
+        for item in items:
+            try:
+                source_bytes = read_source(item.image.name)
+            except OSError as e:
+                self.stdout.write(self.style.ERROR(f'{item.name}: cannot read {item.image.name} ({e})'))
+                self.failed.add((item.id, item.image.name))
+                failed += 1
+                continue
+            future = executor.submit(
+                render_variants, source_bytes, settings.IMAGE_VARIANTS, settings.IMAGE_QUALITY
+            )
+            futures[future] = item
+
+        # Results are saved here, in the command's own thread and connection
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                save_variants(item.id, item.image.name, future.result())
+                processed += 1
+                self.stdout.write(f'Processed {item.name}')
+            except Exception as e:
+                failed += 1
+                self.failed.add((item.id, item.image.name))
+                self.stdout.write(self.style.ERROR(f'{item.name}: {e}'))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Processed {processed} images ({failed} failed)')
+        )
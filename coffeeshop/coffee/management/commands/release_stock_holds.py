@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from coffee.reservations import reconcile_reserved, release_expired
+
+
+class Command(BaseCommand):
+    help = (
+        'Hand back the stock held by expired cart reservations and optionally '
+        'reconcile MenuItem.reserved_stock against the reservations'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reconcile', action='store_true',
+                            help='Also correct reserved counts that disagree with the reservations')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Holds released per transaction')
+        parser.add_argument('--watch', type=float, metavar='SECONDS',
+                            help='Keep running and sweep this often')
+
+    def handle(self, *args, **options):
+        if options['watch']:
+            self.stdout.write(f'Sweeping every {options["watch"]}s (Ctrl+C to stop)')
+            try:
+                while True:
+                    self.sweep(options, quiet=True)
+                    time.sleep(options['watch'])
+            except KeyboardInterrupt:
+                return
+        self.sweep(options)
+
+    def sweep(self, options, quiet=False):
+        holds = 0
+        while True:
+            released = release_expired(options['batch_size'])
+            holds += released
+            if released < options['batch_size']:
+                break
+        corrected = reconcile_reserved() if options['reconcile'] else 0
+
+        if holds or corrected or not quiet:
+            message = f'Released {holds} expired holds'
+            if options['reconcile']:
+                message += f'; reconciled {corrected}'
+            self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from coffee.warmup import check_budget, get_warmup_config, warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        'Warm templates, URL patterns, serializers and caches, and report '
+        'import, warm-up and first-request timings against the cold-start budget'
+    )
+    # System checks import the URLconf, which would hide the import timings
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--budget-ms', type=float,
+                            help='Total warm-up budget (default: WARMUP["BUDGET_MS"])')
+        parser.add_argument('--first-request-budget-ms', type=float,
+                            help='Per-URL budget after warm-up (default: WARMUP["FIRST_REQUEST_BUDGET_MS"])')
+        parser.add_argument('--urls', nargs='*',
+                            help='URL names to request after warming (default: WARMUP["URLS"])')
+        parser.add_argument('--no-requests', action='store_true', help='Skip the first-request timings')
+        parser.add_argument('--output', help='Also write the report to this JSON file')
+
+    def handle(self, *args, **options):
+        config = get_warmup_config()
+        if options['budget_ms'] is not None:
+            config['BUDGET_MS'] = options['budget_ms']
+        if options['first_request_budget_ms'] is not None:
+            config['FIRST_REQUEST_BUDGET_MS'] = options['first_request_budget_ms']
+        if options['urls'] is not None:
+            config['URLS'] = options['urls']
+
+        report = warm_up(config, requests=not options['no_requests'])
+
+        self.stdout.write(f'{"import":<32}{"ms":>10}')
+        for module, ms in report['imports'].items():
+            self.stdout.write(f'{module:<32}{"preloaded" if ms is None else ms:>10}')
+
+        self.stdout.write(f'\n{"step":<32}{"ms":>10}  detail')
+        for name, result in report['steps'].items():
+            self.stdout.write(f'{name:<32}{result["ms"]:>10}  {result.get("detail") or result.get("error")}')
+
+        if report['first_requests']:
+            self.stdout.write(f'\n{"first request":<32}{"ms":>10}  status')
+            for path, result in report['first_requests'].items():
+                self.stdout.write(f'{path:<32}{result["ms"]:>10}  {result["status"]}')
+
+        self.stdout.write(f'\nTotal warm-up: {report["total_ms"]}ms')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+        violations = check_budget(report, config)
+        if violations:
+            raise CommandError('Cold-start budget exceeded:\n  ' + '\n  '.join(violations))
+        self.stdout.write(self.style.SUCCESS('Within cold-start budget'))
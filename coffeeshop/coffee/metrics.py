@@ -0,0 +1,267 @@
+"""
+Prometheus metrics.
+
+Each process keeps its counters and histograms in memory. Serving
+processes (the worker boot hook calls share()) also write a snapshot to
+their own file under METRICS_DIR at most every METRICS_FLUSH_INTERVAL
+seconds, and the /metrics view merges every snapshot whose process is still
+running, so totals are correct with several worker processes. Tests and
+management commands keep their metrics to themselves. Gauges describing
+shop state (carts, orders by status) are read from the database at scrape
+time.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (type, help)
+METRICS = {
+    'coffee_http_requests_total': ('counter', 'HTTP requests by view, method and status'),
+    'coffee_http_request_duration_seconds': ('histogram', 'Request latency by view and status'),
+    'coffee_db_queries_total': ('counter', 'Database queries by view'),
+    'coffee_db_query_duration_seconds_total': ('counter', 'Time spent in database queries by view'),
+    'coffee_db_lock_timeouts_total': ('counter', 'Requests that timed out waiting for the database write lock'),
+    'coffee_cache_requests_total': ('counter', 'Cache lookups by key namespace and result'),
+    'coffee_emails_total': ('counter', 'Notification emails by result'),
+    'coffee_cart_additions_total': ('counter', 'Items added to carts'),
+    'coffee_checkouts_total': ('counter', 'Completed checkouts'),
+    'coffee_warmup_duration_seconds': ('histogram', 'Worker warm-up time at boot'),
+}
+GAUGES = {
+    'coffee_carts_with_items': 'Carts currently holding at least one item',
+    'coffee_orders': 'Orders by status',
+    'coffee_metrics_processes': 'Processes contributing to these metrics',
+}
+
+_START = int(time.time())
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    """Counters and histograms for the current process"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.last_flush = 0.0
+        # Whether flush() writes to METRICS_DIR; see share()
+        self.shared = False
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _labels_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels_key(labels))
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            # Per-bucket counts (the last slot is +Inf), then sum and count
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [0] * (len(self.buckets) + 3)
+            hist[index] += 1
+            hist[-2] += value
+            hist[-1] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(hist)] for (name, labels), hist in self.histograms.items()],
+            }
+
+    def flush_due(self):
+        """True when flush() would write; cheap enough to check on every request"""
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+        return (
+            self.shared and bool(getattr(settings, 'METRICS_DIR', None))
+            and time.monotonic() - self.last_flush >= interval
+        )
+
+    def flush(self, force=False):
+        """Write this process's snapshot to METRICS_DIR"""
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not self.shared or not directory:
+            return
+        with self.lock:
+            # Claimed under the lock so only one caller writes per interval
+            now = time.monotonic()
+            if not force and now - self.last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+                return
+            self.last_flush = now
+
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}-{_START}.json')
+        tmp_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+
+registry = Registry()
+
+
+def share():
+    """Publish this process's metrics to every worker's /metrics; for serving processes only"""
+    registry.shared = True
+    registry.flush(force=True)
+
+
+def _running(pid):
+    if os.name == 'nt':
+        # os.kill would terminate the process; keep its snapshot
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def inc(name, amount=1, **labels):
+    registry.inc(name, amount, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+def cache_namespace(key):
+    """Group cache keys for hit/miss labels, e.g. 'coffee:catalog'"""
+    if key.startswith('django.contrib.sessions'):
+        return 'sessions'
+    return ':'.join(str(key).split(':')[:2])
+
+
+def record_cache_lookup(key, hit):
+    inc('coffee_cache_requests_total', namespace=cache_namespace(key), result='hit' if hit else 'miss')
+
+
+def collect():
+    """Merge the snapshots of every running serving process (including this one)"""
+    registry.flush(force=True)
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if registry.shared and directory:
+        snapshots = []
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            pid = os.path.basename(path).split('-')[0]
+            if pid.isdigit() and not _running(int(pid)):
+                # Its counts went with it; drop them rather than add them forever
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                # Being replaced by its owner right now
+                continue
+    else:
+        snapshots = [registry.snapshot()]
+
+    counters = {}
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, hist in snapshot['histograms']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            if key in histograms:
+                histograms[key] = [a + b for a, b in zip(histograms[key], hist)]
+            else:
+                histograms[key] = list(hist)
+    return counters, histograms, len(snapshots)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def database_gauges():
+    """Shop state read at scrape time: {name: [(labels, value)]}"""
+    from django.db.models import Count
+    from .models import Cart, Order
+    from .routers import analytics_reads
+
+    with analytics_reads():
+        carts = Cart.objects.filter(cartitem__isnull=False).distinct().count()
+        orders = list(Order.objects.values('status').annotate(count=Count('id')).order_by('status'))
+    return {
+        'coffee_carts_with_items': [((), carts)],
+        'coffee_orders': [((('status', row['status']),), row['count']) for row in orders],
+    }
+
+
+def render_metrics():
+    """Text exposition format of all metrics"""
+    counters, histograms, processes = collect()
+    lines = []
+
+    for name, (metric_type, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        if metric_type == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        else:
+            for (metric, labels), hist in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                bounds = [str(bound) for bound in registry.buckets] + ['+Inf']
+                for bound, count in zip(bounds, hist[:-2]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(hist[-2])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {hist[-1]}')
+
+    gauges = database_gauges()
+    gauges['coffee_metrics_processes'] = [((), processes)]
+    for name, help_text in GAUGES.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        for labels, value in gauges.get(name, []):
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, open to METRICS_ALLOWED_IPS and staff"""
+    allowed = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+    if not allowed and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden('Forbidden')
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
@@ -0,0 +1,195 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import OperationalError
+from django.http import HttpResponse
+
+from . import metrics, querystats
+
+logger = logging.getLogger(__name__)
+
+SESSION_RENEWED_KEY = '_renewed_at'
+LOCK_TIMEOUT_HEADER = 'X-DB-Lock-Timeout'
+
+
+class HybridMiddleware:
+    """
+    Base for middleware that runs natively under both WSGI and ASGI, so
+    async views are not pushed back onto a thread by the middleware chain.
+    Subclasses implement __call__ and __acall__.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+
+class SessionRenewalMiddleware(HybridMiddleware):
+    """
+    Keep sessions alive without writing them on every request.
+
+    With SESSION_SAVE_EVERY_REQUEST off, a session is only saved when its
+    content changes. This middleware additionally marks a non-empty session
+    as modified once more than SESSION_RENEW_AFTER seconds have passed since
+    it was last written, so the expiry still slides forward for active users
+    at most once per window. Must be listed after SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.renew_after = getattr(settings, 'SESSION_RENEW_AFTER', settings.SESSION_COOKIE_AGE // 2)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        self.renew(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        self.renew(request)
+        return response
+
+    def renew(self, request):
+        session = getattr(request, 'session', None)
+        # Only look at sessions the request already loaded
+        if session is None or not session.accessed or session.is_empty():
+            return
+
+        now = int(time.time())
+        if session.modified:
+            # Being written anyway: just record when
+            session[SESSION_RENEWED_KEY] = now
+        elif now - session.get(SESSION_RENEWED_KEY, 0) >= self.renew_after:
+            session[SESSION_RENEWED_KEY] = now
+
+
+class QueryBudgetMiddleware(HybridMiddleware):
+    """
+    Record query count, DB time and repeated query shapes for every request,
+    keyed by URL name. Requests over the QUERY_BUDGET settings or showing an
+    N+1 pattern are logged; aggregates are served by admin_query_stats_api.
+    Place it near the top so session and auth queries are counted too.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.config = querystats.get_budget_config()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not self.config['ENABLED']:
+            return self.get_response(request)
+
+        recorder = querystats.QueryRecorder()
+        with querystats.recording(recorder):
+            response = self.get_response(request)
+        return self.report(request, response, recorder)
+
+    async def __acall__(self, request):
+        if not self.config['ENABLED']:
+            return await self.get_response(request)
+
+        recorder = querystats.QueryRecorder()
+        with querystats.recording(recorder):
+            response = await self.get_response(request)
+        return self.report(request, response, recorder)
+
+    def report(self, request, response, recorder):
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else 'unresolved'
+        report = querystats.check_budget(view_name, recorder, self.config)
+        querystats.record(report)
+        request.query_report = report
+
+        if report['violations']:
+            logger.warning(
+                f'Query budget exceeded on {view_name} ({request.path}): '
+                + '; '.join(report['violations'])
+            )
+        for key, dup in report['n_plus_one'].items():
+            logger.warning(
+                f'Possible N+1 on {view_name} ({request.path}): '
+                f'query {key} ran {dup["count"]} times: {dup["sql"][:200]}'
+            )
+
+        if self.config['SERVER_TIMING']:
+            response['Server-Timing'] = (
+                f'db;dur={recorder.duration_ms:.1f};desc="{recorder.count} queries"'
+            )
+        return response
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """
+    Count requests and observe latency per URL name and status for
+    coffee.metrics. Place it first so the timing covers all other
+    middleware; DB figures come from QueryBudgetMiddleware's report.
+    """
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start)
+        metrics.registry.flush()
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start)
+        if metrics.registry.flush_due():
+            # The flush writes a file; keep it off the event loop
+            await sync_to_async(metrics.registry.flush, thread_sensitive=False)()
+        return response
+
+    def observe(self, request, response, duration):
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else 'unresolved'
+        status = str(response.status_code)
+        metrics.inc('coffee_http_requests_total', view=view_name, method=request.method, status=status)
+        metrics.observe('coffee_http_request_duration_seconds', duration, view=view_name, status=status)
+
+        report = getattr(request, 'query_report', None)
+        if report:
+            metrics.inc('coffee_db_queries_total', report['queries'], view=view_name)
+            metrics.inc('coffee_db_query_duration_seconds_total', report['db_time_ms'] / 1000, view=view_name)
+
+
+class DatabaseLockMiddleware(HybridMiddleware):
+    """
+    Answer a view that gave up waiting for the SQLite write lock with a 503,
+    ``Retry-After`` and an X-DB-Lock-Timeout header instead of a generic
+    500, so clients and load tests can tell lock contention from bugs
+    whether or not DEBUG is on. Counted in coffee_db_lock_timeouts_total.
+    """
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, OperationalError) or 'locked' not in str(exception):
+            return None
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else 'unresolved'
+        logger.warning(f'Database lock timeout on {view_name} ({request.path}): {exception}')
+        metrics.inc('coffee_db_lock_timeouts_total', view=view_name)
+        response = HttpResponse('The shop is busy, please try again.', status=503, content_type='text/plain')
+        response['Retry-After'] = '1'
+        response[LOCK_TIMEOUT_HEADER] = '1'
+        return response
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 08:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coffee', '0007_dashboardanalytics_category_coupon_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='image_placeholder',
+            field=models.TextField(blank=True, editable=False, help_text='Inline blurred preview (data URI)'),
+        ),
+        migrations.AddField(
+            model_name='menuitem',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Resized variants generated from image'),
+        ),
+    ]
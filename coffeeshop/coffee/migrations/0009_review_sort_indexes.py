@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coffee', '0008_menuitem_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['menu_item', '-created_at', '-id'], name='review_item_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['menu_item', '-helpful_count', '-created_at', '-id'], name='review_item_helpful_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['menu_item', '-rating', '-created_at', '-id'], name='review_item_highest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['menu_item', 'rating', '-created_at', '-id'], name='review_item_lowest_idx'),
+        ),
+    ]
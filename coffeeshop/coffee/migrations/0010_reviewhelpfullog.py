@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coffee', '0009_review_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewHelpfulLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.SmallIntegerField()),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='coffee.review')),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 09:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coffee', '0010_reviewhelpfullog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='menuitem',
+            name='reserved_stock',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Units held by cart reservations (see coffee.reservations)'),
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='coffee.cart')),
+                ('menu_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='coffee.menuitem')),
+            ],
+            options={
+                'unique_together': {('cart', 'menu_item')},
+            },
+        ),
+    ]
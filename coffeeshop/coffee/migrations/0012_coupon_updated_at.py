@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('coffee', '0011_stockreservation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupon',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
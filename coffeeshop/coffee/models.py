@@ -38,7 +38,10 @@ class MenuItem(models.Model):
     category_obj = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True)
     image_url = models.URLField(blank=True, null=True)
     image = models.ImageField(upload_to='menu_items/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False, help_text="Resized variants generated from image")
+    image_placeholder = models.TextField(blank=True, editable=False, help_text="Inline blurred preview (data URI)")
     stock = models.PositiveIntegerField(default=10, help_text="Available stock quantity")
+    reserved_stock = models.PositiveIntegerField(default=0, editable=False, help_text="Units held by cart reservations (see coffee.reservations)")
     is_available = models.BooleanField(default=True)
     is_featured = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -47,6 +50,22 @@ class MenuItem(models.Model):
     def __str__(self):
         return f"{self.name} - £{self.price}"
     
+    def save(self, *args, **kwargs):
+        # reserved_stock only changes through conditional UPDATEs in
+        # coffee.reservations; saving an item read earlier must never write
+        # its stale copy back, so updates leave the field out
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'reserved_stock' and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+    
+    @property
+    def has_image(self):
+        return bool(self.image or self.image_url)
+    
     @property
     def is_in_stock(self):
         return self.stock > 0
@@ -71,10 +90,7 @@ class MenuItem(models.Model):
     @property
     def average_rating(self):
         """Calculate average rating from reviews"""
-        reviews = self.reviews.all()
-        if reviews:
-            return reviews.aggregate(avg_rating=models.Avg('rating'))['avg_rating'] or 0
-        return 0
+        return self.reviews.aggregate(avg_rating=models.Avg('rating'))['avg_rating'] or 0
     
     @property
     def rating_count(self):
@@ -99,9 +115,8 @@ class MenuItem(models.Model):
     def get_rating_breakdown(self):
         """Get rating breakdown (1-5 stars count)"""
         breakdown = {i: 0 for i in range(1, 6)}
-        reviews = self.reviews.all()
-        for review in reviews:
-            breakdown[review.rating] += 1
+        for row in self.reviews.order_by().values('rating').annotate(count=models.Count('id')):
+            breakdown[row['rating']] = row['count']
         return breakdown
     
     class Meta:
@@ -147,6 +162,16 @@ class CartItem(models.Model):
         unique_together = ['cart', 'menu_item']
         ordering = ['-created_at']
 
+class StockReservation(models.Model):
+    """Stock a cart holds until expires_at (see coffee.reservations)"""
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE)
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ['cart', 'menu_item']
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -314,6 +339,13 @@ class Review(models.Model):
     class Meta:
         unique_together = ('menu_item', 'user')  # One review per user per item
         ordering = ['-created_at']
+        # One per sort of the reviews API (coffee.reviews.REVIEW_SORTS)
+        indexes = [
+            models.Index(fields=['menu_item', '-created_at', '-id'], name='review_item_newest_idx'),
+            models.Index(fields=['menu_item', '-helpful_count', '-created_at', '-id'], name='review_item_helpful_idx'),
+            models.Index(fields=['menu_item', '-rating', '-created_at', '-id'], name='review_item_highest_idx'),
+            models.Index(fields=['menu_item', 'rating', '-created_at', '-id'], name='review_item_lowest_idx'),
+        ]
     
     def __str__(self):
         return f'{self.user.username} - {self.menu_item.name} ({self.rating} stars)'
@@ -335,6 +367,12 @@ class ReviewHelpful(models.Model):
         unique_together = ('review', 'user')
 
 
+class ReviewHelpfulLog(models.Model):
+    """Helpful-vote deltas not yet applied to Review.helpful_count (see coffee.votes)"""
+    review = models.ForeignKey(Review, on_delete=models.CASCADE)
+    delta = models.SmallIntegerField()
+
+
 # Wishlist System
 class Wishlist(models.Model):
     """User wishlist for favorite items"""
@@ -384,6 +422,8 @@ class Coupon(models.Model):
     valid_to = models.DateTimeField()
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Part of the coupon table's stamp (see coffee.coupons)
+    updated_at = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"{self.code} - {self.name}"
@@ -0,0 +1,69 @@
+"""
+Anonymous full-page cache.
+
+home, about, services and menu render the same HTML for every anonymous
+visitor in a given currency. anonymous_page_cache stores that HTML under a
+catalog-versioned key, so any catalog change purges it, and later visitors
+are served without running the view. Pages rendered for the cache carry no
+per-visitor data: the cart badge reads 0, flash messages stay queued and no
+CSRF token is embedded. base.html fills those in from the page_state API
+after load.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from .catalog import catalog_cache_key
+
+DEFAULT_CURRENCY = 'GBP'
+
+
+def is_cacheable_request(request):
+    """Anonymous GET/HEAD without a query string"""
+    if request.method not in ('GET', 'HEAD') or request.GET:
+        return False
+    session = getattr(request, 'session', None)
+    # Checked on the session so the user is never loaded from the database
+    return session is None or SESSION_KEY not in session
+
+
+def page_cache_key(request):
+    session = getattr(request, 'session', None)
+    currency = session.get('currency', DEFAULT_CURRENCY) if session is not None else DEFAULT_CURRENCY
+    return catalog_cache_key('page', request.path, currency)
+
+
+def anonymous_page_cache(view):
+    """Serve anonymous GETs of ``view`` from the page cache"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 0)
+        if not timeout or not is_cacheable_request(request):
+            return view(request, *args, **kwargs)
+
+        key = page_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Page-Cache'] = 'hit'
+            return response
+
+        request.page_cache_render = True
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming and not response.cookies:
+            cache.set(key, (response.content, response['Content-Type']), timeout)
+        response['X-Page-Cache'] = 'miss'
+        return response
+    return wrapper
+
+
+def page_cache_context(request):
+    """Context processor keeping per-visitor data out of cached pages"""
+    if getattr(request, 'page_cache_render', False):
+        # Makes {% csrf_token %} render nothing; page_state supplies the token
+        return {'page_cache_render': True, 'csrf_token': 'NOTPROVIDED'}
+    return {}
@@ -0,0 +1,212 @@
+"""
+Per-request query instrumentation.
+
+QueryRecorder is installed as a database execute wrapper for the lifetime of
+a request and keeps the query count, total DB time and how often each query
+*shape* ran. Two queries share a shape (fingerprint) when they only differ in
+their parameters, so the same shape running many times in one request is
+almost always an N+1. Results are aggregated per URL name in-process.
+
+A single execute wrapper is installed on every connection and forwards to
+the recorder held in a context variable, so queries that async views run
+through sync_to_async (on another thread's connection) are counted too.
+"""
+import hashlib
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DEFAULT_QUERY_BUDGET = {
+    'ENABLED': True,
+    'MAX_QUERIES': 30,
+    'MAX_DB_TIME_MS': 250,
+    'DUPLICATE_THRESHOLD': 5,
+    'VIEWS': {},
+    'SERVER_TIMING': False,
+}
+MAX_FINGERPRINTS_PER_VIEW = 20
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%s|\?')
+_IN_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACE_RE = re.compile(r'\s+')
+
+_stats = {}
+_lock = threading.Lock()
+_recorder = ContextVar('coffee_query_recorder', default=None)
+
+
+def get_budget_config():
+    """QUERY_BUDGET setting merged over the defaults"""
+    return {**DEFAULT_QUERY_BUDGET, **getattr(settings, 'QUERY_BUDGET', {})}
+
+
+def normalize_sql(sql):
+    """Strip literals and collapse IN lists so queries compare by shape"""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('(...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    # Parametrized SQL repeats verbatim, so most lookups skip the regexes
+    return hashlib.md5(normalize_sql(sql).encode('utf-8')).hexdigest()[:12]
+
+
+class QueryRecorder:
+    """Database execute wrapper that tallies queries for one request"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            key = fingerprint(sql)
+            if key in self.shapes:
+                self.shapes[key][1] += 1
+            else:
+                self.shapes[key] = [sql, 1]
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+    def duplicates(self, threshold):
+        """Query shapes repeated at least ``threshold`` times"""
+        return {
+            key: {'sql': normalize_sql(sql)[:500], 'count': count}
+            for key, (sql, count) in self.shapes.items()
+            if count >= threshold
+        }
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_execute_wrapper(sender, connection, **kwargs):
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+@contextmanager
+def recording(recorder):
+    """Send every query run in this context (and threads it hands off to) to ``recorder``"""
+    # Connections opened before this module was imported missed the signal
+    for alias in connections:
+        install_execute_wrapper(None, connections[alias])
+    token = _recorder.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _recorder.reset(token)
+
+
+def check_budget(view_name, recorder, config=None):
+    """
+    Compare a request's queries against its budget.
+
+    Per-view overrides come from ``QUERY_BUDGET['VIEWS'][view_name]``.
+    """
+    config = config or get_budget_config()
+    budget = {**config, **config['VIEWS'].get(view_name, {})}
+    duplicates = recorder.duplicates(budget['DUPLICATE_THRESHOLD'])
+    violations = []
+    if recorder.count > budget['MAX_QUERIES']:
+        violations.append(f'{recorder.count} queries (budget {budget["MAX_QUERIES"]})')
+    if recorder.duration_ms > budget['MAX_DB_TIME_MS']:
+        violations.append(f'{recorder.duration_ms:.1f}ms DB time (budget {budget["MAX_DB_TIME_MS"]}ms)')
+    return {
+        'view': view_name,
+        'queries': recorder.count,
+        'db_time_ms': round(recorder.duration_ms, 2),
+        'violations': violations,
+        'n_plus_one': duplicates,
+    }
+
+
+def record(report):
+    """Fold one request's report into the per-view aggregates"""
+    with _lock:
+        entry = _stats.setdefault(report['view'], {
+            'requests': 0,
+            'queries_total': 0,
+            'queries_max': 0,
+            'db_time_total_ms': 0.0,
+            'db_time_max_ms': 0.0,
+            'over_budget': 0,
+            'n_plus_one_requests': 0,
+            'duplicates': {},
+        })
+        entry['requests'] += 1
+        entry['queries_total'] += report['queries']
+        entry['queries_max'] = max(entry['queries_max'], report['queries'])
+        entry['db_time_total_ms'] += report['db_time_ms']
+        entry['db_time_max_ms'] = max(entry['db_time_max_ms'], report['db_time_ms'])
+        if report['violations']:
+            entry['over_budget'] += 1
+        if report['n_plus_one']:
+            entry['n_plus_one_requests'] += 1
+
+        for key, dup in report['n_plus_one'].items():
+            known = entry['duplicates'].get(key)
+            if known is None:
+                if len(entry['duplicates']) >= MAX_FINGERPRINTS_PER_VIEW:
+                    continue
+                known = entry['duplicates'][key] = {'sql': dup['sql'], 'requests': 0, 'max_repeats': 0}
+            known['requests'] += 1
+            known['max_repeats'] = max(known['max_repeats'], dup['count'])
+
+
+def get_stats():
+    """Aggregated stats per view, heaviest total query count first"""
+    with _lock:
+        rows = []
+        entries = sorted(_stats.items(), key=lambda pair: -pair[1]['queries_total'])
+        for view_name, entry in entries:
+            requests = entry['requests'] or 1
+            rows.append({
+                'view': view_name,
+                'requests': entry['requests'],
+                'avg_queries': round(entry['queries_total'] / requests, 2),
+                'max_queries': entry['queries_max'],
+                'avg_db_time_ms': round(entry['db_time_total_ms'] / requests, 2),
+                'max_db_time_ms': round(entry['db_time_max_ms'], 2),
+                'over_budget': entry['over_budget'],
+                'n_plus_one_requests': entry['n_plus_one_requests'],
+                'duplicates': [
+                    {'fingerprint': key, **dup}
+                    for key, dup in sorted(
+                        entry['duplicates'].items(), key=lambda pair: -pair[1]['max_repeats']
+                    )
+                ],
+            })
+    return rows
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
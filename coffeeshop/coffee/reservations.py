@@ -0,0 +1,240 @@
+"""
+Stock reservations for items in carts.
+
+Putting an item in a cart holds that many units for
+STOCK_RESERVATION_TTL seconds, refreshed whenever the cart line changes;
+callers write the hold and the cart line in one transaction.
+MenuItem.reserved_stock counts the units held, so a hold is taken with one
+conditional UPDATE (``stock - reserved_stock >= wanted``) and never needs
+the item row locked beyond that statement. Checkout turns the cart's
+holds into a stock decrement; release_expired hands back expired holds in
+bulk (``manage.py release_stock_holds``, and for a single item whenever a
+hold on it is refused), and deleting a cart releases its holds first.
+reconcile_reserved corrects any counters that drift anyway.
+
+Whoever deletes a StockReservation row gives its units back, and a sweep
+rolls back if any hold it read was refreshed or deleted meanwhile, so a
+hold is released exactly once.
+
+available_stock serves ``stock - reserved_stock`` for display from the
+cache; it is dropped whenever a hold or the stock changes.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .catalog import bump_catalog_version
+from .models import MenuItem, StockReservation
+
+logger = logging.getLogger(__name__)
+
+AVAILABILITY_CACHE_TIMEOUT = 60
+
+
+class OutOfStock(ValueError):
+    """Not enough unreserved stock; ``available`` is how much there is"""
+
+    def __init__(self, menu_item_id, available):
+        self.menu_item_id = menu_item_id
+        self.available = available
+        super().__init__(f'Only {available} left in stock')
+
+
+def availability_key(item_id):
+    return f'coffee:stock:available:{item_id}'
+
+
+def forget_availability(item_ids):
+    """Drop cached availability once the current transaction commits"""
+    keys = [availability_key(item_id) for item_id in item_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _unreserved(item_ids):
+    return dict(MenuItem.objects.filter(id__in=item_ids).values_list(
+        'id', Greatest(F('stock') - F('reserved_stock'), Value(0))
+    ))
+
+
+def available_stock(item_ids):
+    """Return ``{item id: unreserved units}``, from the cache where possible"""
+    keys = {item_id: availability_key(item_id) for item_id in item_ids}
+    cached = cache.get_many(keys.values())
+    available = {item_id: cached[key] for item_id, key in keys.items() if key in cached}
+
+    missing = [item_id for item_id in keys if item_id not in available]
+    if missing:
+        fresh = _unreserved(missing)
+        cache.set_many({keys[item_id]: units for item_id, units in fresh.items()}, AVAILABILITY_CACHE_TIMEOUT)
+        available.update(fresh)
+    return available
+
+
+def _claim(item_id, quantity):
+    """Hold ``quantity`` more units of an item if that many are free; returns whether it did"""
+    return bool(MenuItem.objects.filter(
+        id=item_id, is_available=True, stock__gte=F('reserved_stock') + quantity,
+    ).update(reserved_stock=F('reserved_stock') + quantity))
+
+
+def _adjust(stock_changes, reserved_changes):
+    """Apply per-item decrements to stock and reserved_stock with one UPDATE, clamped at zero"""
+    item_ids = set(stock_changes) | set(reserved_changes)
+    if not item_ids:
+        return
+    fields = {}
+    for field, changes in (('stock', stock_changes), ('reserved_stock', reserved_changes)):
+        if changes:
+            fields[field] = Case(
+                *[
+                    When(id=item_id, then=Greatest(F(field) - Value(amount), Value(0)))
+                    for item_id, amount in changes.items()
+                ],
+                default=F(field),
+                output_field=IntegerField(),
+            )
+    if stock_changes:
+        # Stock is in the cached item JSON and catalog responses; holds are not
+        fields['updated_at'] = timezone.now()
+        transaction.on_commit(bump_catalog_version)
+    MenuItem.objects.filter(id__in=item_ids).update(**fields)
+    forget_availability(item_ids)
+
+
+def _take(holds):
+    """
+    Delete the StockReservation rows in ``holds`` (``(id, item id,
+    quantity)`` tuples) one statement each, and return ``{item id: units}``
+    for the rows this call deleted
+    """
+    taken = {}
+    for hold_id, item_id, quantity in holds:
+        if StockReservation.objects.filter(id=hold_id).delete()[0]:
+            taken[item_id] = taken.get(item_id, 0) + quantity
+    return taken
+
+
+def reserve(cart_id, menu_item_id, quantity):
+    """
+    Make a cart's hold on an item ``quantity`` units, expiring
+    STOCK_RESERVATION_TTL seconds from now. Raises OutOfStock if the extra
+    units are not free.
+    """
+    try:
+        _reserve(cart_id, menu_item_id, quantity)
+    except OutOfStock:
+        # Expired holds may be all that stands in the way
+        if not release_expired(item_ids=[menu_item_id]):
+            raise
+        _reserve(cart_id, menu_item_id, quantity)
+
+
+def _reserve(cart_id, menu_item_id, quantity):
+    ttl = getattr(settings, 'STOCK_RESERVATION_TTL', 900)
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    with transaction.atomic():
+        hold = StockReservation.objects.filter(cart_id=cart_id, menu_item_id=menu_item_id).values_list(
+            'id', 'quantity'
+        ).first()
+        owned = False
+        if hold is not None:
+            # Rewriting the hold first settles any race with a sweep: if the
+            # row is gone its units were already given back
+            if quantity > 0:
+                owned = StockReservation.objects.filter(id=hold[0]).update(quantity=quantity, expires_at=expires_at)
+            else:
+                owned = StockReservation.objects.filter(id=hold[0]).delete()[0]
+        held = hold[1] if owned else 0
+        extra = quantity - held
+        if extra > 0 and not _claim(menu_item_id, extra):
+            raise OutOfStock(menu_item_id, _unreserved([menu_item_id]).get(menu_item_id, 0) + held)
+        if extra < 0:
+            _adjust({}, {menu_item_id: -extra})
+        if quantity > 0 and not owned:
+            StockReservation.objects.create(
+                cart_id=cart_id, menu_item_id=menu_item_id, quantity=quantity, expires_at=expires_at,
+            )
+        forget_availability([menu_item_id])
+
+
+def release(cart_id, item_ids=None):
+    """Give back a cart's holds (on ``item_ids`` only, if given)"""
+    holds = StockReservation.objects.filter(cart_id=cart_id)
+    if item_ids is not None:
+        holds = holds.filter(menu_item_id__in=item_ids)
+    with transaction.atomic():
+        _adjust({}, _take(holds.values_list('id', 'menu_item_id', 'quantity')))
+
+
+def consume(cart):
+    """
+    Turn ``cart``'s holds into sold stock for its current lines, in the
+    caller's transaction. Lines without a big enough hold (it expired and
+    was swept) claim the difference first; raises OutOfStock if they can't.
+    """
+    held = _take(StockReservation.objects.filter(cart=cart).values_list('id', 'menu_item_id', 'quantity'))
+    sold = {}
+    for item_id, quantity in cart.cartitem_set.values_list('menu_item_id', 'quantity'):
+        sold[item_id] = sold.get(item_id, 0) + quantity
+    for item_id, quantity in sold.items():
+        extra = quantity - held.get(item_id, 0)
+        if extra > 0:
+            if not _claim(item_id, extra) and not (release_expired(item_ids=[item_id]) and _claim(item_id, extra)):
+                raise OutOfStock(item_id, _unreserved([item_id]).get(item_id, 0) + held.get(item_id, 0))
+            held[item_id] = quantity
+    _adjust(sold, held)
+
+
+def release_expired(batch_size=5000, item_ids=None):
+    """
+    Give back up to ``batch_size`` expired holds with one UPDATE and
+    return how many were released
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        expired = StockReservation.objects.filter(expires_at__lte=now)
+        if item_ids is not None:
+            expired = expired.filter(menu_item_id__in=item_ids)
+        holds = list(expired.order_by('expires_at').values_list('id', 'menu_item_id', 'quantity')[:batch_size])
+        if not holds:
+            return 0
+        # Only give back what this sweep removed, and as it was read: a hold
+        # refreshed or released meanwhile makes the counts differ
+        deleted, _ = StockReservation.objects.filter(
+            id__in=[hold_id for hold_id, _, _ in holds], expires_at__lte=now,
+        ).delete()
+        if deleted != len(holds):
+            transaction.set_rollback(True)
+            logger.info('Stock hold sweep raced another release; leaving the holds for the next sweep')
+            return 0
+
+        released = {}
+        for _, item_id, quantity in holds:
+            released[item_id] = released.get(item_id, 0) + quantity
+        _adjust({}, released)
+    return len(holds)
+
+
+def reconcile_reserved():
+    """
+    Correct every reserved_stock that disagrees with its StockReservation
+    rows. Returns the number corrected.
+    """
+    holds = StockReservation.objects.filter(menu_item=OuterRef('pk')).order_by().values('menu_item').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    expected = Coalesce(Subquery(holds), 0)
+    corrected = list(
+        MenuItem.objects.annotate(expected=expected).exclude(reserved_stock=F('expected')).values_list('id', flat=True)
+    )
+    if corrected:
+        MenuItem.objects.filter(id__in=corrected).update(reserved_stock=expected)
+        forget_availability(corrected)
+    return len(corrected)
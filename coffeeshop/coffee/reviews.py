@@ -0,0 +1,106 @@
+"""
+Review listing for the reviews API.
+
+Reviews are paged with an opaque keyset cursor instead of page numbers:
+each page continues from the sort key of the last review on the previous
+one, so a deep page of a popular item costs the same as the first and new
+reviews never shift the page a client is reading. Every sort has a
+matching index on Review. The rating summary is a single aggregate query,
+cached against the catalog version (review changes bump it).
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q
+
+from .catalog import CATALOG_CACHE_TIMEOUT, catalog_cache_key
+from .fastserializers import REVIEW
+from .models import Review
+
+# id last, so every ordering is total
+REVIEW_SORTS = {
+    'newest': ('-created_at', '-id'),
+    'helpful': ('-helpful_count', '-created_at', '-id'),
+    'highest': ('-rating', '-created_at', '-id'),
+    'lowest': ('rating', '-created_at', '-id'),
+}
+DEFAULT_SORT = 'newest'
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+
+
+def _field(order):
+    return order.lstrip('-')
+
+
+def encode_cursor(sort, row):
+    """Cursor pointing just past ``row`` (raw values) in ``sort`` order"""
+    values = []
+    for order in REVIEW_SORTS[sort]:
+        value = row[_field(order)]
+        # Full precision; DjangoJSONEncoder would cut datetimes to milliseconds
+        values.append(value.isoformat() if isinstance(value, datetime) else value)
+    return base64.urlsafe_b64encode(json.dumps([sort, values]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(sort, cursor):
+    """Sort key values from a cursor; raises ValueError for a bad or foreign cursor"""
+    try:
+        cursor_sort, values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        ordering = REVIEW_SORTS[sort]
+        if cursor_sort != sort or len(values) != len(ordering):
+            raise ValueError
+        return [
+            datetime.fromisoformat(value) if _field(order) == 'created_at' else int(value)
+            for order, value in zip(ordering, values)
+        ]
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError('Invalid cursor')
+
+
+def keyset_filter(ordering, values):
+    """Q selecting the rows that come after ``values`` in ``ordering``"""
+    after = Q()
+    equal = Q()
+    for order, value in zip(ordering, values):
+        lookup = 'lt' if order.startswith('-') else 'gt'
+        after |= equal & Q(**{f'{_field(order)}__{lookup}': value})
+        equal &= Q(**{_field(order): value})
+    return after
+
+
+def review_page(menu_item_id, sort=DEFAULT_SORT, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return ``(reviews, next_cursor)`` for one page; next_cursor is None on the last page"""
+    ordering = REVIEW_SORTS[sort]
+    queryset = Review.objects.filter(menu_item_id=menu_item_id).order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(keyset_filter(ordering, decode_cursor(sort, cursor)))
+
+    # One extra row tells whether there is a next page
+    rows = list(REVIEW.iter_encoded(queryset[:limit + 1], extra=tuple(_field(order) for order in ordering)))
+    next_cursor = encode_cursor(sort, rows[limit - 1][0]) if len(rows) > limit else None
+    return [data for _, data in rows[:limit]], next_cursor
+
+
+def review_summary(menu_item_id):
+    """average_rating, rating_count and rating_breakdown of an item"""
+    key = catalog_cache_key('review_summary', menu_item_id)
+    summary = cache.get(key)
+    if summary is not None:
+        return summary
+
+    stats = Review.objects.filter(menu_item_id=menu_item_id).aggregate(
+        average=Avg('rating'),
+        count=Count('id'),
+        **{f'stars_{stars}': Count('id', filter=Q(rating=stars)) for stars in range(1, 6)},
+    )
+    summary = {
+        'average_rating': stats['average'] or 0,
+        'rating_count': stats['count'],
+        'rating_breakdown': {stars: stats[f'stars_{stars}'] for stars in range(1, 6)},
+    }
+    cache.set(key, summary, CATALOG_CACHE_TIMEOUT)
+    return summary
@@ -0,0 +1,64 @@
+"""
+Database routing for analytics reads.
+
+Dashboard and report queries run on the read-only ``analytics`` connection
+so long aggregations never share a connection or transaction with
+checkout. Code opts in with ``analytics_reads()`` (a context manager that
+also works as a view decorator); everything else, and every write, stays
+on ``default``.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+ANALYTICS_DB = 'analytics'
+PRIMARY_DB = 'default'
+
+_read_db = ContextVar('coffee_read_db', default=None)
+
+
+@contextmanager
+def analytics_reads():
+    """Route reads inside the block to the analytics connection"""
+    token = _read_db.set(ANALYTICS_DB)
+    try:
+        yield
+    finally:
+        _read_db.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    """
+    Read-your-writes override: force reads back to the primary, e.g. right
+    after a write inside an analytics_reads() block
+    """
+    token = _read_db.set(PRIMARY_DB)
+    try:
+        yield
+    finally:
+        _read_db.reset(token)
+
+
+class AnalyticsRouter:
+    """Send opted-in reads to the analytics connection, writes to the primary"""
+
+    def db_for_read(self, model, **hints):
+        if _read_db.get() != ANALYTICS_DB or ANALYTICS_DB not in settings.DATABASES:
+            return PRIMARY_DB
+        # Inside a transaction on the primary, keep reading our own writes
+        if connections[PRIMARY_DB].in_atomic_block:
+            return PRIMARY_DB
+        return ANALYTICS_DB
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases point at the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY_DB
@@ -0,0 +1,426 @@
+"""
+Bulk data seeding for benchmarks and load tests.
+
+Rows come from a seeded ``random.Random`` so every run produces the same
+data (bar order ids), and are inserted with ``bulk_create`` in batches
+with model signals muted, so no notification emails, cache invalidation or
+image processing happen while seeding. Menu items and users are kept in
+memory, as is the set of (user, item) pairs already reviewed, which grows
+with the review count; every other table is streamed batch by batch.
+Re-running the seeder adds new users and menu items rather than clashing
+with earlier ones. Order and review timestamps follow the shop's daily and
+weekly traffic pattern.
+"""
+import random
+import uuid
+from bisect import bisect
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import signals as model_signals
+from django.utils import timezone
+
+from .models import (
+    Cart, CartItem, Category, ContactMessage, MenuItem, Order, OrderItem, Review,
+    ReviewHelpful, Wishlist, WishlistItem,
+)
+
+DEFAULT_SEED = 42
+DEFAULT_BATCH_SIZE = 5000
+SEED_PASSWORD = 'seeded-password'
+
+SCALES = {
+    'small': {
+        'menu_items': 200, 'users': 500, 'orders': 2000, 'reviews': 2000,
+        'wishlists': 100, 'carts': 50, 'contact_messages': 100,
+    },
+    'medium': {
+        'menu_items': 1000, 'users': 10000, 'orders': 100000, 'reviews': 100000,
+        'wishlists': 3000, 'carts': 1000, 'contact_messages': 5000,
+    },
+    'full': {
+        'menu_items': 5000, 'users': 100000, 'orders': 1000000, 'reviews': 1000000,
+        'wishlists': 30000, 'carts': 10000, 'contact_messages': 50000,
+    },
+}
+DEFAULT_DAYS = 180
+
+# Relative order volume by local hour: breakfast rush, lunch, afternoon pick-me-up
+HOURLY_WEIGHTS = [
+    0.2, 0.1, 0.1, 0.1, 0.2, 0.6, 2.5, 6.0, 9.0, 8.0, 6.0, 6.5,
+    8.5, 7.5, 5.0, 5.5, 5.0, 3.5, 2.5, 2.0, 1.5, 1.0, 0.6, 0.3,
+]
+# Monday..Sunday; weekends are busier
+WEEKDAY_WEIGHTS = [0.85, 0.9, 0.95, 1.0, 1.15, 1.35, 1.2]
+# Orders grow by this fraction from the first to the last seeded day
+GROWTH = 0.3
+
+FLAVOURS = [
+    'Vanilla', 'Caramel', 'Hazelnut', 'Mocha', 'Cinnamon', 'Honey', 'Maple',
+    'Almond', 'Coconut', 'Pistachio', 'Salted', 'Spiced', 'Double', 'Iced',
+]
+PRODUCTS = {
+    'coffee': ['Latte', 'Americano', 'Flat White', 'Filter Coffee', 'Cortado'],
+    'espresso': ['Espresso', 'Macchiato', 'Ristretto', 'Doppio', 'Lungo'],
+    'cold_drinks': ['Cold Brew', 'Frappe', 'Iced Tea', 'Lemonade', 'Smoothie'],
+    'pastries': ['Croissant', 'Danish', 'Muffin', 'Scone', 'Pain au Chocolat'],
+    'sandwiches': ['Panini', 'Bagel', 'Toastie', 'Wrap', 'Club Sandwich'],
+    'desserts': ['Cheesecake', 'Brownie', 'Tiramisu', 'Tart', 'Cookie'],
+}
+REVIEW_TITLES = {
+    1: 'Disappointing', 2: 'Not great', 3: 'Okay', 4: 'Really good', 5: 'Excellent',
+}
+
+
+@contextmanager
+def muted_signals(*signals):
+    """Disconnect every receiver of the given model signals for the block"""
+    signals = signals or (
+        model_signals.pre_save, model_signals.post_save,
+        model_signals.pre_delete, model_signals.post_delete, model_signals.m2m_changed,
+    )
+    saved = [(signal, signal.receivers) for signal in signals]
+    for signal in signals:
+        signal.receivers = []
+        signal.sender_receivers_cache.clear()
+    try:
+        yield
+    finally:
+        for signal, receivers in saved:
+            signal.receivers = receivers
+            signal.sender_receivers_cache.clear()
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the given created_at/updated_at values"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def insert_batches(model, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Insert an iterable of unsaved instances, yielding each saved batch"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            with transaction.atomic():
+                yield model.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        with transaction.atomic():
+            yield model.objects.bulk_create(batch)
+
+
+def bulk_insert(model, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """Insert an iterable of unsaved instances batch by batch; returns how many"""
+    return sum(len(batch) for batch in insert_batches(model, rows, batch_size))
+
+
+def bulk_insert_all(model, rows, batch_size=DEFAULT_BATCH_SIZE):
+    """bulk_insert that returns every saved instance, for tables later ones refer to"""
+    return [instance for batch in insert_batches(model, rows, batch_size) for instance in batch]
+
+
+def random_timestamp(rng, now, days):
+    """A moment within the last ``days`` days"""
+    return now - timedelta(seconds=rng.randrange(days * 86400))
+
+
+class TrafficPattern:
+    """
+    Draws timestamps over the last ``days`` days following HOURLY_WEIGHTS,
+    WEEKDAY_WEIGHTS and a steady growth trend, in the shop's local time.
+    """
+
+    def __init__(self, now, days=DEFAULT_DAYS):
+        self.now = now
+        local_now = timezone.localtime(now)
+        tz = local_now.tzinfo
+        first_day = local_now.date() - timedelta(days=days - 1)
+
+        slots = []
+        weights = []
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            trend = 1 + GROWTH * offset / max(1, days - 1)
+            for hour, hour_weight in enumerate(HOURLY_WEIGHTS):
+                start = timezone.make_aware(datetime.combine(day, time(hour)), tz)
+                if start >= now:
+                    break
+                slots.append(start)
+                weights.append(hour_weight * WEEKDAY_WEIGHTS[day.weekday()] * trend)
+        self.slots = slots
+        self.cum_weights = list(accumulate(weights))
+
+    def __call__(self, rng, now=None):
+        slot = self.slots[bisect(self.cum_weights, rng.random() * self.cum_weights[-1])]
+        moment = slot + timedelta(seconds=rng.randrange(3600))
+        # The current hour is only partly over
+        return min(moment, self.now)
+
+
+def seed_menu_items(rng, count, batch_size=DEFAULT_BATCH_SIZE):
+    categories = {}
+    for slug, label in MenuItem.CATEGORY_CHOICES:
+        categories[slug], _ = Category.objects.get_or_create(name=label)
+
+    # Names are the catalog's natural key; skip any an earlier run used
+    taken = {name.lower() for name in MenuItem.objects.values_list('name', flat=True)}
+
+    def rows():
+        number = 0
+        for _ in range(count):
+            slug = rng.choice(list(PRODUCTS))
+            product = rng.choice(PRODUCTS[slug])
+            flavour = rng.choice(FLAVOURS)
+            number += 1
+            while f'{flavour} {product} {number}'.lower() in taken:
+                number += 1
+            yield MenuItem(
+                name=f'{flavour} {product} {number}',
+                description=f'{flavour} {product.lower()} made fresh to order.',
+                price=Decimal(rng.randrange(249, 1299)) / 100,
+                category=slug,
+                category_obj=categories[slug],
+                stock=rng.randrange(0, 200),
+                is_available=rng.random() > 0.05,
+                is_featured=rng.random() < 0.02,
+            )
+
+    return bulk_insert_all(MenuItem, rows(), batch_size)
+
+
+def seed_users(rng, count, batch_size=DEFAULT_BATCH_SIZE, now=None):
+    now = now or timezone.now()
+    # One hash for everyone: hashing per user would dominate the run
+    password = make_password(SEED_PASSWORD)
+    # Carry on after the highest seeded username; counting users would
+    # reuse names when other accounts exist or seeded ones were deleted
+    last = User.objects.filter(username__regex=r'^user\d{7}$').order_by('-username').values_list(
+        'username', flat=True
+    ).first()
+    start = int(last[4:]) + 1 if last else 0
+
+    def rows():
+        for n in range(start, start + count):
+            first = rng.choice(['Alex', 'Sam', 'Priya', 'Jordan', 'Maya', 'Chris', 'Aisha', 'Tom'])
+            last = rng.choice(['Patel', 'Smith', 'Jones', 'Khan', 'Brown', 'Taylor', 'Wilson', 'Shah'])
+            yield User(
+                username=f'user{n:07d}',
+                email=f'user{n:07d}@example.com',
+                first_name=first,
+                last_name=last,
+                password=password,
+                date_joined=random_timestamp(rng, now, 365),
+            )
+
+    return bulk_insert_all(User, rows(), batch_size)
+
+
+def seed_orders(rng, count, users, items, batch_size=DEFAULT_BATCH_SIZE, now=None, timestamp=None):
+    """
+    Orders with 1-4 lines each. ``timestamp(rng, now)`` picks created_at
+    (default: uniform over the last 90 days).
+    """
+    now = now or timezone.now()
+    timestamp = timestamp or (lambda rng, now: random_timestamp(rng, now, 90))
+    statuses = ['delivered'] * 14 + ['cancelled', 'pending', 'confirmed', 'preparing', 'ready']
+    currencies = ['GBP'] * 6 + ['INR', 'EUR']
+    created = 0
+
+    with explicit_timestamps(Order):
+        while created < count:
+            size = min(batch_size, count - created)
+            orders = []
+            lines = []
+            for _ in range(size):
+                user = rng.choice(users)
+                placed_at = timestamp(rng, now)
+                order_lines = [
+                    (item, rng.randint(1, 3))
+                    for item in rng.sample(items, rng.randint(1, min(4, len(items))))
+                ]
+                orders.append(Order(
+                    # Not drawn from rng: the same seed again must not repeat ids
+                    order_id=uuid.uuid4(),
+                    user=user,
+                    customer_name=f'{user.first_name} {user.last_name}',
+                    customer_email=user.email,
+                    status=rng.choice(statuses),
+                    currency=rng.choice(currencies),
+                    total_amount=sum(item.price * quantity for item, quantity in order_lines),
+                    created_at=placed_at,
+                    updated_at=placed_at,
+                ))
+                lines.append(order_lines)
+
+            with transaction.atomic():
+                Order.objects.bulk_create(orders)
+                OrderItem.objects.bulk_create([
+                    OrderItem(order=order, menu_item=item, quantity=quantity, price=item.price)
+                    for order, order_lines in zip(orders, lines)
+                    for item, quantity in order_lines
+                ], batch_size=batch_size)
+            created += size
+    return created
+
+
+def seed_reviews(rng, count, users, items, batch_size=DEFAULT_BATCH_SIZE, now=None, timestamp=None):
+    """
+    Reviews skewed towards good ratings; one per (user, item) pair. Helpful
+    votes follow a long tail (most reviews get none, a few get dozens) and
+    have their ReviewHelpful rows.
+    """
+    now = now or timezone.now()
+    timestamp = timestamp or (lambda rng, now: random_timestamp(rng, now, 365))
+    count = min(count, len(users) * len(items))
+    seen = set()
+
+    def rows():
+        while len(seen) < count:
+            user = rng.choice(users)
+            item = rng.choice(items)
+            if (user.id, item.id) in seen:
+                continue
+            seen.add((user.id, item.id))
+            rating = rng.choices([1, 2, 3, 4, 5], weights=[5, 7, 15, 35, 38])[0]
+            posted_at = timestamp(rng, now)
+            yield Review(
+                menu_item=item,
+                user=user,
+                rating=rating,
+                title=REVIEW_TITLES[rating],
+                comment=f'{REVIEW_TITLES[rating]} {item.name.lower()}.',
+                is_verified=rng.random() < 0.6,
+                helpful_count=min(int(rng.paretovariate(1.2)) - 1, 50, len(users)),
+                created_at=posted_at,
+                updated_at=posted_at,
+            )
+
+    created = 0
+    with explicit_timestamps(Review):
+        for reviews in insert_batches(Review, rows(), batch_size):
+            bulk_insert(ReviewHelpful, (
+                ReviewHelpful(review=review, user=voter)
+                for review in reviews
+                for voter in rng.sample(users, review.helpful_count)
+            ), batch_size)
+            created += len(reviews)
+    return created
+
+
+def seed_wishlists(rng, count, users, items, batch_size=DEFAULT_BATCH_SIZE, max_items=8):
+    """Wishlists for ``count`` distinct users, 1-``max_items`` items each"""
+    owners = rng.sample(users, min(count, len(users)))
+    created = 0
+    for wishlists in insert_batches(Wishlist, (Wishlist(user=user) for user in owners), batch_size):
+        bulk_insert(WishlistItem, (
+            WishlistItem(wishlist=wishlist, menu_item=item)
+            for wishlist in wishlists
+            for item in rng.sample(items, rng.randint(1, min(max_items, len(items))))
+        ), batch_size)
+        created += len(wishlists)
+    return created
+
+
+def seed_carts(rng, count, users, items, batch_size=DEFAULT_BATCH_SIZE, now=None, max_items=5):
+    """Open carts (abandoned or in progress) updated within the last week"""
+    now = now or timezone.now()
+    owners = rng.sample(users, min(count, len(users)))
+
+    def carts():
+        for user in owners:
+            touched_at = random_timestamp(rng, now, 7)
+            yield Cart(user=user, created_at=touched_at, updated_at=touched_at)
+
+    created = 0
+    with explicit_timestamps(Cart, CartItem):
+        for saved in insert_batches(Cart, carts(), batch_size):
+            bulk_insert(CartItem, (
+                CartItem(
+                    cart=cart, menu_item=item, quantity=rng.randint(1, 3),
+                    created_at=cart.created_at, updated_at=cart.updated_at,
+                )
+                for cart in saved
+                for item in rng.sample(items, rng.randint(1, min(max_items, len(items))))
+            ), batch_size)
+            created += len(saved)
+    return created
+
+
+def seed_contact_messages(rng, count, batch_size=DEFAULT_BATCH_SIZE, now=None, timestamp=None):
+    now = now or timezone.now()
+    timestamp = timestamp or (lambda rng, now: random_timestamp(rng, now, 365))
+    topics = [
+        'Do you cater for office events?', 'Is the almond croissant nut-free?',
+        'Loved my latte this morning!', 'My order arrived late.', 'Do you sell beans by the bag?',
+    ]
+
+    def rows():
+        for n in range(count):
+            sent_at = timestamp(rng, now)
+            yield ContactMessage(
+                name=f'Visitor {n + 1}',
+                email=f'visitor{n + 1}@example.com',
+                message=rng.choice(topics),
+                is_read=sent_at < now - timedelta(days=3) or rng.random() < 0.5,
+                created_at=sent_at,
+            )
+
+    with explicit_timestamps(ContactMessage):
+        return bulk_insert(ContactMessage, rows(), batch_size)
+
+
+def seed_database(volumes, seed=DEFAULT_SEED, batch_size=DEFAULT_BATCH_SIZE, stdout=None,
+                  days=DEFAULT_DAYS, now=None):
+    """
+    Seed every table in the given volumes; missing keys count as zero.
+    New users are created; existing menu items are reused when
+    ``volumes['menu_items']`` is 0.
+    """
+    rng = random.Random(seed)
+    now = now or timezone.now()
+    traffic = TrafficPattern(now, days)
+    counts = {}
+
+    def log(name, count):
+        counts[name] = count
+        if stdout:
+            stdout.write(f'  {count} {name.replace("_", " ")}')
+
+    with muted_signals():
+        if volumes.get('menu_items'):
+            items = seed_menu_items(rng, volumes['menu_items'], batch_size)
+        else:
+            items = list(MenuItem.objects.order_by('id'))
+        log('menu_items', len(items))
+        users = seed_users(rng, volumes.get('users', 0), batch_size, now)
+        log('users', len(users))
+
+        if users and items:
+            log('orders', seed_orders(rng, volumes.get('orders', 0), users, items, batch_size, now, traffic))
+            log('reviews', seed_reviews(rng, volumes.get('reviews', 0), users, items, batch_size, now, traffic))
+            log('wishlists', seed_wishlists(rng, volumes.get('wishlists', 0), users, items, batch_size))
+            log('carts', seed_carts(rng, volumes.get('carts', 0), users, items, batch_size, now))
+        log('contact_messages', seed_contact_messages(rng, volumes.get('contact_messages', 0), batch_size, now, traffic))
+
+    # Seeding bypasses the post_save hooks that normally invalidate caches
+    from .catalog import bump_catalog_version
+    bump_catalog_version()
+    return counts
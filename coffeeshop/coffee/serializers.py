@@ -4,6 +4,7 @@ from .models import (
     MenuItem, Cart, CartItem, Order, OrderItem, 
     Category, UserProfile, ContactMessage, DashboardAnalytics
 )
+from .images import image_urls
 
 class CategorySerializer(serializers.ModelSerializer):
     """Serializer for Category model"""
@@ -15,6 +16,10 @@ class CategorySerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
     
     def get_items_count(self, obj):
+        # Use the annotation from catalog.annotate_item_counts when present
+        available_count = getattr(obj, 'available_count', None)
+        if available_count is not None:
+            return available_count
         return obj.menuitem_set.filter(is_available=True).count()
 
 class MenuItemSerializer(serializers.ModelSerializer):
@@ -29,13 +34,14 @@ class MenuItemSerializer(serializers.ModelSerializer):
     category_obj = CategorySerializer(read_only=True)
     # Add category_obj_id field for easier editing
     category_obj_id = serializers.IntegerField(source='category_obj.id', read_only=True)
+    images = serializers.SerializerMethodField()
     
     class Meta:
         model = MenuItem
         fields = [
             'id', 'name', 'description', 'price', 'formatted_price',
             'category', 'category_display', 'category_obj', 'category_obj_id', 'image_url', 'image',
-            'stock', 'stock_status', 'is_in_stock', 'is_available', 'is_featured', 
+            'images', 'stock', 'stock_status', 'is_in_stock', 'is_available', 'is_featured', 
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
@@ -45,6 +51,12 @@ class MenuItemSerializer(serializers.ModelSerializer):
         Return formatted price with INR symbol
         """
         return f"₹{obj.price:.0f}"
+    
+    def get_images(self, obj):
+        """
+        Return variant URLs, srcsets and the inline blur placeholder
+        """
+        return image_urls(obj)
 
 class MenuItemListSerializer(serializers.ModelSerializer):
     """
@@ -52,16 +64,20 @@ class MenuItemListSerializer(serializers.ModelSerializer):
     """
     category_display = serializers.CharField(source='get_category_display', read_only=True)
     formatted_price = serializers.SerializerMethodField()
+    images = serializers.SerializerMethodField()
     
     class Meta:
         model = MenuItem
         fields = [
             'id', 'name', 'description', 'price', 'formatted_price',
-            'category', 'category_display', 'image_url', 'stock', 'is_featured'
+            'category', 'category_display', 'image_url', 'images', 'stock', 'is_featured'
         ]
     
     def get_formatted_price(self, obj):
         return f"₹{obj.price:.0f}"
+    
+    def get_images(self, obj):
+        return image_urls(obj)
 
 class CartItemSerializer(serializers.ModelSerializer):
     """
@@ -194,7 +210,8 @@ class DashboardAnalyticsSerializer(serializers.Serializer):
     sales_data = serializers.ListField()
     category_stats = serializers.ListField()
     low_stock_items = serializers.ListField()
-    recent_orders = OrderSerializer(many=True)
+    # Already encoded by fastserializers.ORDER
+    recent_orders = serializers.ListField()
 
 class OrderUpdateSerializer(serializers.ModelSerializer):
     """Serializer for updating order status"""
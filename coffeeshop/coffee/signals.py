@@ -1,12 +1,20 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
 from django.contrib.auth.signals import user_logged_in
 from django.contrib.auth.models import User
 from django.dispatch import receiver
+from django.db import transaction
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
-from .models import Order, ContactMessage, MenuItem
+from django.utils import timezone
+from .models import Order, ContactMessage, MenuItem, Category, Review, Coupon, Cart
+from .catalog import bump_catalog_version
+from .coupons import bump_coupon_version
+from .events import publish_order_event
+from .reservations import forget_availability, release
+from .images import needs_processing, schedule_image_processing
+from . import metrics
 import logging
 
 logger = logging.getLogger(__name__)
@@ -33,10 +41,12 @@ def send_notification_email(subject, template_name, context, recipient_email=Non
         )
         
         logger.info(f"Email sent successfully: {subject} to {to_email}")
+        metrics.inc('coffee_emails_total', result='sent')
         return True
         
     except Exception as e:
         logger.error(f"Failed to send email: {subject}. Error: {str(e)}")
+        metrics.inc('coffee_emails_total', result='failed')
         return False
 
 @receiver(post_save, sender=User)
@@ -89,6 +99,26 @@ def order_creation_notification(sender, instance, created, **kwargs):
             context=context
         )
 
+@receiver(post_init, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    """
+    Keep the status an order was loaded with, to spot transitions on save
+    """
+    # Read from __dict__ so a deferred status is not fetched
+    instance._loaded_status = instance.__dict__.get('status')
+
+@receiver(post_save, sender=Order)
+def order_status_changed(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Publish new orders and status transitions to the order event streams
+    """
+    if update_fields is not None and 'status' not in update_fields:
+        return
+    previous = None if created else instance._loaded_status
+    if created or instance.status != previous:
+        publish_order_event(instance, previous)
+    instance._loaded_status = instance.status
+
 @receiver(post_save, sender=ContactMessage)
 def contact_form_notification(sender, instance, created, **kwargs):
     """
@@ -148,4 +178,58 @@ def menu_item_notification(sender, instance, created, **kwargs):
             subject=subject,
             template_name='menu_item_added.html',
             context=context
-        )
\ No newline at end of file
+        )
+
+@receiver(post_save, sender=MenuItem)
+@receiver(post_delete, sender=MenuItem)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def catalog_changed(sender, **kwargs):
+    """
+    Bump the catalog version so cached catalog data is rebuilt
+    """
+    bump_catalog_version()
+
+@receiver(post_save, sender=MenuItem)
+def menu_item_stock_changed(sender, instance, **kwargs):
+    """
+    Drop the item's cached availability, which the stock may have changed
+    """
+    forget_availability([instance.pk])
+
+@receiver(pre_delete, sender=Cart)
+def cart_releasing_holds(sender, instance, **kwargs):
+    """
+    Give back the stock a cart holds before its reservations cascade away
+    with it (a deleted user or session cart)
+    """
+    release(instance.pk)
+
+@receiver(post_save, sender=MenuItem)
+def menu_item_image_processing(sender, instance, **kwargs):
+    """
+    Generate resized image variants after a new image is committed
+    """
+    if needs_processing(instance):
+        item_id, source_name = instance.pk, instance.image.name
+        transaction.on_commit(lambda: schedule_image_processing(item_id, source_name))
+    elif not instance.image and instance.image_variants:
+        MenuItem.objects.filter(pk=instance.pk).update(image_variants={}, image_placeholder='', updated_at=timezone.now())
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_changed(sender, instance, **kwargs):
+    """
+    Touch the reviewed item so cached menu cards pick up the new rating,
+    and purge the cached pages showing it
+    """
+    MenuItem.objects.filter(pk=instance.menu_item_id).update(updated_at=timezone.now())
+    bump_catalog_version()
+
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def coupon_changed(sender, **kwargs):
+    """
+    Make every process reload its coupon table
+    """
+    transaction.on_commit(bump_coupon_version)
@@ -0,0 +1,153 @@
+"""
+Static-site export of the public pages.
+
+Renders the anonymous, non-personalised pages (home, about, services,
+menu) from the Django templates into STATIC_SITE_ROOT so a plain file
+server can serve them; Django then only handles dynamic routes. Pages are
+rendered exactly as for the page cache (coffee.pagecache): no cart count,
+messages or CSRF token, which base.html fetches from the page_state API.
+
+Static assets the pages reference are copied next to them under
+content-hashed names (``css/style.3f2a9c1b4d5e.css``) and the references
+rewritten, so assets can be served with immutable cache headers while the
+HTML itself is revalidated. Each page is replaced atomically and old
+assets are kept, so a browser holding a previous page still finds them.
+
+The export uses the default currency. Serve it only to visitors without a
+session cookie and send everyone else to Django, e.g. with nginx::
+
+    location = /menu/ {
+        if ($cookie_sessionid) { proxy_pass http://django; }
+        try_files /menu/index.html @django;
+    }
+"""
+import hashlib
+import importlib
+import json
+import os
+import re
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.staticfiles import finders
+from django.db.models import Count, Max
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from .models import Category, MenuItem, Review
+
+STATIC_PAGES = ['home', 'about', 'services', 'menu']
+MANIFEST_NAME = 'export-manifest.json'
+# Must keep a stable URL (a service worker is identified by its script URL)
+UNHASHED_ASSETS = ('sw.js',)
+
+
+def catalog_fingerprint():
+    """Changes whenever anything shown on the exported pages changes"""
+    state = [
+        MenuItem.objects.aggregate(count=Count('id'), updated=Max('updated_at')),
+        Category.objects.aggregate(count=Count('id'), updated=Max('updated_at')),
+        Review.objects.aggregate(count=Count('id'), updated=Max('updated_at')),
+    ]
+    return hashlib.sha256(json.dumps(state, default=str, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def load_manifest(root):
+    path = os.path.join(root, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def render_page(name):
+    """Render a public page as an anonymous visitor would get it from the page cache"""
+    path = reverse(name)
+    view = resolve(path).func
+    # Bypass anonymous_page_cache; always render fresh
+    view = getattr(view, '__wrapped__', view)
+
+    request = RequestFactory().get(path)
+    request.user = AnonymousUser()
+    request.session = importlib.import_module(settings.SESSION_ENGINE).SessionStore()
+    request.page_cache_render = True
+    response = view(request)
+    if response.status_code != 200:
+        raise ValueError(f'{path} returned {response.status_code}')
+    return path, response.content.decode(response.charset)
+
+
+def hashed_name(name, content):
+    if os.path.basename(name) in UNHASHED_ASSETS:
+        return name
+    root, ext = os.path.splitext(name)
+    return f'{root}.{hashlib.md5(content).hexdigest()[:12]}{ext}'
+
+
+def _write_atomic(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content)
+    # mkstemp creates 0600 files; the web server needs to read them
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+
+
+def export_assets(html, root, assets):
+    """Copy the static files ``html`` references into ``root`` and rewrite the URLs"""
+    pattern = re.compile(re.escape(settings.STATIC_URL) + r'([\w./-]+)')
+
+    def replace(match):
+        name = match.group(1)
+        if name not in assets:
+            source = finders.find(name)
+            if source is None:
+                # Not a collectable file (e.g. a directory prefix in JS); leave it
+                return match.group(0)
+            with open(source, 'rb') as f:
+                content = f.read()
+            assets[name] = hashed_name(name, content)
+            target = os.path.join(root, 'static', assets[name])
+            # Hashed names never change content; unhashed ones are refreshed
+            if assets[name] == name or not os.path.exists(target):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copyfile(source, target)
+        return settings.STATIC_URL + assets[name]
+
+    return pattern.sub(replace, html)
+
+
+def export_site(root=None, pages=None):
+    """
+    Render ``pages`` (URL names) into ``root`` and return the manifest that
+    was written alongside them
+    """
+    root = str(root or settings.STATIC_SITE_ROOT)
+    # Taken first so a change made while rendering triggers another export
+    fingerprint = catalog_fingerprint()
+    assets = {}
+    exported = {}
+
+    for name in pages or STATIC_PAGES:
+        path, html = render_page(name)
+        html = export_assets(html, root, assets)
+        content = html.encode('utf-8')
+        filename = os.path.join(root, path.strip('/'), 'index.html')
+        _write_atomic(filename, content)
+        exported[path] = {
+            'file': os.path.relpath(filename, root),
+            'sha256': hashlib.sha256(content).hexdigest(),
+        }
+
+    manifest = {
+        'exported_at': timezone.now().isoformat(),
+        'catalog_fingerprint': fingerprint,
+        'pages': exported,
+        'assets': assets,
+    }
+    _write_atomic(os.path.join(root, MANIFEST_NAME), json.dumps(manifest, indent=2).encode())
+    return manifest
@@ -0,0 +1,96 @@
+"""
+Content-addressed media storage.
+
+Uploads are streamed to a temporary file while being hashed and then
+stored as ``<upload_to>/<aa>/<sha256>.<ext>``. Identical files share one
+copy on disk and, because a name can never point at different bytes,
+they are served with immutable far-future cache headers.
+
+serve_media is for development (SERVE_MEDIA, on by default with DEBUG).
+In production let the web server serve MEDIA_ROOT with the same headers,
+e.g. for nginx::
+
+    location ~ "^/media/(.*/)?[0-9a-f]{2}/[0-9a-f]{64}[.][a-z0-9]+$" {
+        root /path/to/coffeeshop;
+        add_header Cache-Control "public, max-age=31536000, immutable";
+    }
+    location /media/ {
+        root /path/to/coffeeshop;
+        add_header Cache-Control "public, max-age=3600";
+    }
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.views.static import serve
+
+HASHED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}\.[\w]+$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MEDIA_CACHE_CONTROL = 'public, max-age=3600'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by the SHA-256 of their content"""
+    content_addressed = True
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save; identical
+        # content must map to the same name rather than get a suffix
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        ext = os.path.splitext(name)[1].lower()
+        full_directory = self.path(directory)
+        os.makedirs(full_directory, exist_ok=True)
+
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=full_directory, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as tmp_file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    tmp_file.write(chunk)
+
+            hashed = digest.hexdigest()
+            final_name = posixpath.join(directory, hashed[:2], hashed + ext)
+            final_path = self.path(final_name)
+
+            if os.path.exists(final_path):
+                # Duplicate upload: keep the existing copy
+                os.remove(tmp_path)
+                return final_name
+
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+            if self.file_permissions_mode is not None:
+                os.chmod(final_path, self.file_permissions_mode)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        return final_name
+
+
+def is_content_addressed(name):
+    """True when a storage name was produced by ContentAddressedStorage"""
+    return bool(HASHED_NAME_RE.search(name))
+
+
+def serve_media(request, path):
+    """
+    Serve MEDIA_ROOT files; content-addressed files never change, so they
+    get immutable far-future caching
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if is_content_addressed(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    else:
+        response['Cache-Control'] = MEDIA_CACHE_CONTROL
+    return response
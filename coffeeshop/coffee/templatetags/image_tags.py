@@ -0,0 +1,47 @@
+from django import template
+from django.utils.html import format_html
+
+from coffee.images import image_urls
+
+register = template.Library()
+
+DEFAULT_SIZES = '(min-width: 992px) 33vw, (min-width: 768px) 50vw, 100vw'
+
+# Hide the image (or its <picture>) and reveal the placeholder that follows it
+ONERROR_PLACEHOLDER = (
+    "var el=this.closest('picture')||this; el.style.display='none'; "
+    "if (el.nextElementSibling) el.nextElementSibling.style.display='flex'"
+)
+
+
+@register.simple_tag
+def menu_item_picture(item, variant='card', css_class='', style='', sizes=DEFAULT_SIZES, onerror_placeholder=False):
+    """
+    Render a responsive image for a menu item: a <picture> with WebP and
+    JPEG srcsets plus a blurred inline placeholder when variants exist,
+    otherwise a plain lazy-loaded <img> for the original URL.
+    """
+    urls = image_urls(item)
+    if not urls['src']:
+        return ''
+
+    onerror = format_html(' onerror="{}"', ONERROR_PLACEHOLDER) if onerror_placeholder else ''
+
+    if not urls['srcset']:
+        return format_html(
+            '<img src="{}" class="{}" style="{}" alt="{}" loading="lazy" decoding="async"{}>',
+            urls['src'], css_class, style, item.name, onerror,
+        )
+
+    if urls['placeholder']:
+        style = f'{style} background-image: url({urls["placeholder"]}); background-size: cover;'.strip()
+
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" style="{}" alt="{}" loading="lazy" decoding="async"{}>'
+        '</picture>',
+        urls['webp_srcset'], sizes,
+        urls.get(variant) or urls['src'], urls['srcset'], sizes, css_class, style, item.name,
+        onerror,
+    )
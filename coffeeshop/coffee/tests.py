@@ -1,3 +1,908 @@
-from django.test import TestCase
+import asyncio
+import base64
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models.query import QuerySet
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import metrics
+from .benchmarks import (
+    BENCHMARK_NAMES, compare_to_baseline, load_baseline, run_benchmarks, run_serializer_benchmarks,
+)
+from .catalog import bump_catalog_version, get_catalog_version, get_category_listing
+from .coupons import CouponError, best_coupon, bump_coupon_version, check_coupon, claim_coupon
+from .encoding import encode as encode_json
+from .events import OrderEventBroker, OrderEventStream, broker, order_event_response
+from .inventory import apply_stock_changes
+from .models import (
+    Cart, Category, Coupon, CouponUsage, MenuItem, Order, Review, ReviewHelpful, ReviewHelpfulLog, StockReservation,
+)
+from .reservations import OutOfStock, release_expired, reserve
+from .reviews import REVIEW_SORTS, decode_cursor, encode_cursor
+from .seeding import DEFAULT_SEED, SCALES, seed_database
+from .votes import current_count, flush_votes, reconcile_votes, record_vote
+from .warmup import boot
+
+
+class CatalogTests(TestCase):
+    """The catalog version and the annotated category listing"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.beans = Category.objects.create(name='Beans')
+        for name, stock in (('Santos', 0), ('Sidamo', 3), ('Huila', 20)):
+            MenuItem.objects.create(name=name, price='9.00', category_obj=cls.beans, stock=stock)
+        MenuItem.objects.create(
+            name='Retired blend', price='9.00', category_obj=cls.beans, stock=8, is_available=False
+        )
+        Category.objects.create(name='Cups')
+
+    def test_catalog_changes_bump_the_version(self):
+        version = get_catalog_version()
+        item = MenuItem.objects.get(name='Santos')
+        item.stock = 5
+        item.save()
+        self.assertEqual(get_catalog_version(), version + 1)
+        Category.objects.get(name='Cups').delete()
+        self.assertEqual(get_catalog_version(), version + 2)
+
+    def test_listing_counts_items_in_one_cached_query(self):
+        MenuItem.objects.get(name='Huila').save()  # a fresh version, so nothing is cached yet
+        with self.assertNumQueries(1):
+            listing = get_category_listing()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_category_listing(), listing)
+
+        counts = {
+            category['name']: (
+                category['items_count'], category['available_count'],
+                category['low_stock_count'], category['out_of_stock_count'],
+            )
+            for category in listing
+        }
+        self.assertEqual(counts, {'Beans': (4, 3, 1, 1), 'Cups': (0, 0, 0, 0)})
+
+    def test_listing_is_rebuilt_after_a_change(self):
+        get_category_listing()
+        item = MenuItem.objects.get(name='Sidamo')
+        item.stock = 0
+        item.save()
+        beans = next(category for category in get_category_listing() if category['name'] == 'Beans')
+        self.assertEqual((beans['low_stock_count'], beans['out_of_stock_count']), (0, 2))
+
+
+class CatalogImportTests(TestCase):
+    """Catalog export and import through the admin API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('manager', password='secret', is_staff=True)
+        cls.beans = Category.objects.create(name='Beans')
+        MenuItem.objects.create(name='Espresso', description='Short', price='2.50', stock=30)
+        MenuItem.objects.create(
+            name='Santos', description='Nutty', price='9.00', category='coffee', category_obj=cls.beans,
+            stock=4, is_featured=True,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def export(self, fmt='csv'):
+        response = self.client.get(reverse('admin_catalog_export_api'), {'file_format': fmt})
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def upload(self, content, name='catalog.csv', **params):
+        url = reverse('admin_catalog_import_api')
+        if params:
+            url += '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+        if isinstance(content, str):
+            content = content.encode()
+        return self.client.post(url, {'file': SimpleUploadedFile(name, content)})
+
+    def test_export_round_trips(self):
+        for fmt in ('csv', 'json'):
+            exported = self.export(fmt)
+            response = self.upload(exported, name=f'catalog.{fmt}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                (response.json()['created'], response.json()['updated'], response.json()['unchanged']), (0, 0, 2)
+            )
+            self.assertEqual(self.export(fmt), exported)
+
+    def test_import_creates_and_updates_by_name(self):
+        exported = self.export().replace('Nutty,9.00', 'Nutty,9.50')
+        exported += 'Sidamo,Floral,11.00,coffee,Beans,,12,True,False\r\n'
+
+        response = self.upload(exported)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['created'], response.json()['updated']), (1, 1))
+        self.assertEqual(MenuItem.objects.get(name='Santos').price, Decimal('9.50'))
+        self.assertEqual(MenuItem.objects.get(name='Sidamo').category_obj, self.beans)
+        self.assertEqual(self.export(), exported)
+
+    def test_dry_run_writes_nothing(self):
+        response = self.upload('name,price\r\nCortado,3.00\r\n', dry_run=1)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertFalse(MenuItem.objects.filter(name='Cortado').exists())
+
+    def test_invalid_rows_are_all_reported_and_nothing_is_written(self):
+        response = self.upload(
+            'name,price,category,category_name,stock,is_available\r\n'
+            'Cortado,3.00,,,5,yes\r\n'
+            ',1.00,,,,\r\n'
+            'Mocha,cheap,tea,Teas,-1,maybe\r\n'
+            'cortado,3.00,,,,\r\n'
+        )
+
+        self.assertEqual(response.status_code, 400)
+        errors = {error['row']: error['errors'] for error in response.json()['errors']}
+        self.assertEqual(errors[2], ['name is required'])
+        self.assertEqual(errors[3], [
+            'invalid price "cheap"', 'unknown category "tea"', 'unknown category_name "Teas"',
+            'invalid stock "-1"', 'invalid is_available "maybe"',
+        ])
+        self.assertEqual(errors[4], ['duplicate name "cortado" in file'])
+        self.assertNotIn(1, errors)
+        self.assertFalse(MenuItem.objects.filter(name__in=['Cortado', 'Mocha']).exists())
+
+    def test_new_items_need_a_price(self):
+        response = self.upload('name,stock\r\nCortado,5\r\n')
+        self.assertEqual(response.json()['errors'], [
+            {'row': 1, 'name': 'Cortado', 'errors': ['price is required for new items']}
+        ])
+
+    def test_unreadable_files_are_rejected(self):
+        response = self.upload(b'name,price\r\n\xff\xfe,1.00\r\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('not valid UTF-8', response.json()['errors'][0]['errors'][0])
+
+        response = self.upload('{"items": [1, 2]}', name='catalog.json')
+        self.assertEqual(response.json()['errors'][0]['errors'], ['Expected a list of item objects'])
+
+
+class BulkStockUpdateTests(TestCase):
+    """The set-based bulk stock update API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('manager', password='secret', is_staff=True)
+        cls.espresso = MenuItem.objects.create(name='Espresso', price='2.50', stock=10)
+        cls.latte = MenuItem.objects.create(name='Latte', price='3.50', stock=2)
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def post(self, body):
+        return self.client.post(reverse('bulk_stock_update'), json.dumps(body), content_type='application/json')
+
+    def stock(self):
+        return dict(MenuItem.objects.values_list('name', 'stock'))
+
+    def test_absolute_and_relative_changes_apply_together(self):
+        version = get_catalog_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post({'updates': [
+                {'id': self.espresso.id, 'stock': 25},
+                {'id': self.latte.id, 'delta': -5},
+                {'id': 999999, 'delta': 1},
+            ]})
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['updated_count'], 2)
+        self.assertEqual(data['invalid_ids'], [999999])
+        self.assertEqual(
+            [(item['id'], item['before'], item['after']) for item in data['items']],
+            [(self.espresso.id, 10, 25), (self.latte.id, 2, 0)],
+        )
+        self.assertEqual(self.stock(), {'Espresso': 25, 'Latte': 0})
+        self.assertGreater(get_catalog_version(), version)
+
+    def test_invalid_updates_are_rejected_together(self):
+        response = self.post({'updates': [
+            {'id': self.espresso.id, 'stock': 5},
+            {'id': 'latte', 'stock': 1},
+            {'id': self.latte.id, 'stock': 1, 'delta': 1},
+            {'id': self.latte.id, 'stock': -1},
+            {'id': self.latte.id, 'delta': 'lots'},
+            {'id': self.espresso.id, 'delta': 1},
+            'espresso',
+        ]})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 2, 3, 4, 5, 6])
+        self.assertEqual(self.stock(), {'Espresso': 10, 'Latte': 2})
+
+    def test_malformed_bodies_are_rejected(self):
+        self.assertEqual(self.post([{'id': self.espresso.id, 'stock': 1}]).status_code, 400)
+        self.assertEqual(self.post({'updates': {'id': self.espresso.id}}).status_code, 400)
+
+    def test_staff_only(self):
+        self.client.logout()
+        self.assertEqual(self.post({'updates': []}).status_code, 403)
+
+
+class EndpointBenchmarkTests(TestCase):
+    """
+    Runs the benchmark scenarios on the "small" dataset. Timings depend on
+    the machine, so only query counts are checked against the baseline;
+    use ``manage.py benchmark`` for latency regressions.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_database(SCALES['small'], seed=DEFAULT_SEED)
+        cls.results = run_benchmarks(iterations=3, warmup=2)
+
+    def test_key_views_respond(self):
+        self.assertEqual(list(self.results), BENCHMARK_NAMES)
+        for name, result in self.results.items():
+            with self.subTest(view=name):
+                self.assertIn(result['status'], (200, 302))
+                self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+                self.assertLessEqual(result['p95_ms'], result['p99_ms'])
+
+    def test_query_counts_within_baseline(self):
+        baseline = load_baseline().get('small')
+        if not baseline:
+            self.skipTest('No "small" benchmark baseline recorded')
+        regressions = compare_to_baseline(self.results, baseline, check_timings=False)
+        self.assertEqual(regressions, [])
+
+    def test_fast_serializers_match_drf(self):
+        for name, result in run_serializer_benchmarks(iterations=1).items():
+            with self.subTest(serializer=name):
+                self.assertTrue(result['same_output'])
+                self.assertLessEqual(result['fast_queries'], result['drf_queries'])
+
+
+class WarmupTests(TransactionTestCase):
+    """The worker boot hook, which warms from another thread under ASGI"""
+
+    databases = {'default', 'analytics'}
+
+    def test_boot_inside_an_event_loop_warms_off_the_loop(self):
+        async def import_application():
+            # What uvicorn does with coffeeshop.asgi
+            return boot(setup_ms=0)
+
+        with self.settings(WARMUP={'ON_BOOT': True}), mock.patch.object(metrics, 'share'):
+            report = asyncio.run(import_application())
+
+        failed = {name: step['error'] for name, step in report['steps'].items() if 'error' in step}
+        self.assertEqual(failed, {})
+        self.assertEqual({result['status'] for result in report['first_requests'].values()}, {200})
+
+
+class MetricsTests(TestCase):
+    """Metrics snapshots shared between worker processes"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        overrides = self.settings(METRICS_DIR=self.directory)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        patcher = mock.patch.object(metrics.registry, 'shared', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write_snapshot(self, pid, checkouts):
+        with open(os.path.join(self.directory, f'{pid}-1.json'), 'w') as f:
+            json.dump({'counters': [['coffee_checkouts_total', [], checkouts]], 'histograms': []}, f)
+
+    def test_processes_that_do_not_serve_write_nothing(self):
+        metrics.inc('coffee_checkouts_total')
+        metrics.collect()
+        self.assertEqual(os.listdir(self.directory), [])
+
+    @skipIf(os.name == 'nt', 'snapshots are only pruned on POSIX')
+    def test_snapshots_of_exited_processes_are_dropped(self):
+        exited = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True, text=True)
+        self.write_snapshot(int(exited.stdout), 1000)
+        self.write_snapshot(os.getppid(), 5)
+        own = metrics.registry.counters.get(('coffee_checkouts_total', ()), 0)
+
+        metrics.share()
+        counters, _, processes = metrics.collect()
+
+        self.assertEqual(processes, 2)
+        self.assertEqual(counters[('coffee_checkouts_total', ())], own + 5)
+        self.assertNotIn(f'{exited.stdout.strip()}-1.json', os.listdir(self.directory))
+
+
+class PageCacheTests(TestCase):
+    """The anonymous full-page cache"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.item = MenuItem.objects.create(name='Test Macchiato', description='Marked', price='2.80', stock=5)
+        User.objects.create_user('regular', password='secret')
+
+    def setUp(self):
+        # Start every test from an empty page cache
+        bump_catalog_version()
+
+    def get(self, name='menu', **params):
+        return self.client.get(reverse(name), params)
+
+    def test_anonymous_pages_are_served_from_the_cache(self):
+        for name in ('home', 'about', 'services', 'menu'):
+            first, second = self.get(name), self.get(name)
+            self.assertEqual((first['X-Page-Cache'], second['X-Page-Cache']), ('miss', 'hit'), name)
+            self.assertEqual(second.content, first.content)
+        # Nothing per visitor: no CSRF token input and no cookies
+        self.assertNotContains(first, 'name="csrfmiddlewaretoken"')
+        self.assertFalse(first.cookies)
+
+    def test_each_currency_has_its_own_page(self):
+        self.get()
+        session = self.client.session
+        session['currency'] = 'USD'
+        session.save()
+        self.assertEqual(self.get()['X-Page-Cache'], 'miss')
+        self.assertEqual(self.get()['X-Page-Cache'], 'hit')
+
+    def test_catalog_changes_purge_the_cache(self):
+        self.get()
+        self.item.name = 'Test Cortado'
+        self.item.save()
+        response = self.get()
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Test Cortado')
+
+    def test_signed_in_visitors_and_query_strings_bypass_the_cache(self):
+        self.get()
+        self.assertNotIn('X-Page-Cache', self.get(search='Macchiato'))
+        self.client.login(username='regular', password='secret')
+        response = self.get()
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertContains(response, 'name="csrfmiddlewaretoken"')
+
+    def test_page_state_fills_in_the_visitor(self):
+        self.client.login(username='regular', password='secret')
+        state = self.client.get(reverse('page_state')).json()
+        self.assertTrue(state['authenticated'])
+        self.assertEqual(state['cart_count'], 0)
+        self.assertTrue(state['csrf_token'])
+
+
+class CatalogApiCacheTests(TestCase):
+    """Cached item JSON and whole catalog API responses"""
+
+    URLS = ('api_menu_items', 'api_menu_categories', 'api_featured_items')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.item = MenuItem.objects.create(
+            name='Test Flat White', price='3.20', category='coffee', stock=10, is_featured=True,
+        )
+        User.objects.create_user('shopper', password='secret')
+
+    def setUp(self):
+        bump_catalog_version()
+
+    def served(self, field):
+        """``field`` of the test item as each catalog API serves it"""
+        data = {name: self.client.get(reverse(name)).json() for name in self.URLS}
+        lists = {
+            'api_menu_items': data['api_menu_items']['items'],
+            'api_menu_categories': data['api_menu_categories']['categories']['coffee']['items'],
+            'api_featured_items': data['api_featured_items']['featured_items'],
+        }
+        return {name: [item[field] for item in items if item['id'] == self.item.id] for name, items in lists.items()}
+
+    def assertServed(self, field, value):
+        self.assertEqual(self.served(field), {name: [value] for name in self.URLS})
+
+    def test_saving_an_item_refreshes_every_api(self):
+        self.assertServed('price', '3.20')
+        self.item.price = Decimal('3.40')
+        self.item.save()
+        self.assertServed('price', '3.40')
+
+    def test_stock_updates_refresh_every_api(self):
+        self.assertServed('stock', 10)
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_stock_changes({self.item.id: ('delta', -4)})
+        self.assertServed('stock', 6)
+
+    def test_checkout_refreshes_every_api(self):
+        self.assertServed('stock', 10)
+        self.client.login(username='shopper', password='secret')
+        self.client.post(reverse('add_to_cart', args=[self.item.id]), {'quantity': 3})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('checkout'))
+        self.client.logout()
+        self.assertServed('stock', 7)
+
+    def test_unchanged_items_are_not_encoded_again(self):
+        other = MenuItem.objects.create(name='Test Ristretto', price='2.10', stock=3)
+        self.client.get(reverse('api_menu_items'))
+        other.price = Decimal('2.20')
+        other.save()
+
+        with mock.patch('coffee.encoding.encode', wraps=encode_json) as encoded:
+            self.client.get(reverse('api_menu_items'))
+
+        # The changed item, then the document around the cached fragments
+        self.assertEqual(encoded.call_count, 2)
+        self.assertEqual(encoded.call_args_list[0].args[0]['id'], other.id)
+
+    def test_gzip_and_conditional_requests(self):
+        url = reverse('api_menu_items')
+        plain = self.client.get(url)
+        zipped = self.client.get(url, HTTP_ACCEPT_ENCODING='br, gzip')
+
+        self.assertEqual(zipped['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(zipped.content), plain.content)
+        self.assertNotEqual(zipped['ETag'], plain['ETag'])
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=plain['ETag']).status_code, 304)
+        self.assertEqual(
+            self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=zipped['ETag']).status_code, 304
+        )
+        # The other encoding's ETag doesn't match
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=zipped['ETag']).status_code, 200)
+
+        self.item.price = Decimal('3.40')
+        self.item.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=plain['ETag']).status_code, 200)
+
+
+class ReviewCursorTests(TestCase):
+    """Keyset pagination of the reviews API"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.item = MenuItem.objects.create(name='Test Latte', price='3.50')
+        cls.url = reverse('get_reviews', args=[cls.item.id])
+        now = timezone.now().replace(microsecond=123456)
+        for n in range(7):
+            user = User.objects.create_user(f'reviewer{n}')
+            review = Review.objects.create(
+                menu_item=cls.item, user=user, rating=n % 3 + 3, title='Nice', comment='Nice.',
+                helpful_count=n % 2,
+            )
+            # Pairs of reviews share a timestamp, so sorts fall back to id
+            Review.objects.filter(id=review.id).update(created_at=now - timedelta(minutes=n // 2))
+
+    def walk(self, sort, limit=2):
+        ids = []
+        cursor = None
+        while True:
+            params = {'sort': sort, 'limit': limit}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get(self.url, params).json()
+            ids.extend(review['id'] for review in data['reviews'])
+            cursor = data['next_cursor']
+            self.assertEqual(data['has_more'], cursor is not None)
+            if cursor is None:
+                return ids
+
+    def test_pages_follow_sort_order_without_gaps_or_repeats(self):
+        for sort, ordering in REVIEW_SORTS.items():
+            with self.subTest(sort=sort):
+                expected = list(Review.objects.filter(menu_item=self.item).order_by(*ordering).values_list('id', flat=True))
+                self.assertEqual(self.walk(sort), expected)
+
+    def test_equal_sort_keys_break_ties_on_id(self):
+        Review.objects.update(created_at=timezone.now(), rating=4, helpful_count=0)
+        expected = sorted(Review.objects.values_list('id', flat=True), reverse=True)
+        for sort in REVIEW_SORTS:
+            with self.subTest(sort=sort):
+                self.assertEqual(self.walk(sort, limit=3), expected)
+
+    def test_cursor_round_trips_full_precision(self):
+        row = Review.objects.filter(menu_item=self.item).values('id', 'created_at', 'rating', 'helpful_count').first()
+        for sort, ordering in REVIEW_SORTS.items():
+            with self.subTest(sort=sort):
+                values = decode_cursor(sort, encode_cursor(sort, row))
+                self.assertEqual(values, [row[order.lstrip('-')] for order in ordering])
+
+    def test_bad_cursors_are_rejected_with_400(self):
+        def cursor(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+        row = Review.objects.values('id', 'created_at', 'rating', 'helpful_count').first()
+        bad = {
+            'garbage': 'not a cursor!',
+            'not json': base64.urlsafe_b64encode(b'{oops').decode(),
+            'wrong shape': cursor({'sort': 'newest'}),
+            'other sort': encode_cursor('helpful', row),
+            'too few values': cursor(['newest', [row['created_at'].isoformat()]]),
+            'bad timestamp': cursor(['newest', ['yesterday', row['id']]]),
+            'bad id': cursor(['newest', [row['created_at'].isoformat(), 'x']]),
+            'null id': cursor(['newest', [row['created_at'].isoformat(), None]]),
+        }
+        for name, value in bad.items():
+            with self.subTest(cursor=name):
+                response = self.client.get(self.url, {'sort': 'newest', 'cursor': value})
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['error'], 'Invalid cursor')
+
+
+class HelpfulVoteTests(TestCase):
+    """Write-behind helpful vote counting"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.item = MenuItem.objects.create(name='Test Mocha', price='4.00')
+        author = User.objects.create_user('author')
+        cls.review = Review.objects.create(menu_item=cls.item, user=author, rating=5, title='Great', comment='Great.')
+        cls.voters = [User.objects.create_user(f'voter{n}') for n in range(3)]
+
+    def stored_count(self):
+        return Review.objects.values_list('helpful_count', flat=True).get(id=self.review.id)
+
+    def test_second_vote_removes_the_first(self):
+        voter = self.voters[0]
+        self.assertEqual(record_vote(self.review, voter), (True, 1))
+        self.assertEqual(record_vote(self.review, voter), (False, 0))
+        self.assertEqual(record_vote(self.review, voter), (True, 1))
+        self.assertEqual(ReviewHelpful.objects.filter(review=self.review).count(), 1)
+
+    def test_pending_votes_are_counted_until_flushed(self):
+        for voter in self.voters:
+            record_vote(self.review, voter)
+        self.assertEqual(self.stored_count(), 0)
+        self.assertEqual(current_count(self.review.id), 3)
+
+        self.assertEqual(flush_votes(), 3)
+        self.assertEqual(self.stored_count(), 3)
+        self.assertEqual(current_count(self.review.id), 3)
+        self.assertFalse(ReviewHelpfulLog.objects.exists())
+
+    def test_flush_racing_another_flush_applies_nothing(self):
+        for voter in self.voters:
+            record_vote(self.review, voter)
+        first_id = ReviewHelpfulLog.objects.order_by('id').values_list('id', flat=True).first()
+        delete = QuerySet.delete
+
+        def racing_delete(queryset):
+            if queryset.model is ReviewHelpfulLog:
+                # Another flush removes an entry between our read and our delete
+                delete(ReviewHelpfulLog.objects.filter(id=first_id))
+            return delete(queryset)
+
+        with mock.patch.object(QuerySet, 'delete', racing_delete):
+            self.assertEqual(flush_votes(), 0)
+        self.assertEqual(self.stored_count(), 0)
+        self.assertEqual(ReviewHelpfulLog.objects.count(), 3)
+
+        self.assertEqual(flush_votes(), 3)
+        self.assertEqual(self.stored_count(), 3)
+
+    def test_reconcile_recounts_drifted_reviews(self):
+        for voter in self.voters[:2]:
+            record_vote(self.review, voter)
+        flush_votes()
+        record_vote(self.review, self.voters[2])
+        Review.objects.filter(id=self.review.id).update(helpful_count=40)
+
+        self.assertEqual(reconcile_votes(), 1)
+        # The vote still in the log is not counted twice
+        self.assertEqual(self.stored_count(), 2)
+        self.assertEqual(current_count(self.review.id), 3)
+        self.assertEqual(reconcile_votes(), 0)
+
+    def test_flush_logs_counts_clamped_at_zero(self):
+        record_vote(self.review, self.voters[0])
+        flush_votes()
+        Review.objects.filter(id=self.review.id).update(helpful_count=0)
+        record_vote(self.review, self.voters[0])
+
+        with self.assertLogs('coffee.votes', 'WARNING'):
+            flush_votes()
+        self.assertEqual(self.stored_count(), 0)
+
+
+class CouponTests(TestCase):
+    """Coupon redemption and best-offer selection"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.item = MenuItem.objects.create(name='Test Flat White', price='5.00', stock=10)
+        cls.user = User.objects.create_user('shopper', password='secret')
+
+    def setUp(self):
+        # Coupon saves only bump the table version on commit, which tests never reach
+        bump_coupon_version()
+
+    def coupon(self, code, discount_type='percentage', value='10', **fields):
+        now = timezone.now()
+        fields.setdefault('valid_from', now - timedelta(days=1))
+        fields.setdefault('valid_to', now + timedelta(days=1))
+        coupon = Coupon.objects.create(
+            code=code, name=code, discount_type=discount_type, discount_value=Decimal(value), **fields
+        )
+        bump_coupon_version()
+        return coupon
+
+    def test_redemption_stops_at_usage_limit(self):
+        coupon = self.coupon('TWICE', usage_limit=2)
+        claim_coupon(coupon)
+        claim_coupon(coupon)
+        with self.assertRaises(CouponError):
+            claim_coupon(coupon)
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.used_count, 2)
+
+    def test_checkout_with_coupon_records_the_use(self):
+        coupon = self.coupon('SAVE10')
+        self.client.login(username='shopper', password='secret')
+        self.client.post(reverse('add_to_cart', args=[self.item.id]), {'quantity': 2})
+
+        response = self.client.post(reverse('checkout'), {'coupon_code': 'save10'})
+
+        order = Order.objects.get(user=self.user)
+        self.assertRedirects(
+            response, reverse('order_confirmation', args=[order.order_id]), fetch_redirect_response=False
+        )
+        self.assertEqual(order.total_amount, Decimal('9.00'))
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.used_count, 1)
+        self.assertEqual(CouponUsage.objects.get(coupon=coupon).discount_amount, Decimal('1.00'))
+
+    def test_failed_checkout_rolls_back_the_claim(self):
+        coupon = self.coupon('SAVE10', usage_limit=1)
+        self.client.login(username='shopper', password='secret')
+        self.client.post(reverse('add_to_cart', args=[self.item.id]), {'quantity': 2})
+        # The hold was swept and the stock sold elsewhere meanwhile
+        StockReservation.objects.all().delete()
+        MenuItem.objects.filter(id=self.item.id).update(stock=0, reserved_stock=0)
+
+        response = self.client.post(reverse('checkout'), {'coupon_code': 'SAVE10'})
+
+        self.assertRedirects(response, reverse('cart'), fetch_redirect_response=False)
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.used_count, 0)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(CouponUsage.objects.exists())
+
+    def test_best_coupon_picks_the_biggest_saving(self):
+        ten_percent = self.coupon('TEN', maximum_discount=Decimal('2'))
+        three_off = self.coupon('THREE', 'fixed', '3', minimum_amount=Decimal('20'))
+        self.coupon('EXPIRED', value='50', valid_to=timezone.now() - timedelta(hours=1))
+        self.coupon('USEDUP', value='50', usage_limit=1, used_count=1)
+        self.coupon('INACTIVE', value='50', is_active=False)
+        self.coupon('SHIPPING', 'free_shipping', '100')
+
+        self.assertEqual(best_coupon(Decimal('10')), (ten_percent, Decimal('1.00')))
+        # 10% would be 2.50 but is capped at 2; the fixed coupon now applies
+        self.assertEqual(best_coupon(Decimal('25')), (three_off, Decimal('3.00')))
+        self.assertEqual(best_coupon(Decimal('0')), (None, Decimal('0')))
+
+    def test_changes_from_other_processes_are_picked_up(self):
+        with self.assertRaises(CouponError):
+            check_coupon('ELSEWHERE', Decimal('10'))
+        # Saved by another worker: the version key in this process's cache never moves
+        now = timezone.now()
+        coupon = Coupon.objects.create(
+            code='ELSEWHERE', name='Elsewhere', discount_type='fixed', discount_value=Decimal('2'),
+            valid_from=now - timedelta(days=1), valid_to=now + timedelta(days=1),
+        )
+
+        with self.settings(COUPON_TABLE_CHECK_SECONDS=0):
+            self.assertEqual(check_coupon('ELSEWHERE', Decimal('10')), (coupon, Decimal('2.00')))
+            coupon.is_active = False
+            coupon.save()
+            self.assertEqual(best_coupon(Decimal('10')), (None, Decimal('0')))
+
+    def test_best_coupon_ties_go_to_the_earliest(self):
+        first = self.coupon('FIRST', 'fixed', '2')
+        self.coupon('SECOND', 'fixed', '2')
+        self.assertEqual(best_coupon(Decimal('10')), (first, Decimal('2.00')))
+
+
+class OrderEventTests(TestCase):
+    """Order status streams, their slots and replay"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.order = Order.objects.create(customer_name='Ada', customer_email='ada@example.com', total_amount='4.00')
+
+    def stream_request(self, last_event_id=None):
+        headers = {'Last-Event-ID': last_event_id} if last_event_id else {}
+        return AsyncRequestFactory().get(reverse('admin_order_stream'), headers=headers)
+
+    def test_streams_are_refused_under_wsgi(self):
+        response = self.client.get(reverse('order_status_stream', args=[self.order.order_id]))
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '15')
+
+        # What the page polls instead
+        status = self.client.get(reverse('order_status', args=[self.order.order_id])).json()
+        self.assertEqual((status['order_id'], status['status']), (str(self.order.order_id), 'pending'))
+
+    def test_streams_hold_a_slot_until_closed(self):
+        with self.settings(ORDER_EVENT_MAX_STREAMS=broker.streams + 1):
+            first = order_event_response(self.stream_request())
+            self.assertEqual(first.status_code, 200)
+            self.assertEqual(order_event_response(self.stream_request()).status_code, 503)
+
+            first.close()
+            first.close()
+            second = order_event_response(self.stream_request())
+            self.assertEqual(second.status_code, 200)
+            second.close()
+
+    def test_status_changes_are_published_after_commit(self):
+        _, newest = broker.since(None)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.order.status = 'preparing'
+            self.order.save()
+
+        events, _ = broker.since(newest, str(self.order.order_id))
+        self.assertEqual(
+            [(payload['previous_status'], payload['status']) for _, _, payload in events], [('pending', 'preparing')]
+        )
+
+    def test_since_replays_or_asks_for_a_snapshot(self):
+        events = OrderEventBroker(buffer_size=3)
+        for number in range(1, 6):
+            events.publish(f'order-{number % 2}', {'number': number})
+
+        replay, newest = events.since(3)
+        self.assertEqual(([payload['number'] for _, _, payload in replay], newest), ([4, 5], 5))
+        self.assertEqual([payload['number'] for _, _, payload in events.since(3, 'order-1')[0]], [5])
+        # Events 2 and 3 have left the buffer
+        self.assertEqual(events.since(1), (None, 5))
+        self.assertEqual(events.since(None), (None, 5))
+        self.assertEqual(events.parse_event_id(events.event_id(4)), 4)
+        self.assertIsNone(events.parse_event_id(OrderEventBroker(3).event_id(4)))
+
+    def test_stale_last_event_id_gets_a_snapshot(self):
+        self.assertTrue(broker.open_stream(broker.streams + 1))
+        # From before a restart: this broker's boot id differs
+        stream = OrderEventStream(self.order.order_id, last_event_id='00000000-7')
+
+        async def read():
+            chunks = stream.__aiter__()
+            opening = [await chunks.__anext__() for _ in range(2)]
+            await chunks.aclose()
+            return opening
+
+        retry, snapshot = async_to_sync(read)()
+
+        self.assertEqual(retry, 'retry: 3000\n\n')
+        self.assertTrue(snapshot.startswith(f'id: {broker.event_id(stream.seq)}\nevent: snapshot\n'))
+        orders = json.loads(snapshot.split('data: ', 1)[1])['orders']
+        self.assertEqual([order['order_id'] for order in orders], [str(self.order.order_id)])
+        # Closing the iterator gave the slot back
+        self.assertFalse(stream.open)
+
+
+class StockReservationTests(TestCase):
+    """Cart stock holds, their expiry and checkout"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.item = MenuItem.objects.create(name='Test Cortado', price='3.00', stock=1)
+        for name in ('alice', 'bob'):
+            User.objects.create_user(name, password='secret')
+
+    def shopper(self, name):
+        client = self.client_class()
+        client.login(username=name, password='secret')
+        return client
+
+    def add(self, client, quantity=1):
+        return client.post(
+            reverse('add_to_cart', args=[self.item.id]), {'quantity': quantity},
+            HTTP_X_REQUESTED_WITH='XMLHttpRequest',
+        )
+
+    def stock(self):
+        return MenuItem.objects.values_list('stock', 'reserved_stock').get(id=self.item.id)
+
+    def test_two_carts_cannot_hold_the_last_unit(self):
+        self.assertEqual(self.add(self.shopper('alice')).status_code, 200)
+
+        response = self.add(self.shopper('bob'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['available'], 0)
+        self.assertEqual(self.stock(), (1, 1))
+        self.assertEqual(StockReservation.objects.count(), 1)
+        self.assertFalse(Cart.objects.filter(user__username='bob', cartitem__isnull=False).exists())
+
+    def test_two_carts_cannot_check_out_the_last_unit(self):
+        alice, bob = self.shopper('alice'), self.shopper('bob')
+        self.add(alice)
+        # Alice's hold lapses and bob's add takes the unit over
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.add(bob).status_code, 200)
+
+        self.assertRedirects(alice.post(reverse('checkout')), reverse('cart'), fetch_redirect_response=False)
+        bob.post(reverse('checkout'))
+
+        self.assertEqual(list(Order.objects.values_list('user__username', flat=True)), ['bob'])
+        self.assertEqual(self.stock(), (0, 0))
+
+    def test_expired_holds_are_released(self):
+        MenuItem.objects.filter(id=self.item.id).update(stock=5)
+        alice, bob = (Cart.objects.create(user=User.objects.get(username=name)) for name in ('alice', 'bob'))
+        reserve(alice.id, self.item.id, 2)
+        reserve(bob.id, self.item.id, 1)
+        StockReservation.objects.filter(cart=alice).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(release_expired(), 1)
+        self.assertEqual(self.stock(), (5, 1))
+        self.assertEqual(list(StockReservation.objects.values_list('cart_id', flat=True)), [bob.id])
+        self.assertEqual(release_expired(), 0)
+
+    def test_checkout_sells_held_stock_once(self):
+        MenuItem.objects.filter(id=self.item.id).update(stock=10)
+        alice = self.shopper('alice')
+        self.add(alice, 2)
+        self.add(alice, 1)
+        self.assertEqual(self.stock(), (10, 3))
+
+        alice.post(reverse('checkout'))
+        alice.post(reverse('checkout'))
+
+        self.assertEqual(Order.objects.get().orderitem_set.get().quantity, 3)
+        self.assertEqual(self.stock(), (7, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_checkout_refreshes_the_menu_api(self):
+        def menu_stock():
+            items = self.client.get(reverse('api_menu_items')).json()['items']
+            return next(item['stock'] for item in items if item['id'] == self.item.id)
+
+        alice = self.shopper('alice')
+        self.add(alice)
+        self.assertEqual(menu_stock(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            alice.post(reverse('checkout'))
+
+        self.assertEqual(menu_stock(), 0)
+
+    def test_stock_updates_stop_at_held_units(self):
+        MenuItem.objects.filter(id=self.item.id).update(stock=5)
+        reserve(Cart.objects.create().id, self.item.id, 3)
+
+        results, invalid_ids, clamped_ids = apply_stock_changes({self.item.id: ('stock', 1)})
+        self.assertEqual(results, [{'id': self.item.id, 'before': 5, 'after': 3, 'reserved': 3}])
+        self.assertEqual(clamped_ids, [self.item.id])
+
+        _, _, clamped_ids = apply_stock_changes({self.item.id: ('delta', 2)})
+        self.assertEqual(clamped_ids, [])
+        self.assertEqual(self.stock(), (5, 3))
+
+    def test_deleting_a_cart_releases_its_holds(self):
+        cart = Cart.objects.create(user=User.objects.get(username='alice'))
+        reserve(cart.id, self.item.id, 1)
+        cart.delete()
+        self.assertEqual(self.stock(), (1, 0))
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_saving_an_item_keeps_reserved_stock(self):
+        item = MenuItem.objects.get(id=self.item.id)
+        reserve(Cart.objects.create().id, self.item.id, 1)
+        item.price = Decimal('3.50')
+        item.save()
+        self.assertEqual(self.stock(), (1, 1))
+        with self.assertRaises(OutOfStock):
+            reserve(Cart.objects.create().id, self.item.id, 1)
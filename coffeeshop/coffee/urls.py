@@ -24,6 +24,8 @@ urlpatterns = [
     # Orders
     path('checkout/', views.checkout, name='checkout'),
     path('order/<uuid:order_id>/', views.order_confirmation, name='order_confirmation'),
+    path('api/orders/<uuid:order_id>/stream/', views.order_status_stream, name='order_status_stream'),
+    path('api/orders/<uuid:order_id>/status/', views.order_status, name='order_status'),
     
     # Currency
     path('set-currency/', views.set_currency, name='set_currency'),
@@ -32,12 +34,14 @@ urlpatterns = [
     path('api/messages/', views.api_messages, name='api_messages'),
     path('api/health/', views.api_health, name='api_health'),
     path('api/cart-count/', views.api_cart_count, name='api_cart_count'),
+    path('api/page-state/', views.page_state, name='page_state'),
     
     # Menu API endpoints
     path('api/menu/', views.api_menu_items, name='api_menu_items'),
     path('api/menu/<int:item_id>/', views.api_menu_item_detail, name='api_menu_item_detail'),
     path('api/menu/categories/', views.api_menu_categories, name='api_menu_categories'),
     path('api/menu/featured/', views.api_featured_items, name='api_featured_items'),
+    path('api/menu/availability/', views.api_stock_availability, name='api_stock_availability'),
     
     # Admin Dashboard
     path('dashboard/', admin_views.admin_dashboard, name='admin_dashboard'),
@@ -50,12 +54,16 @@ urlpatterns = [
     # Admin API endpoints
     path('api/admin/dashboard/analytics/', admin_views.dashboard_analytics, name='dashboard_analytics'),
     path('api/admin/products/', admin_views.admin_products_api, name='admin_products_api'),
+    path('api/admin/products/import/', admin_views.admin_catalog_import_api, name='admin_catalog_import_api'),
+    path('api/admin/products/export/', admin_views.admin_catalog_export_api, name='admin_catalog_export_api'),
     # Add URL pattern for individual product operations
     path('api/admin/products/<int:product_id>/', admin_views.admin_products_api, name='admin_product_detail_api'),
     path('api/admin/orders/', admin_views.admin_orders_api, name='admin_orders_api'),
+    path('api/admin/orders/stream/', admin_views.admin_order_stream, name='admin_order_stream'),
     path('api/admin/customers/', admin_views.admin_customers_api, name='admin_customers_api'),
     path('api/admin/reports/', admin_views.admin_reports_api, name='admin_reports_api'),
     path('api/admin/messages/<int:message_id>/mark-read/', admin_views.mark_message_read_api, name='mark_message_read_api'),
+    path('api/admin/inventory/bulk-update/', admin_views.bulk_stock_update, name='bulk_stock_update'),
     
     # Review and Rating System
     path('api/menu/<int:item_id>/reviews/', views.get_reviews, name='get_reviews'),
@@ -74,6 +82,7 @@ urlpatterns = [
     path('search/', views.advanced_search, name='advanced_search'),
     path('api/search/suggestions/', views.search_suggestions, name='search_suggestions'),
     path('api/admin/categories/', admin_views.admin_categories_api, name='admin_categories_api'),
+    path('api/admin/query-stats/', admin_views.admin_query_stats_api, name='admin_query_stats_api'),
     path('api/admin/orders/stats/', admin_views.admin_orders_api, name='admin_orders_stats'),
     path('api/admin/customers/stats/', admin_views.admin_customers_api, name='admin_customers_stats'),
     path('api/admin/orders/<int:order_id>/', admin_views.admin_order_detail_api, name='admin_order_detail_api'),
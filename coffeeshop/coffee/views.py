@@ -1,5 +1,5 @@
 import json
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib import messages
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.forms import UserCreationForm
@@ -7,14 +7,26 @@ from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
+from django.views.decorators.cache import never_cache
+from django.middleware.csrf import get_token
 from django.utils.decorators import method_decorator
 from django.conf import settings
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Sum
 from decimal import Decimal
-from .models import ContactMessage, MenuItem, Cart, CartItem, Order, OrderItem, UserProfile, Review, ReviewHelpful, Wishlist, WishlistItem, Coupon
+from .models import ContactMessage, MenuItem, Cart, CartItem, Order, OrderItem, UserProfile, Review, Wishlist, WishlistItem, CouponUsage
 from .forms import ContactForm, CustomUserCreationForm
 from .signals import send_custom_form_notification
+from . import metrics
+from .pagecache import anonymous_page_cache
+from .encoding import cached_json_response, encode_items
+from .fastserializers import MENU_ITEM_LIST
+from .reviews import DEFAULT_PAGE_SIZE, DEFAULT_SORT, MAX_PAGE_SIZE, REVIEW_SORTS, review_page, review_summary
+from .votes import record_vote
+from .coupons import CouponError, best_coupon, check_coupon, claim_coupon
+from .events import order_event_response, order_payload, streams_available
+from .reservations import OutOfStock, available_stock, consume, release, reserve
 from django.utils import timezone
 
 from django.templatetags.static import static
@@ -23,13 +35,15 @@ from django.utils.safestring import mark_safe
 # Try to import Django REST Framework components
 try:
     from .serializers import (
-        MenuItemSerializer, MenuItemListSerializer, 
+        MenuItemSerializer, 
         CartSerializer, CartItemSerializer
     )
     DRF_AVAILABLE = True
 except ImportError:
     DRF_AVAILABLE = False
 
+MAX_AVAILABILITY_IDS = 100
+
 # Image utility functions
 def get_image_or_placeholder(image_url, placeholder_icon="bi-cup-hot", css_class=""):
     """Return image HTML or placeholder div"""
@@ -39,33 +53,36 @@ def get_image_or_placeholder(image_url, placeholder_icon="bi-cup-hot", css_class
 
 # Context processor for cart count
 def cart_context(request):
-    cart_count = 0
+    if getattr(request, 'page_cache_render', False):
+        # Hydrated from page_state instead
+        return {'cart_count': 0}
+
+    # Only the cart badge is rendered per request (the rest of the navbar is
+    # a cached fragment), so count it with a single aggregate query
+    items = None
     if hasattr(request, 'user') and request.user.is_authenticated:
-        try:
-            cart = Cart.objects.get(user=request.user)
-            cart_count = cart.total_items
-        except Cart.DoesNotExist:
-            cart_count = 0
+        items = CartItem.objects.filter(cart__user=request.user)
     else:
         session_key = getattr(request.session, 'session_key', None) if hasattr(request, 'session') else None
         if session_key:
-            try:
-                cart = Cart.objects.get(session_key=session_key)
-                cart_count = cart.total_items
-            except Cart.DoesNotExist:
-                cart_count = 0
+            items = CartItem.objects.filter(cart__session_key=session_key)
+    cart_count = (items.aggregate(total=Sum('quantity'))['total'] or 0) if items is not None else 0
     
     return {'cart_count': cart_count}
 
+@anonymous_page_cache
 def home(request):
     return render(request, 'coffee/home.html')
 
+@anonymous_page_cache
 def about(request):
     return render(request, 'coffee/about.html')
 
+@anonymous_page_cache
 def services(request):
     return render(request, 'coffee/services.html')
 
+@anonymous_page_cache
 def menu(request):
     # Get all menu items grouped by category
     coffee_items = MenuItem.objects.filter(category='coffee', is_available=True)
@@ -168,27 +185,41 @@ def api_messages(request):
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=400)
 
-def api_health(request):
+async def api_health(request):
     return JsonResponse({'status': 'ok'})
 
-def api_cart_count(request):
-    cart_count = 0
-    if request.user.is_authenticated:
-        try:
-            cart = Cart.objects.get(user=request.user)
-            cart_count = cart.total_items
-        except Cart.DoesNotExist:
-            cart_count = 0
+async def api_cart_count(request):
+    # Async: polled by every open page, so it must not hold a worker thread
+    user = await request.auser()
+    if user.is_authenticated:
+        cart_items = CartItem.objects.filter(cart__user=user)
     else:
         session_key = request.session.session_key
-        if session_key:
-            try:
-                cart = Cart.objects.get(session_key=session_key)
-                cart_count = cart.total_items
-            except Cart.DoesNotExist:
-                cart_count = 0
+        if not session_key:
+            return JsonResponse({'count': 0})
+        cart_items = CartItem.objects.filter(cart__session_key=session_key)
     
-    return JsonResponse({'count': cart_count})
+    totals = await cart_items.aaggregate(count=Sum('quantity'))
+    return JsonResponse({'count': totals['count'] or 0})
+
+@never_cache
+def page_state(request):
+    """Per-visitor parts of a page, fetched once after load (see coffee.pagecache)"""
+    state = {
+        'authenticated': request.user.is_authenticated,
+        'cart_count': cart_context(request)['cart_count'],
+        'messages': [
+            {'level': message.tags or 'info', 'text': str(message)}
+            for message in messages.get_messages(request)
+        ],
+        'wishlist': [],
+        'csrf_token': get_token(request),
+    }
+    if request.user.is_authenticated:
+        state['wishlist'] = list(
+            WishlistItem.objects.filter(wishlist__user=request.user).values_list('menu_item_id', flat=True)
+        )
+    return JsonResponse(state)
 
 # Authentication Views
 def signup_view(request):
@@ -265,15 +296,21 @@ def add_to_cart(request, item_id):
         cart = get_or_create_cart(request)
         quantity = int(request.POST.get('quantity', 1))
         
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart,
-            menu_item=menu_item,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        try:
+            try:
+                _add_cart_line(cart, menu_item, quantity)
+            except IntegrityError:
+                # A concurrent first add of this item created the line or
+                # its hold first; add on top of it
+                _add_cart_line(cart, menu_item, quantity)
+        except OutOfStock as e:
+            message = f'Sorry, only {e.available} {menu_item.name} left in stock.'
+            if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+                return JsonResponse({'success': False, 'error': message, 'available': e.available}, status=400)
+            messages.error(request, message)
+            return redirect('menu')
+        
+        metrics.inc('coffee_cart_additions_total', quantity)
         
         messages.success(request, f'{menu_item.name} added to cart!')
         
@@ -290,6 +327,22 @@ def add_to_cart(request, item_id):
     
     return redirect('menu')
 
+def _add_cart_line(cart, menu_item, quantity):
+    """
+    Add ``quantity`` of an item to a cart: the stock hold and the cart line
+    are written in one transaction, so neither outlives a failure of the
+    other. Raises OutOfStock.
+    """
+    with transaction.atomic():
+        cart_item = CartItem.objects.select_for_update().filter(cart=cart, menu_item=menu_item).first()
+        total = quantity + (cart_item.quantity if cart_item else 0)
+        reserve(cart.id, menu_item.id, total)
+        if cart_item is None:
+            CartItem.objects.create(cart=cart, menu_item=menu_item, quantity=quantity)
+        else:
+            cart_item.quantity = total
+            cart_item.save(update_fields=['quantity', 'updated_at'])
+
 def cart_view(request):
     cart = get_or_create_cart(request)
     currency = request.session.get('currency', 'GBP')
@@ -303,22 +356,32 @@ def cart_view(request):
 
 def update_cart_item(request, item_id):
     if request.method == 'POST':
-        cart_item = get_object_or_404(CartItem, id=item_id)
+        cart_item = get_object_or_404(CartItem.objects.select_related('menu_item'), id=item_id)
         quantity = int(request.POST.get('quantity', 1))
         
         if quantity > 0:
-            cart_item.quantity = quantity
-            cart_item.save()
+            try:
+                with transaction.atomic():
+                    reserve(cart_item.cart_id, cart_item.menu_item_id, quantity)
+                    cart_item.quantity = quantity
+                    cart_item.save()
+            except OutOfStock as e:
+                messages.error(request, f'Sorry, only {e.available} {cart_item.menu_item.name} left in stock.')
+                return redirect('cart')
             messages.success(request, 'Cart updated successfully!')
         else:
-            cart_item.delete()
+            with transaction.atomic():
+                release(cart_item.cart_id, [cart_item.menu_item_id])
+                cart_item.delete()
             messages.success(request, 'Item removed from cart!')
     
     return redirect('cart')
 
 def remove_from_cart(request, item_id):
     cart_item = get_object_or_404(CartItem, id=item_id)
-    cart_item.delete()
+    with transaction.atomic():
+        release(cart_item.cart_id, [cart_item.menu_item_id])
+        cart_item.delete()
     messages.success(request, 'Item removed from cart!')
     return redirect('cart')
 
@@ -330,37 +393,69 @@ def checkout(request):
         return redirect('cart')
     
     if request.method == 'POST':
-        # Create order
-        currency = request.session.get('currency', 'GBP')
-        order = Order.objects.create(
-            user=request.user,
-            customer_name=request.user.get_full_name() or request.user.username,
-            customer_email=request.user.email,
-            currency=currency,
-            total_amount=cart.total_price,
-            notes=request.POST.get('notes', '')
-        )
-        
-        # Create order items
-        for cart_item in cart.cartitem_set.all():
-            OrderItem.objects.create(
-                order=order,
-                menu_item=cart_item.menu_item,
-                quantity=cart_item.quantity,
-                price=cart_item.menu_item.price
-            )
-        
-        # Clear cart
-        cart.cartitem_set.all().delete()
-        
+        total = cart.total_price
+        coupon_code = request.POST.get('coupon_code', '').strip().upper()
+        try:
+            # The coupon use, order and usage record commit together or not at all
+            with transaction.atomic():
+                if coupon_code:
+                    coupon, discount = check_coupon(coupon_code, total)
+                elif request.POST.get('best_coupon'):
+                    coupon, discount = best_coupon(total)
+                else:
+                    coupon, discount = None, Decimal('0')
+                if coupon:
+                    claim_coupon(coupon)
+                # Sells the stock the cart's reservations hold
+                consume(cart)
+
+                # Create order
+                currency = request.session.get('currency', 'GBP')
+                order = Order.objects.create(
+                    user=request.user,
+                    customer_name=request.user.get_full_name() or request.user.username,
+                    customer_email=request.user.email,
+                    currency=currency,
+                    total_amount=total - discount,
+                    notes=request.POST.get('notes', '')
+                )
+                if coupon:
+                    CouponUsage.objects.create(coupon=coupon, user=request.user, order=order, discount_amount=discount)
+
+                # Create order items
+                for cart_item in cart.cartitem_set.all():
+                    OrderItem.objects.create(
+                        order=order,
+                        menu_item=cart_item.menu_item,
+                        quantity=cart_item.quantity,
+                        price=cart_item.menu_item.price
+                    )
+
+                # Clear cart
+                cart.cartitem_set.all().delete()
+        except CouponError as e:
+            messages.error(request, str(e))
+            return redirect('checkout')
+        except OutOfStock as e:
+            name = MenuItem.objects.filter(id=e.menu_item_id).values_list('name', flat=True).first()
+            messages.error(request, f'Sorry, only {e.available} {name} left in stock. Please update your cart.')
+            return redirect('cart')
+
+        metrics.inc('coffee_checkouts_total')
+
+        if coupon:
+            messages.success(request, f'Coupon {coupon.code} saved you {discount}.')
         messages.success(request, f'Your order #{order.order_id} has been placed successfully!')
         return redirect('order_confirmation', order_id=order.order_id)
-    
+
     currency = request.session.get('currency', 'GBP')
+    offer, offer_discount = best_coupon(cart.total_price)
     context = {
         'cart': cart,
         'currency': currency,
         'currency_symbol': settings.CURRENCY_SYMBOLS.get(currency, '£'),
+        'best_offer': offer,
+        'best_offer_discount': offer_discount,
     }
     return render(request, 'coffee/checkout.html', context)
 
@@ -369,9 +464,23 @@ def order_confirmation(request, order_id):
     context = {
         'order': order,
         'currency_symbol': settings.CURRENCY_SYMBOLS.get(order.currency, '₹'),
+        'live_updates': streams_available(request),
+        'status_poll_ms': settings.ORDER_STATUS_POLL_SECONDS * 1000,
     }
     return render(request, 'coffee/order_confirmation.html', context)
 
+@require_http_methods(["GET"])
+def order_status(request, order_id):
+    """An order's current status, polled where its event stream is unavailable"""
+    order = get_object_or_404(Order, order_id=order_id)
+    return JsonResponse(order_payload(order))
+
+@require_http_methods(["GET"])
+async def order_status_stream(request, order_id):
+    """Server-Sent Events carrying one order's status changes (see coffee.events)"""
+    await aget_object_or_404(Order.objects.only('id'), order_id=order_id)
+    return order_event_response(request, order_id)
+
 # Currency Views
 def set_currency(request):
     if request.method == 'POST':
@@ -407,57 +516,42 @@ def api_menu_items(request):
         featured = request.GET.get('featured')
         page = request.GET.get('page', 1)
         per_page = min(int(request.GET.get('per_page', 20)), 100)  # Max 100 items per page
+        fields = MENU_ITEM_LIST.parse_fields(request.GET.get('fields'))
         
-        # Build queryset
-        queryset = MenuItem.objects.filter(is_available=True)
-        
-        if category:
-            queryset = queryset.filter(category=category)
-        
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | Q(description__icontains=search)
-            )
-        
-        if featured and featured.lower() == 'true':
-            queryset = queryset.filter(is_featured=True)
-        
-        # Paginate
-        paginator = Paginator(queryset, per_page)
-        page_obj = paginator.get_page(page)
-        
-        # Serialize data
-        if DRF_AVAILABLE:
-            serializer = MenuItemListSerializer(page_obj.object_list, many=True)
-            items = serializer.data
-        else:
-            # Fallback manual serialization
-            items = []
-            for item in page_obj.object_list:
-                items.append({
-                    'id': item.id,
-                    'name': item.name,
-                    'description': item.description,
-                    'price': float(item.price),
-                    'formatted_price': f"£{item.price:.2f}",
-                    'category': item.category,
-                    'category_display': item.get_category_display(),
-                    'image_url': item.image_url,
-                    'is_featured': item.is_featured
-                })
+        def build():
+            # Build queryset
+            queryset = MenuItem.objects.filter(is_available=True)
+            
+            if category:
+                queryset = queryset.filter(category=category)
+            
+            if search:
+                queryset = queryset.filter(
+                    Q(name__icontains=search) | Q(description__icontains=search)
+                )
+            
+            if featured and featured.lower() == 'true':
+                queryset = queryset.filter(is_featured=True)
+            
+            # Paginate
+            paginator = Paginator(queryset, per_page)
+            page_obj = paginator.get_page(page)
+            
+            return {
+                'items': encode_items(page_obj.object_list, MENU_ITEM_LIST, 'menu_item_list', fields),
+                'pagination': {
+                    'page': page_obj.number,
+                    'per_page': per_page,
+                    'total_pages': paginator.num_pages,
+                    'total_items': paginator.count,
+                    'has_next': page_obj.has_next(),
+                    'has_previous': page_obj.has_previous()
+                },
+                'categories': list(MenuItem.CATEGORY_CHOICES)
+            }
         
-        return JsonResponse({
-            'items': items,
-            'pagination': {
-                'page': page_obj.number,
-                'per_page': per_page,
-                'total_pages': paginator.num_pages,
-                'total_items': paginator.count,
-                'has_next': page_obj.has_next(),
-                'has_previous': page_obj.has_previous()
-            },
-            'categories': list(MenuItem.CATEGORY_CHOICES)
-        })
+        # Free-text searches vary too much to be worth caching whole
+        return cached_json_response(request, 'menu_items', build, cacheable=not search)
         
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
@@ -501,38 +595,27 @@ def api_menu_categories(request):
     API endpoint to get menu items grouped by category
     """
     try:
-        categories_data = {}
-        
-        for category_code, category_name in MenuItem.CATEGORY_CHOICES:
-            items = MenuItem.objects.filter(category=category_code, is_available=True)
+        fields = MENU_ITEM_LIST.parse_fields(request.GET.get('fields'))
+
+        def build():
+            categories_data = {}
             
-            if DRF_AVAILABLE:
-                serializer = MenuItemListSerializer(items, many=True)
-                items_data = serializer.data
-            else:
-                # Fallback manual serialization
-                items_data = []
-                for item in items:
-                    items_data.append({
-                        'id': item.id,
-                        'name': item.name,
-                        'description': item.description,
-                        'price': float(item.price),
-                        'formatted_price': f"£{item.price:.2f}",
-                        'image_url': item.image_url,
-                        'is_featured': item.is_featured
-                    })
+            for category_code, category_name in MenuItem.CATEGORY_CHOICES:
+                items = MenuItem.objects.filter(category=category_code, is_available=True)
+                items_data = encode_items(items, MENU_ITEM_LIST, 'menu_item_list', fields)
+                
+                categories_data[category_code] = {
+                    'name': category_name,
+                    'items': items_data,
+                    'count': items_data.count
+                }
             
-            categories_data[category_code] = {
-                'name': category_name,
-                'items': items_data,
-                'count': len(items_data)
+            return {
+                'categories': categories_data,
+                'total_categories': len(categories_data)
             }
         
-        return JsonResponse({
-            'categories': categories_data,
-            'total_categories': len(categories_data)
-        })
+        return cached_json_response(request, 'menu_categories', build)
         
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
@@ -544,35 +627,37 @@ def api_featured_items(request):
     API endpoint to get featured menu items
     """
     try:
-        featured_items = MenuItem.objects.filter(is_featured=True, is_available=True)
-        
-        if DRF_AVAILABLE:
-            serializer = MenuItemListSerializer(featured_items, many=True)
-            items_data = serializer.data
-        else:
-            # Fallback manual serialization
-            items_data = []
-            for item in featured_items:
-                items_data.append({
-                    'id': item.id,
-                    'name': item.name,
-                    'description': item.description,
-                    'price': float(item.price),
-                    'formatted_price': f"£{item.price:.2f}",
-                    'category': item.category,
-                    'category_display': item.get_category_display(),
-                    'image_url': item.image_url,
-                    'is_featured': item.is_featured
-                })
+        fields = MENU_ITEM_LIST.parse_fields(request.GET.get('fields'))
+
+        def build():
+            featured_items = MenuItem.objects.filter(is_featured=True, is_available=True)
+            items_data = encode_items(featured_items, MENU_ITEM_LIST, 'menu_item_list', fields)
+            return {
+                'featured_items': items_data,
+                'count': items_data.count
+            }
         
-        return JsonResponse({
-            'featured_items': items_data,
-            'count': len(items_data)
-        })
+        return cached_json_response(request, 'featured_items', build)
         
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
+@require_http_methods(["GET"])
+def api_stock_availability(request):
+    """
+    Unreserved stock of the items in ``?ids=1,2,3``, read from the
+    availability cache (see coffee.reservations)
+    """
+    try:
+        item_ids = [int(item_id) for item_id in request.GET.get('ids', '').split(',') if item_id.strip()]
+    except ValueError:
+        return JsonResponse({'error': 'ids must be comma-separated item ids'}, status=400)
+    if not 0 < len(item_ids) <= MAX_AVAILABILITY_IDS:
+        return JsonResponse({'error': f'Pass between 1 and {MAX_AVAILABILITY_IDS} item ids'}, status=400)
+
+    available = available_stock(item_ids)
+    return JsonResponse({'availability': {str(item_id): units for item_id, units in available.items()}})
+
 
 # ============================================================================
 # REVIEW AND RATING SYSTEM
@@ -633,30 +718,30 @@ def add_review(request, item_id):
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_reviews(request, item_id):
-    """Get all reviews for a menu item"""
+    """
+    Get a page of reviews for a menu item, with its rating summary.
+    Query parameters: sort (newest, helpful, highest, lowest), limit and
+    cursor (the next_cursor of the previous page).
+    """
+    get_object_or_404(MenuItem.objects.only('id'), id=item_id)
+    
+    sort = request.GET.get('sort', DEFAULT_SORT)
+    if sort not in REVIEW_SORTS:
+        return JsonResponse({'error': f'sort must be one of: {", ".join(REVIEW_SORTS)}'}, status=400)
+    
+    try:
+        limit = min(max(int(request.GET.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+        reviews_data, next_cursor = review_page(item_id, sort, request.GET.get('cursor'), limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
     try:
-        menu_item = get_object_or_404(MenuItem, id=item_id)
-        reviews = menu_item.reviews.all().order_by('-created_at')
-        
-        reviews_data = []
-        for review in reviews:
-            reviews_data.append({
-                'id': review.id,
-                'rating': review.rating,
-                'title': review.title,
-                'comment': review.comment,
-                'user': review.user.username,
-                'created_at': review.created_at.isoformat(),
-                'star_display': review.star_display,
-                'helpful_count': review.helpful_count,
-                'is_verified': review.is_verified
-            })
-        
         return JsonResponse({
             'reviews': reviews_data,
-            'average_rating': menu_item.average_rating,
-            'rating_count': menu_item.rating_count,
-            'rating_breakdown': menu_item.get_rating_breakdown()
+            **review_summary(item_id),
+            'sort': sort,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
         })
         
     except Exception as e:
@@ -669,32 +754,15 @@ def get_reviews(request, item_id):
 def mark_review_helpful(request, review_id):
     """Mark a review as helpful"""
     try:
-        review = get_object_or_404(Review, id=review_id)
-        
-        # Check if user already marked this review as helpful
-        helpful_vote, created = ReviewHelpful.objects.get_or_create(
-            review=review,
-            user=request.user
-        )
+        review = get_object_or_404(Review.objects.only('id'), id=review_id)
         
-        if created:
-            review.helpful_count += 1
-            review.save()
-            return JsonResponse({
-                'success': True,
-                'message': 'Review marked as helpful',
-                'helpful_count': review.helpful_count
-            })
-        else:
-            # Remove helpful vote
-            helpful_vote.delete()
-            review.helpful_count = max(0, review.helpful_count - 1)
-            review.save()
-            return JsonResponse({
-                'success': True,
-                'message': 'Helpful vote removed',
-                'helpful_count': review.helpful_count
-            })
+        # A second click removes the vote; the count is flushed to the review later
+        added, helpful_count = record_vote(review, request.user)
+        return JsonResponse({
+            'success': True,
+            'message': 'Review marked as helpful' if added else 'Helpful vote removed',
+            'helpful_count': helpful_count
+        })
         
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -764,19 +832,16 @@ def wishlist_view(request):
 @login_required
 @csrf_exempt
 @require_http_methods(["GET"])
-def get_wishlist_status(request, item_id):
+async def get_wishlist_status(request, item_id):
     """Check if item is in user's wishlist"""
     try:
-        menu_item = get_object_or_404(MenuItem, id=item_id)
+        menu_item = await aget_object_or_404(MenuItem.objects.only('id'), id=item_id)
+        user = await request.auser()
         
-        try:
-            wishlist = Wishlist.objects.get(user=request.user)
-            in_wishlist = WishlistItem.objects.filter(
-                wishlist=wishlist,
-                menu_item=menu_item
-            ).exists()
-        except Wishlist.DoesNotExist:
-            in_wishlist = False
+        in_wishlist = await WishlistItem.objects.filter(
+            wishlist__user=user,
+            menu_item=menu_item
+        ).aexists()
         
         return JsonResponse({'in_wishlist': in_wishlist})
         
@@ -791,33 +856,30 @@ def get_wishlist_status(request, item_id):
 @csrf_exempt
 @require_http_methods(["POST"])
 def apply_coupon(request):
-    """Apply coupon code to get discount"""
+    """
+    Price a coupon code against an order total, or with ``"auto": true``
+    find the coupon saving the most. ``total`` defaults to the cart's.
+    """
     try:
         data = json.loads(request.body)
         coupon_code = data.get('code', '').strip().upper()
-        order_total = Decimal(str(data.get('total', 0)))
-        
-        if not coupon_code:
+        if 'total' in data:
+            order_total = Decimal(str(data['total']))
+        else:
+            order_total = get_or_create_cart(request).total_price
+
+        if data.get('auto'):
+            coupon, discount_amount = best_coupon(order_total)
+            if coupon is None:
+                return JsonResponse({'error': 'No coupon applies to this order'}, status=400)
+        elif not coupon_code:
             return JsonResponse({'error': 'Coupon code is required'}, status=400)
-        
-        # Find coupon
-        try:
-            coupon = Coupon.objects.get(code=coupon_code)
-        except Coupon.DoesNotExist:
-            return JsonResponse({'error': 'Invalid coupon code'}, status=400)
-        
-        # Check if coupon is valid
-        if not coupon.is_valid:
-            return JsonResponse({'error': 'This coupon has expired or is no longer valid'}, status=400)
-        
-        # Calculate discount
-        discount_amount = coupon.calculate_discount(order_total)
-        
-        if discount_amount <= 0:
-            return JsonResponse({
-                'error': f'Order total must be at least ₹{coupon.minimum_amount} to use this coupon'
-            }, status=400)
-        
+        else:
+            try:
+                coupon, discount_amount = check_coupon(coupon_code, order_total)
+            except CouponError as e:
+                return JsonResponse({'error': str(e)}, status=400)
+
         return JsonResponse({
             'success': True,
             'coupon': {
@@ -915,7 +977,7 @@ def advanced_search(request):
 
 @csrf_exempt
 @require_http_methods(["GET"])
-def search_suggestions(request):
+async def search_suggestions(request):
     """Get search suggestions for autocomplete"""
     query = request.GET.get('q', '').strip()
     
@@ -926,10 +988,10 @@ def search_suggestions(request):
     items = MenuItem.objects.filter(
         Q(name__icontains=query) | Q(description__icontains=query),
         is_available=True
-    )[:8]
+    ).only('id', 'name', 'category', 'price')[:8]
     
     suggestions = []
-    for item in items:
+    async for item in items:
         suggestions.append({
             'id': item.id,
             'name': item.name,
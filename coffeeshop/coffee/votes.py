@@ -0,0 +1,129 @@
+"""
+Write-behind counter for review helpful votes.
+
+A vote inserts (or deletes) its ReviewHelpful row and appends a +1/-1 row
+to ReviewHelpfulLog in the same transaction; it never touches the Review
+row, so a burst of votes on one review only ever inserts. flush_votes
+later folds the log into Review.helpful_count with one UPDATE of F()
+increments, and reconcile_votes recomputes drifted counts from
+ReviewHelpful. Pending deltas are added back when a count is read right
+after a vote.
+
+Flushes run every HELPFUL_VOTE_FLUSH_EVERY votes after commit and from
+``manage.py flush_helpful_votes`` (``--watch`` keeps it running).
+"""
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Review, ReviewHelpful, ReviewHelpfulLog
+
+logger = logging.getLogger(__name__)
+
+
+def record_vote(review, user):
+    """
+    Toggle ``user``'s helpful vote on ``review``. Returns ``(added,
+    helpful_count)``, the count including votes not flushed yet.
+    """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                ReviewHelpful.objects.create(review=review, user=user)
+            added = True
+        except IntegrityError:
+            # Already voted (possibly in a concurrent request): this click removes it
+            added = False
+            if not ReviewHelpful.objects.filter(review=review, user=user).delete()[0]:
+                return False, current_count(review.id)
+        entry = ReviewHelpfulLog.objects.create(review=review, delta=1 if added else -1)
+
+    flush_every = getattr(settings, 'HELPFUL_VOTE_FLUSH_EVERY', 0)
+    if flush_every and entry.id % flush_every == 0:
+        transaction.on_commit(flush_votes)
+    return added, current_count(review.id)
+
+
+def _pending(review_ref):
+    """Subquery: net logged votes on the review ``review_ref`` points at"""
+    return Coalesce(Subquery(
+        ReviewHelpfulLog.objects.filter(review=review_ref).order_by().values('review').annotate(
+            total=Sum('delta')
+        ).values('total')
+    ), 0)
+
+
+def current_count(review_id):
+    """helpful_count plus the votes not flushed yet, read in one statement"""
+    return Review.objects.filter(id=review_id).values_list(
+        F('helpful_count') + _pending(OuterRef('pk')), flat=True
+    ).first() or 0
+
+
+def flush_votes(batch_size=5000):
+    """
+    Apply up to ``batch_size`` logged votes to Review.helpful_count and
+    return how many were applied
+    """
+    with transaction.atomic():
+        entries = list(ReviewHelpfulLog.objects.order_by('id').values_list('id', 'review_id', 'delta')[:batch_size])
+        if not entries:
+            return 0
+        # Only apply what this flush removed from the log, so concurrent flushes never double count
+        deleted, _ = ReviewHelpfulLog.objects.filter(id__in=[entry_id for entry_id, _, _ in entries]).delete()
+        if deleted != len(entries):
+            transaction.set_rollback(True)
+            logger.info('Helpful vote flush raced another flush; leaving the log for the next one')
+            return 0
+
+        deltas = {}
+        for _, review_id, delta in entries:
+            deltas[review_id] = deltas.get(review_id, 0) + delta
+        deltas = {review_id: delta for review_id, delta in deltas.items() if delta}
+        _warn_drift(deltas)
+        if deltas:
+            Review.objects.filter(id__in=deltas).update(helpful_count=Case(
+                *[
+                    When(id=review_id, then=Greatest(F('helpful_count') + Value(delta), Value(0)))
+                    for review_id, delta in deltas.items()
+                ],
+                default=F('helpful_count'),
+                output_field=IntegerField(),
+            ))
+    return len(entries)
+
+
+def _warn_drift(deltas):
+    """
+    Log reviews a flush is about to clamp at zero: their count has drifted
+    below the votes recorded, which reconcile_votes corrects
+    """
+    removals = {review_id: delta for review_id, delta in deltas.items() if delta < 0}
+    if not removals:
+        return
+    drifted = [
+        review_id for review_id, count in Review.objects.filter(id__in=removals).values_list('id', 'helpful_count')
+        if count + removals[review_id] < 0
+    ]
+    if drifted:
+        logger.warning(
+            f'helpful_count would go negative for review(s) {sorted(drifted)}; clamped at 0. '
+            'Run manage.py flush_helpful_votes --reconcile to recount them.'
+        )
+
+
+def reconcile_votes():
+    """
+    Correct every helpful_count that disagrees with its ReviewHelpful rows
+    (less the votes still in the log). Returns the number corrected.
+    """
+    votes = ReviewHelpful.objects.filter(review=OuterRef('pk')).order_by().values('review').annotate(
+        count=Count('id')
+    ).values('count')
+    expected = Coalesce(Subquery(votes), 0) - _pending(OuterRef('pk'))
+    return Review.objects.annotate(expected=expected).exclude(helpful_count=F('expected')).update(
+        helpful_count=expected
+    )
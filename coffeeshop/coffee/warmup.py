@@ -0,0 +1,315 @@
+"""
+Cold-start warm-up.
+
+A fresh worker pays for importing DRF and the view modules, compiling
+templates, building the URL resolver and filling empty caches on its first
+requests. warm_up() does that work up front: it imports the heavy modules,
+compiles the shop templates, populates the resolver, builds the serializer
+field mappings, primes the catalog, menu card and page caches, runs the
+dashboard queries once (filling the database page cache) and finally times a
+first request to each configured URL. Every step is timed so the report can
+be checked against a cold-start budget.
+
+Runs from the ``warmup`` management command and, with WARMUP['ON_BOOT'],
+when a WSGI/ASGI worker loads the application. Templates, imports and a
+per-process cache (LocMem) only benefit the process that warmed them, so
+the command primes shared caches and measures cold start; the boot hook is
+what warms the workers themselves. ASGI servers such as uvicorn import the
+application inside their running event loop, where the ORM refuses to
+run, so there the hook warms from a separate thread and waits for it.
+"""
+import asyncio
+import importlib
+import inspect
+import logging
+import os
+import sys
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WARMUP = {
+    'ON_BOOT': False,
+    'URLS': ['home', 'menu'],
+    'TEMPLATE_PREFIXES': ['coffee/'],
+    'BUDGET_MS': 5000,
+    'FIRST_REQUEST_BUDGET_MS': 250,
+}
+
+# Imported lazily by the URLconf, so the first request would pay for them
+WARMUP_MODULES = (
+    'rest_framework.views',
+    'rest_framework.serializers',
+    'coffee.serializers',
+    'coffee.views',
+    'coffee.admin_views',
+)
+
+
+def get_warmup_config():
+    """WARMUP setting merged over the defaults"""
+    return {**DEFAULT_WARMUP, **getattr(settings, 'WARMUP', {})}
+
+
+def _ms(start):
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def import_modules():
+    """Import WARMUP_MODULES, returning {module: ms} (None if already loaded)"""
+    timings = {}
+    for name in WARMUP_MODULES:
+        if name in sys.modules:
+            timings[name] = None
+            continue
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            # DRF is optional
+            continue
+        timings[name] = _ms(start)
+    return timings
+
+
+def template_names(prefixes):
+    """Names of the Django templates under the given prefixes"""
+    from django.template import engines
+    from django.template.backends.django import DjangoTemplates
+
+    names = set()
+    for engine in engines.all():
+        if not isinstance(engine, DjangoTemplates):
+            continue
+        for loader in engine.engine.template_loaders:
+            for directory in loader.get_dirs():
+                for root, _, files in os.walk(directory):
+                    for filename in files:
+                        name = os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/')
+                        if name.endswith('.html') and name.startswith(tuple(prefixes)):
+                            names.add(name)
+    return sorted(names)
+
+
+def load_templates(prefixes):
+    """Compile templates into the cached loader"""
+    from django.template.loader import get_template
+
+    names = template_names(prefixes)
+    for name in names:
+        get_template(name)
+    return f'{len(names)} templates'
+
+
+def build_url_resolver():
+    from django.urls import get_resolver
+
+    resolver = get_resolver()
+    # reverse_dict is built lazily on first access
+    return f'{len(resolver.reverse_dict)} URL names'
+
+
+def build_serializers():
+    """Compile the fast-path serializers and build the field mapping of every DRF one once"""
+    from . import fastserializers
+
+    compiled = 0
+    for _, value in inspect.getmembers(fastserializers):
+        if isinstance(value, fastserializers.RowSerializer):
+            value.compile()
+            compiled += 1
+
+    try:
+        from rest_framework import serializers as drf
+        from . import serializers
+    except ImportError:
+        return f'{compiled} compiled, DRF not installed'
+
+    count = 0
+    for _, cls in inspect.getmembers(serializers, inspect.isclass):
+        if issubclass(cls, drf.Serializer) and cls.__module__ == serializers.__name__:
+            cls().fields
+            count += 1
+    return f'{compiled} compiled, {count} DRF serializers'
+
+
+def prime_catalog():
+    from .catalog import get_catalog_version, get_category_listing
+
+    get_catalog_version()
+    return f'{len(get_category_listing())} categories'
+
+
+def prime_menu_fragments():
+    """Render the menu anonymously in every currency to fill the card and page caches"""
+    from django.contrib.auth.models import AnonymousUser
+    from django.test import RequestFactory
+
+    from .views import menu
+
+    store = importlib.import_module(settings.SESSION_ENGINE).SessionStore
+    factory = RequestFactory()
+    for currency in settings.CURRENCY_SYMBOLS:
+        request = factory.get('/menu/')
+        request.user = AnonymousUser()
+        # Never saved, so warming creates no sessions
+        request.session = store()
+        request.session['currency'] = currency
+        menu(request)
+    return f'{len(settings.CURRENCY_SYMBOLS)} currencies'
+
+
+def prime_dashboard():
+    """
+    Run the dashboard queries once. They are not cached by the app, so this
+    warms the analytics connection and the database's page cache.
+    """
+    from .models import DashboardAnalytics
+    from .routers import analytics_reads
+
+    with analytics_reads():
+        DashboardAnalytics.get_total_orders()
+        DashboardAnalytics.get_total_customers()
+        DashboardAnalytics.get_today_revenue()
+        DashboardAnalytics.get_most_popular_item()
+        DashboardAnalytics.get_sales_data(7)
+        DashboardAnalytics.get_category_stats()
+    return 'analytics queries'
+
+
+def _request_host():
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+    return hosts[0] if hosts else 'localhost'
+
+
+def first_requests(url_names):
+    """Time one anonymous request to each URL through the full handler"""
+    from django.test import Client
+    from django.urls import reverse
+
+    client = Client(HTTP_HOST=_request_host())
+    timings = {}
+    for name in url_names:
+        path = reverse(name)
+        start = time.perf_counter()
+        response = client.get(path)
+        timings[path] = {'status': response.status_code, 'ms': _ms(start)}
+    return timings
+
+
+def warm_up(config=None, requests=True):
+    """Run every warm-up step and return a timing report"""
+    config = config or get_warmup_config()
+    started = time.perf_counter()
+    report = {'imports': {}, 'steps': {}, 'first_requests': {}}
+
+    def step(name, func, *args):
+        start = time.perf_counter()
+        try:
+            detail = func(*args)
+        except Exception as e:
+            # A failed step (e.g. unmigrated database) must not stop the worker
+            logger.warning('Warm-up step %s failed: %s', name, e)
+            report['steps'][name] = {'ms': _ms(start), 'error': str(e)}
+            return None
+        report['steps'][name] = {'ms': _ms(start), 'detail': detail}
+        return detail
+
+    report['imports'] = step('imports', import_modules) or {}
+    step('templates', load_templates, config['TEMPLATE_PREFIXES'])
+    step('url_resolver', build_url_resolver)
+    step('serializers', build_serializers)
+    step('catalog', prime_catalog)
+    step('menu_fragments', prime_menu_fragments)
+    step('dashboard', prime_dashboard)
+    report['steps']['imports']['detail'] = f'{len(report["imports"])} modules'
+
+    if requests and config['URLS']:
+        report['first_requests'] = step('first_requests', first_requests, config['URLS']) or {}
+        report['steps']['first_requests']['detail'] = f'{len(report["first_requests"])} URLs'
+
+    report['total_ms'] = _ms(started)
+    return report
+
+
+def check_budget(report, config=None):
+    """Return a list of cold-start budget violations"""
+    config = config or get_warmup_config()
+    violations = []
+    if config['BUDGET_MS'] and report['total_ms'] > config['BUDGET_MS']:
+        violations.append(f'warm-up took {report["total_ms"]}ms (budget {config["BUDGET_MS"]}ms)')
+    for name, result in report['steps'].items():
+        if 'error' in result:
+            violations.append(f'{name} failed: {result["error"]}')
+    limit = config['FIRST_REQUEST_BUDGET_MS']
+    for path, result in report['first_requests'].items():
+        if result['status'] >= 400:
+            violations.append(f'{path} returned {result["status"]}')
+        elif limit and result['ms'] > limit:
+            violations.append(f'{path} took {result["ms"]}ms after warm-up (budget {limit}ms)')
+    return violations
+
+
+def _event_loop_running():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _run_off_loop(func, *args):
+    """Call ``func`` in a new thread, block until it returns and return its result"""
+    from django.db import connections
+
+    result = {}
+
+    def target():
+        try:
+            result['value'] = func(*args)
+        except Exception:
+            logger.exception('Warm-up failed')
+        finally:
+            # Connections are per thread and this one ends here
+            connections.close_all()
+
+    thread = threading.Thread(target=target, name='warmup')
+    thread.start()
+    thread.join()
+    return result.get('value')
+
+
+def boot(setup_ms=None):
+    """
+    Worker boot hook for wsgi.py/asgi.py. Shares the worker's metrics with
+    /metrics, warms the worker when WARMUP['ON_BOOT'] is set and logs the
+    timings and any budget violations.
+    """
+    from . import metrics
+    metrics.share()
+
+    config = get_warmup_config()
+    if not config['ON_BOOT']:
+        return None
+
+    if _event_loop_running():
+        report = _run_off_loop(warm_up, config)
+        if report is None:
+            return None
+    else:
+        report = warm_up(config)
+    report['django_setup_ms'] = setup_ms
+
+    metrics.observe('coffee_warmup_duration_seconds', report['total_ms'] / 1000)
+
+    logger.info(
+        'Worker %s warmed in %sms (Django setup %sms): %s',
+        os.getpid(), report['total_ms'], setup_ms,
+        ', '.join(f'{name} {result["ms"]}ms' for name, result in report['steps'].items()),
+    )
+    for violation in check_budget(report, config):
+        logger.warning('Cold-start budget exceeded: %s', violation)
+    return report
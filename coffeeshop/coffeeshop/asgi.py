@@ -8,9 +8,20 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
 
 import os
+import time
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coffeeshop.settings')
+# Persistent connections must be off under ASGI: each sync_to_async thread
+# opens its own connection that the request cycle never closes, and their
+# idle readers keep SQLite from checkpointing the WAL
+os.environ['DB_CONN_MAX_AGE'] = '0'
 
+started = time.perf_counter()
 application = get_asgi_application()
+
+# Warm templates, URLs and caches before the first request (WARMUP['ON_BOOT'])
+from coffee.warmup import boot  # noqa: E402
+
+boot(setup_ms=round((time.perf_counter() - started) * 1000, 1))
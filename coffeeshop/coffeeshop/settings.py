@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -28,13 +29,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'coffee.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'coffee.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'coffee.middleware.SessionRenewalMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'coffee.middleware.DatabaseLockMiddleware',
 ]
 
 ROOT_URLCONF = 'coffeeshop.urls'
@@ -51,21 +56,75 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'coffee.views.cart_context',
+                'coffee.pagecache.page_cache_context',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'coffeeshop.wsgi.application'
+# Serve with an ASGI server (e.g. `uvicorn coffeeshop.asgi:application`) so
+# async views and streaming responses don't hold a worker thread
+ASGI_APPLICATION = 'coffeeshop.asgi.application'
 
 # Database
+# SQLite is tuned for concurrent web traffic: WAL lets readers run alongside
+# the single writer, busy_timeout waits for locks instead of failing, and
+# IMMEDIATE transactions take the write lock up front so two transactions
+# never deadlock upgrading from read to write. Override per environment
+# via the SQLITE_* / DB_* variables in .env.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -64000)),  # negative = KiB
+    'temp_store': 'MEMORY',
+    'optimize': '0x10002',  # refresh query planner stats on connect
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'OPTIONS': {
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': ';'.join(
+                f'PRAGMA {pragma}={value}' for pragma, value in SQLITE_PRAGMAS.items()
+            ),
+        },
+        # Persistent connections, re-validated before reuse (WSGI only;
+        # coffeeshop.asgi forces DB_CONN_MAX_AGE=0)
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+    },
+    # Read-only connection for dashboard and report queries (see
+    # coffee.routers). Points at the primary file by default; set
+    # ANALYTICS_DATABASE_PATH to read from a replica copy instead.
+    'analytics': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('ANALYTICS_DATABASE_PATH', BASE_DIR / 'db.sqlite3'),
+        'OPTIONS': {
+            'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+            'init_command': ';'.join([
+                'PRAGMA query_only=1',
+                f"PRAGMA busy_timeout={SQLITE_PRAGMAS['busy_timeout']}",
+                f"PRAGMA mmap_size={SQLITE_PRAGMAS['mmap_size']}",
+                f"PRAGMA cache_size={SQLITE_PRAGMAS['cache_size']}",
+                'PRAGMA temp_store=MEMORY',
+            ]),
+        },
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['coffee.routers.AnalyticsRouter']
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -97,16 +156,113 @@ STATICFILES_DIRS = [
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Exported public pages for a plain static file server (manage.py export_static_site)
+STATIC_SITE_ROOT = Path(os.getenv('STATIC_SITE_ROOT', BASE_DIR / 'static_site'))
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / "media"
+# Let Django serve MEDIA_ROOT itself (development only); in production the
+# web server serves /media/ directly, see coffee/storage.py
+SERVE_MEDIA = os.getenv('SERVE_MEDIA', str(DEBUG)) == 'True'
+
+# Uploaded media is stored by content hash (deduplicated, cacheable forever)
+STORAGES = {
+    'default': {
+        'BACKEND': 'coffee.storage.ContentAddressedStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
 
 
+# Cache configuration
+# LocMemCache is per process; when running several worker processes point
+# CACHE_BACKEND/CACHE_LOCATION at a shared cache (e.g.
+# coffee.cache_backends.InstrumentedFileBasedCache or Redis) so cached
+# sessions and catalog versions stay consistent.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'coffee.cache_backends.InstrumentedLocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'coffeeshop'),
+    },
+}
+# The local backends cull at 300 entries by default, far fewer than the
+# per-item card fragments and JSON encodings a full catalog needs
+if CACHES['default']['BACKEND'].endswith(('LocMemCache', 'FileBasedCache')):
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 50000))}
+
 # Session configuration
+# Sessions are read through the cache and written through to the database.
+# Signed cookies are not an option: anonymous carts are keyed by session_key.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
 SESSION_COOKIE_AGE = 86400  # 24 hours
-SESSION_SAVE_EVERY_REQUEST = True
+# Only save sessions that changed; SessionRenewalMiddleware slides the expiry
+# forward once SESSION_RENEW_AFTER seconds have passed since the last write
+SESSION_SAVE_EVERY_REQUEST = False
+SESSION_RENEW_AFTER = int(os.getenv('SESSION_RENEW_AFTER', SESSION_COOKIE_AGE // 2))
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 
+# Query budgets (see coffee.querystats); per-view overrides are keyed by URL name
+QUERY_BUDGET = {
+    'ENABLED': os.getenv('QUERY_BUDGET_ENABLED', 'True') == 'True',
+    'MAX_QUERIES': 30,
+    'MAX_DB_TIME_MS': 250,
+    'DUPLICATE_THRESHOLD': 5,
+    'VIEWS': {
+        'admin_dashboard': {'MAX_QUERIES': 60, 'MAX_DB_TIME_MS': 1000},
+        'admin_reports': {'MAX_QUERIES': 60, 'MAX_DB_TIME_MS': 1000},
+        'admin_reports_api': {'MAX_QUERIES': 60, 'MAX_DB_TIME_MS': 1000},
+    },
+    'SERVER_TIMING': DEBUG,
+}
+
+# Prometheus metrics (see coffee.metrics); each serving process writes its
+# snapshot into METRICS_DIR, and snapshots of exited processes are dropped
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'coffeeshop-metrics'))
+METRICS_FLUSH_INTERVAL = 5  # seconds
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
+# Anonymous full-page cache for home/about/services/menu (see coffee.pagecache);
+# purged whenever the catalog version changes, 0 disables it
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 600))
+
+# Review helpful votes are logged and folded into Review.helpful_count in
+# batches (see coffee.votes); a flush runs every this many votes, 0 leaves
+# it to `manage.py flush_helpful_votes`
+HELPFUL_VOTE_FLUSH_EVERY = int(os.getenv('HELPFUL_VOTE_FLUSH_EVERY', 50))
+
+# Seconds between checks of the coupons' database stamp (see coffee.coupons);
+# without a shared cache it is how long other workers take to see a change
+COUPON_TABLE_CHECK_SECONDS = int(os.getenv('COUPON_TABLE_CHECK_SECONDS', 30))
+
+# Order status Server-Sent Events (see coffee.events): events kept for
+# clients resuming with Last-Event-ID, seconds between heartbeats, how
+# long one response streams before the client is made to reconnect, and
+# how many streams a process serves at once. Streams are ASGI only; under
+# WSGI or past the limit pages poll every ORDER_STATUS_POLL_SECONDS.
+ORDER_EVENT_BUFFER = int(os.getenv('ORDER_EVENT_BUFFER', 1000))
+ORDER_EVENT_HEARTBEAT = int(os.getenv('ORDER_EVENT_HEARTBEAT', 15))
+ORDER_EVENT_STREAM_SECONDS = int(os.getenv('ORDER_EVENT_STREAM_SECONDS', 300))
+ORDER_EVENT_MAX_STREAMS = int(os.getenv('ORDER_EVENT_MAX_STREAMS', 500))
+ORDER_STATUS_POLL_SECONDS = int(os.getenv('ORDER_STATUS_POLL_SECONDS', 15))
+
+# Seconds an item added to a cart holds its stock (see coffee.reservations);
+# run `manage.py release_stock_holds --watch` to hand back expired holds
+STOCK_RESERVATION_TTL = int(os.getenv('STOCK_RESERVATION_TTL', 900))
+
+# Cold-start warm-up (see coffee.warmup); ON_BOOT warms each worker when
+# wsgi.py/asgi.py load, `manage.py warmup` reports against the same budgets
+WARMUP = {
+    'ON_BOOT': os.getenv('WARMUP_ON_BOOT', str(not DEBUG)) == 'True',
+    'URLS': ['home', 'menu'],
+    'TEMPLATE_PREFIXES': ['coffee/'],
+    'BUDGET_MS': int(os.getenv('WARMUP_BUDGET_MS', 5000)),
+    'FIRST_REQUEST_BUDGET_MS': int(os.getenv('WARMUP_FIRST_REQUEST_BUDGET_MS', 250)),
+}
+
 # Login URLs
 LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = '/'
@@ -179,9 +335,21 @@ ADMIN_DASHBOARD_SETTINGS = {
 }
 
 # File Upload Settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 5 * 1024 * 1024  # 5MB
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1 * 1024 * 1024  # 1MB; larger uploads stream to a temp file
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Image processing pipeline (resized variants for uploaded menu images)
+IMAGE_VARIANTS = {
+    'thumbnail': 160,
+    'card': 480,
+    'detail': 1200,
+}
+IMAGE_QUALITY = 80
+# 0 processes uploads inline once they commit; above 0, uploads are left to
+# `manage.py process_images --watch`, which must then be kept running, with
+# this many worker processes
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', 0))
+
 # Admin Dashboard Superuser Credentials
 ADMIN_CREDENTIALS = {
     'USERNAME': 'aayushi2001',
@@ -8,9 +8,16 @@ https://docs.djangoproject.com/en/5.1/howto/deployment/wsgi/
 """
 
 import os
+import time
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'coffeeshop.settings')
 
+started = time.perf_counter()
 application = get_wsgi_application()
+
+# Warm templates, URLs and caches before the first request (WARMUP['ON_BOOT'])
+from coffee.warmup import boot  # noqa: E402
+
+boot(setup_ms=round((time.perf_counter() - started) * 1000, 1))